@@ -0,0 +1,39 @@
+"""
+Benchmark hardklor.hk2df rows/second for the C and Python parsers.
+
+Usage: python benchmarks/bench_hk2df.py [Hardklor file] [copies]
+
+The input file is repeated `copies` times into a temporary file to get a
+larger Hardklor file.
+"""
+import os
+import sys
+import time
+import tempfile
+from msions.hardklor import hk2df
+
+
+def bench(hk_file: str, copies: int = 200):
+	# create larger Hardklor file
+	with open(hk_file, "r") as open_file:
+		hk_text = open_file.read()
+	with tempfile.NamedTemporaryFile("w", suffix=".hk", delete=False) as tmp_file:
+		for _ in range(copies):
+			tmp_file.write(hk_text)
+
+	try:
+		size_mb = os.path.getsize(tmp_file.name)/1e6
+		for engine in ["python", "c"]:
+			start = time.perf_counter()
+			num_rows = len(hk2df(tmp_file.name, engine=engine))
+			elapsed = time.perf_counter() - start
+			print("%-6s %10d rows %8.3f s %12.0f rows/s %8.1f MB/s" % (engine, num_rows, elapsed, 
+																	 num_rows/elapsed, size_mb/elapsed))
+	finally:
+		os.remove(tmp_file.name)
+
+
+if __name__ == "__main__":
+	hk_file = sys.argv[1] if len(sys.argv) > 1 else "tests/hk_fixture.hk"
+	copies = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+	bench(hk_file, copies)
@@ -0,0 +1,89 @@
+"""
+Benchmark mzml.peak_df run time and file size for a zlib-compressed mzML
+file and an MS-Numpress (linear m/z, slof intensity) copy of the same run.
+
+If no MS-Numpress file is given, one is written next to the zlib file with
+pynumpress (pip install pynumpress).
+
+Usage: python benchmarks/bench_numpress.py [zlib mzML] [numpress mzML] [threads]
+"""
+import os
+import re
+import sys
+import time
+import zlib
+import base64
+import numpy as np
+import xml.etree.ElementTree as ET
+from msions.mzml import peak_df
+from msions.mzml import _array_spec
+from msions.mzml import _decode_binary
+from msions.mzml import _MZ_ARRAY
+from msions.mzml import _INTENSITY_ARRAY
+
+# pattern for binary data arrays and their compression cvParam
+_ARRAY = re.compile(rb"<binaryDataArray\b.*?</binaryDataArray>", re.S)
+_COMPRESSION = re.compile(rb'<cvParam[^>]*accession="MS:10005(74|76)"[^>]*/>')
+_NUMPRESS = {"linear": b'<cvParam cvRef="MS" accession="MS:1002312" name="MS-Numpress linear prediction compression" value=""/>',
+			 "slof": b'<cvParam cvRef="MS" accession="MS:1002314" name="MS-Numpress short logged float compression" value=""/>'}
+
+
+def numpress_mzml(input_mzml: str, output_mzml: str):
+	"""
+	Write a copy of an mzML file with MS-Numpress m/z (linear) and intensity (slof) arrays.
+	"""
+	import pynumpress
+
+	def encode(match):
+		block = match.group(0)
+		array_type, text, dtype, compression = _array_spec(ET.fromstring(block))
+		if array_type not in [_MZ_ARRAY, _INTENSITY_ARRAY]:
+			return block
+
+		# encode values
+		values = np.asarray(_decode_binary(text, dtype, compression), dtype="float64")
+		method = "linear" if array_type == _MZ_ARRAY else "slof"
+		if method == "linear":
+			encoded = pynumpress.encode_linear(values, pynumpress.optimal_linear_fixed_point(values))
+		else:
+			encoded = pynumpress.encode_slof(values, pynumpress.optimal_slof_fixed_point(values))
+		encoded = base64.b64encode(np.asarray(encoded, dtype="uint8").tobytes())
+
+		# replace compression and binary text
+		block = _COMPRESSION.sub(_NUMPRESS[method], block)
+		block = re.sub(rb'encodedLength="\d+"', b'encodedLength="%d"' % len(encoded), block)
+		return re.sub(rb"<binary>.*?</binary>", b"<binary>" + encoded + b"</binary>", block, flags=re.S)
+
+	with open(input_mzml, "rb") as open_file:
+		mzml_bytes = open_file.read()
+
+	# keep mzML element only (offsets of the index change)
+	start, stop = mzml_bytes.index(b"<mzML"), mzml_bytes.index(b"</mzML>") + len(b"</mzML>")
+	with open(output_mzml, "wb") as open_file:
+		open_file.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+		open_file.write(_ARRAY.sub(encode, mzml_bytes[start:stop]))
+
+
+def bench(zlib_mzml: str, numpress_file: str = None, threads: int = 4):
+	# write MS-Numpress copy
+	if numpress_file is None:
+		numpress_file = re.sub(r"\.mzML$", "", zlib_mzml, flags=re.I) + ".numpress.mzML"
+		numpress_mzml(zlib_mzml, numpress_file)
+
+	for name, input_mzml in [("zlib", zlib_mzml), ("numpress", numpress_file)]:
+		# define file size in MB
+		size_mb = os.path.getsize(input_mzml)/1e6
+
+		for num_threads in [None, threads]:
+			start = time.perf_counter()
+			peaks = peak_df(input_mzml, threads=num_threads)
+			elapsed = time.perf_counter() - start
+			print("%-8s %8.1f MB threads=%-4s %8.3f s %10.0f peaks/s" % (name, size_mb, num_threads or 1, elapsed,
+																	   len(peaks)/elapsed))
+
+
+if __name__ == "__main__":
+	zlib_mzml = sys.argv[1] if len(sys.argv) > 1 else "tests/mzml_fixture.mzML"
+	numpress_file = sys.argv[2] if len(sys.argv) > 2 else None
+	threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+	bench(zlib_mzml, numpress_file, threads)
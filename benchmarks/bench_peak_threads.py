@@ -0,0 +1,30 @@
+"""
+Benchmark mzml.peak_df run time for increasing numbers of threads decoding
+the binary arrays of one mzML file (threads=1 is the pymzml path).
+
+Usage: python benchmarks/bench_peak_threads.py [mzML file] [max threads]
+"""
+import os
+import sys
+import time
+from msions.mzml import peak_df
+
+
+def bench(input_mzml: str, max_threads: int = None):
+	# define file size in MB
+	size_mb = os.path.getsize(input_mzml)/1e6
+	max_threads = max_threads or os.cpu_count()
+
+	threads = 1
+	while threads <= max(max_threads, 2):
+		start = time.perf_counter()
+		peak_df(input_mzml, threads=threads)
+		elapsed = time.perf_counter() - start
+		print("peak_df threads=%-3d %8.3f s %8.1f MB/s" % (threads, elapsed, size_mb/elapsed))
+		threads *= 2
+
+
+if __name__ == "__main__":
+	input_mzml = sys.argv[1] if len(sys.argv) > 1 else "tests/mzml_fixture.mzML"
+	max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else None
+	bench(input_mzml, max_threads)
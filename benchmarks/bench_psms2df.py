@@ -0,0 +1,50 @@
+"""
+Benchmark percolator.psms2df PSMs/second and peak memory for the streamed
+XML parser and the list of dictionaries input.
+
+Usage: python benchmarks/bench_psms2df.py [Percolator XML file] [copies]
+
+The PSMs of the input file are repeated `copies` times into a temporary file
+to get a larger Percolator XML file.
+"""
+import os
+import re
+import sys
+import time
+import tempfile
+import tracemalloc
+from msions.percolator import parse_psms
+from msions.percolator import psms2df
+
+
+def bench(xml_file: str, copies: int = 5000):
+	# create larger Percolator XML file
+	with open(xml_file, "r") as open_file:
+		xml_text = open_file.read()
+	psms = re.search(r"<psms>(.*)</psms>", xml_text, re.S).group(1)
+	with tempfile.NamedTemporaryFile("w", suffix=".pout.xml", delete=False) as tmp_file:
+		tmp_file.write(xml_text[:xml_text.index("<psms>")+6])
+		for _ in range(copies):
+			tmp_file.write(psms)
+		tmp_file.write(xml_text[xml_text.index("</psms>"):])
+
+	try:
+		size_mb = os.path.getsize(tmp_file.name)/1e6
+		for name, func in [("dicts", lambda: psms2df(parse_psms(tmp_file.name))),
+						   ("stream", lambda: psms2df(tmp_file.name))]:
+			tracemalloc.start()
+			start = time.perf_counter()
+			num_rows = len(func())
+			elapsed = time.perf_counter() - start
+			peak_mb = tracemalloc.get_traced_memory()[1]/1e6
+			tracemalloc.stop()
+			print("%-6s %10d PSMs %8.3f s %12.0f PSMs/s %8.1f MB/s %8.1f MB peak" % (name, num_rows, elapsed, 
+																				   num_rows/elapsed, size_mb/elapsed, peak_mb))
+	finally:
+		os.remove(tmp_file.name)
+
+
+if __name__ == "__main__":
+	xml_file = sys.argv[1] if len(sys.argv) > 1 else "tests/psm_fixture.pout.xml"
+	copies = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+	bench(xml_file, copies)
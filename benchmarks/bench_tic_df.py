@@ -0,0 +1,41 @@
+"""
+Benchmark mzml.tic_df throughput (MB/s) for each mzML parser backend and
+for reading the TIC chromatogram (of all scans).
+
+Usage: python benchmarks/bench_tic_df.py [mzML file] [repeats]
+"""
+import os
+import sys
+import time
+from msions.mzml import tic_df
+
+
+def bench(input_mzml: str, repeats: int = 3):
+	# define file size in MB
+	size_mb = os.path.getsize(input_mzml)/1e6
+
+	for backend in ["pymzml", "xml"]:
+		for level in ["1", "all"]:
+			# keep the fastest run
+			best = float("inf")
+			for _ in range(repeats):
+				start = time.perf_counter()
+				tic_df(input_mzml, level=level, backend=backend)
+				best = min(best, time.perf_counter() - start)
+
+			print("%-7s level=%-4s %8.3f s %8.1f MB/s" % (backend, level, best, size_mb/best))
+
+	# keep the fastest chromatogram run (only used for all scans)
+	best = float("inf")
+	for _ in range(repeats):
+		start = time.perf_counter()
+		tic_df(input_mzml, level="all", chromatogram=True)
+		best = min(best, time.perf_counter() - start)
+
+	print("%-7s level=%-4s %8.3f s %8.1f MB/s" % ("chrom", "all", best, size_mb/best))
+
+
+if __name__ == "__main__":
+	input_mzml = sys.argv[1] if len(sys.argv) > 1 else "tests/mzml_fixture.mzML"
+	repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+	bench(input_mzml, repeats)
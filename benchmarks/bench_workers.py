@@ -0,0 +1,33 @@
+"""
+Benchmark mzml.tic_df and mzml.peak_df run time for increasing numbers of
+worker processes parsing shards of one mzML file.
+
+Usage: python benchmarks/bench_workers.py [mzML file] [max workers]
+"""
+import os
+import sys
+import time
+from msions.mzml import tic_df
+from msions.mzml import peak_df
+
+
+def bench(input_mzml: str, max_workers: int = None):
+	# define file size in MB
+	size_mb = os.path.getsize(input_mzml)/1e6
+	max_workers = max_workers or os.cpu_count()
+
+	for name, func in [("tic_df", lambda workers: tic_df(input_mzml, level="all", workers=workers)),
+					   ("peak_df", lambda workers: peak_df(input_mzml, workers=workers))]:
+		workers = 1
+		while workers <= max_workers:
+			start = time.perf_counter()
+			func(workers)
+			elapsed = time.perf_counter() - start
+			print("%-7s workers=%-3d %8.3f s %8.1f MB/s" % (name, workers, elapsed, size_mb/elapsed))
+			workers *= 2
+
+
+if __name__ == "__main__":
+	input_mzml = sys.argv[1] if len(sys.argv) > 1 else "tests/mzml_fixture.mzML"
+	max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+	bench(input_mzml, max_workers)
@@ -0,0 +1,274 @@
+"""
+This module contains functions that are useful for processing
+many MS runs at once in Python.
+"""
+import os
+import argparse
+import hashlib
+import pandas as pd
+import msions
+import msions.cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Union
+from msions.mzml import tic_df
+from msions.hardklor import hk2df
+from msions.hardklor import summarize_df
+from msions.encyclopedia import dia_df
+from msions.encyclopedia import bulk_match_hk
+from msions.kronik import simple_df
+from msions.percolator import psms2df
+from msions.percolator import match_kro
+
+# manifest columns with input files
+_FILE_COLS = ["mzml", "hk", "elib", "kro", "pout"]
+
+
+def read_manifest(manifest: Union[pd.DataFrame, str]) -> pd.DataFrame:
+	"""
+	Read a manifest of runs to process.
+
+	The manifest needs an mzml column and can have run, hk, elib, kro, and pout
+	columns. Relative file paths are relative to the manifest file.
+
+	Parameters
+	----------
+	manifest : pd.DataFrame or str
+		The manifest pandas DataFrame or a comma/tab-delimited manifest file.
+
+	Returns
+	-------
+	pd.DataFrame
+		A pandas DataFrame with one row per run.
+
+	Examples
+	-------
+	>>> from msions.batch import read_manifest
+	>>> read_manifest("runs.tsv")
+	"""
+	# if it's a manifest file
+	if isinstance(manifest, str):
+		manifest_dir = os.path.dirname(os.path.abspath(manifest))
+		with open(manifest, "r") as open_file:
+			sep = "\t" if "\t" in open_file.readline() else ","
+		manifest_df = pd.read_csv(manifest, sep=sep, dtype=str)
+
+	# if it's a data frame already
+	else:
+		manifest_dir = os.getcwd()
+		manifest_df = manifest.copy()
+
+	assert "mzml" in manifest_df.columns, "Manifest needs an mzml column."
+
+	# add missing file columns
+	for col in _FILE_COLS:
+		if col not in manifest_df.columns:
+			manifest_df[col] = None
+
+	# resolve file paths
+	for col in _FILE_COLS:
+		manifest_df[col] = [os.path.join(manifest_dir, path) if isinstance(path, str) and path.strip() else None
+							for path in manifest_df[col]]
+
+	# name runs by mzML file if not given
+	if "run" not in manifest_df.columns:
+		manifest_df["run"] = None
+	manifest_df["run"] = [run if isinstance(run, str) and run.strip() else os.path.basename(mzml).split(".")[0]
+						  for run, mzml in zip(manifest_df["run"], manifest_df["mzml"])]
+
+	assert manifest_df["run"].is_unique, "Run names in manifest are not unique."
+
+	# use None for missing files
+	manifest_df = manifest_df[["run"] + _FILE_COLS].astype(object)
+	manifest_df = manifest_df.where(manifest_df.notna(), None)
+
+	return manifest_df.reset_index(drop=True)
+
+
+def process_run(run_info: dict, faims: bool = False) -> Dict[str, pd.DataFrame]:
+	"""
+	Process one run of a manifest.
+
+	MS1 scans are summarized from the mzML file. Hardklor features are summarized
+	per scan if given and matched to EncyclopeDIA output if an elib is given.
+	Percolator PSMs are matched to Kronik features if both are given.
+
+	Parameters
+	----------
+	run_info : dict
+		The manifest row of the run (run, mzml, hk, elib, kro, and pout).
+	faims : bool
+		Whether data is from FAIMS runs
+
+	Returns
+	-------
+	Dict[str, pd.DataFrame]
+		A "scans" pandas DataFrame of MS1 scans and, if Kronik and Percolator
+		files are given, a "psms" pandas DataFrame of matched PSMs.
+
+	Examples
+	-------
+	>>> from msions.batch import process_run
+	>>> process_run({"run": "test", "mzml": "test.mzML", "hk": "test.hk"})
+	"""
+	# summarize MS1 scans
+	ms1_df = tic_df(run_info["mzml"], backend="xml")
+	scan_df = ms1_df.copy()
+	psm_df = None
+
+	# if Hardklor file is given
+	if run_info.get("hk"):
+		hk_df = hk2df(run_info["hk"])
+
+		# add summed feature signal for each scan
+		feat_df = summarize_df(hk_df, full_ms1_df=ms1_df)
+		scan_df["feat_TIC"] = feat_df["TIC"].to_numpy()
+		scan_df["feat_ions"] = feat_df["ions"].to_numpy()
+
+		# if EncyclopeDIA file is given
+		if run_info.get("elib"):
+			# add summed identified feature signal for each scan
+			hk_df["in_encyclo"] = bulk_match_hk(hk_df, dia_df(run_info["elib"]))
+			id_df = summarize_df(hk_df[hk_df["in_encyclo"] > 0].reset_index(drop=True), full_ms1_df=ms1_df)
+			scan_df["id_TIC"] = id_df["TIC"].to_numpy()
+			scan_df["id_ions"] = id_df["ions"].to_numpy()
+
+	# if Kronik and Percolator files are given
+	if run_info.get("kro") and run_info.get("pout"):
+		kro_df = simple_df(run_info["kro"], cv="given" if faims else None)
+		psm_df = psms2df(run_info["pout"])
+		ms_df = tic_df(run_info["mzml"], level="all", include_ms1_info=True, faims=faims, backend="xml")
+
+		# match PSMs to Kronik features
+		match_kro(kro_df, psm_df, ms_df, faims=faims)
+
+	# add run name
+	results = {"scans": scan_df, "psms": psm_df}
+	for name, df in results.items():
+		if df is not None:
+			df.insert(0, "run", run_info["run"])
+
+	return results
+
+
+def _fingerprint(run_info: dict, faims: bool) -> str:
+	"""
+	Create a key for a run from the msions and cache schema versions and its input files 
+	(path, size, and modification time).
+	"""
+	key = hashlib.sha1(repr((msions.__version__, msions.cache._SCHEMA_VERSION, faims)).encode())
+	for col in _FILE_COLS:
+		path = run_info.get(col)
+		if path:
+			stat = os.stat(path)
+			key.update(("%s|%s|%d|%d" % (col, os.path.abspath(path), stat.st_size, stat.st_mtime_ns)).encode())
+
+	return key.hexdigest()[:16]
+
+
+def _cached_run(run_info: dict, faims: bool = False, cache_dir: str = None) -> Dict[str, pd.DataFrame]:
+	"""
+	Process one run, reusing the cached results if the input files have not changed.
+	"""
+	if cache_dir is None:
+		return process_run(run_info, faims=faims)
+
+	# look for cached results
+	cache_file = os.path.join(cache_dir, "%s-%s.pkl" % (run_info["run"], _fingerprint(run_info, faims)))
+	if os.path.exists(cache_file):
+		return pd.read_pickle(cache_file)
+
+	# process run and cache results (in a temporary file of this process first)
+	results = process_run(run_info, faims=faims)
+	tmp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+	try:
+		pd.to_pickle(results, tmp_file)
+		os.replace(tmp_file, cache_file)
+	finally:
+		if os.path.exists(tmp_file):
+			os.remove(tmp_file)
+
+	return results
+
+
+def run_batch(manifest: Union[pd.DataFrame, str], workers: int = None, cache_dir: str = None,
+			  faims: bool = False) -> Dict[str, pd.DataFrame]:
+	"""
+	Process all runs of a manifest in parallel.
+
+	Each run is processed with process_run in its own worker process and the
+	results are combined into tables keyed by run.
+
+	Parameters
+	----------
+	manifest : pd.DataFrame or str
+		The manifest pandas DataFrame or manifest file (see read_manifest).
+	workers : int
+		Number of worker processes (number of CPUs if not given, 1 to run in this process).
+	cache_dir : str
+		Directory used to cache the results of each run.
+	faims : bool
+		Whether data is from FAIMS runs
+
+	Returns
+	-------
+	Dict[str, pd.DataFrame]
+		A "scans" pandas DataFrame of MS1 scans and a "psms" pandas DataFrame
+		of matched PSMs for all runs.
+
+	Examples
+	-------
+	>>> from msions.batch import run_batch
+	>>> results = run_batch("runs.tsv", workers=8, cache_dir="msions_cache")
+	>>> results["scans"].groupby("run").ions.sum()
+	"""
+	manifest_df = read_manifest(manifest)
+	run_infos = manifest_df.to_dict("records")
+
+	# create cache directory
+	if cache_dir is not None:
+		os.makedirs(cache_dir, exist_ok=True)
+
+	# process runs
+	if workers == 1 or len(run_infos) <= 1:
+		run_results = [_cached_run(run_info, faims, cache_dir) for run_info in run_infos]
+	else:
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			run_results = list(executor.map(_cached_run, run_infos,
+											[faims]*len(run_infos), [cache_dir]*len(run_infos)))
+
+	# combine results of all runs
+	combined = {}
+	for name in ["scans", "psms"]:
+		dfs = [results[name] for results in run_results if results[name] is not None]
+		combined[name] = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=["run"])
+
+	return combined
+
+
+def main(argv=None):
+	"""
+	Command line entry point for run_batch.
+
+	Examples
+	-------
+	$ msions-batch runs.tsv -o results -j 8 --cache-dir msions_cache
+	"""
+	parser = argparse.ArgumentParser(description="Process a manifest of MS runs with msions.")
+	parser.add_argument("manifest", help="comma/tab-delimited file with run, mzml, hk, elib, kro, and pout columns")
+	parser.add_argument("-o", "--output", default=".", help="directory for the combined tables")
+	parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+	parser.add_argument("--cache-dir", default=None, help="directory used to cache the results of each run")
+	parser.add_argument("--faims", action="store_true", help="data is from FAIMS runs")
+	args = parser.parse_args(argv)
+
+	results = run_batch(args.manifest, workers=args.workers, cache_dir=args.cache_dir, faims=args.faims)
+
+	# write combined tables
+	os.makedirs(args.output, exist_ok=True)
+	for name, df in results.items():
+		if len(df) > 0:
+			df.to_csv(os.path.join(args.output, name + ".tsv"), sep="\t", index=False)
+
+
+if __name__ == "__main__":
+	main()
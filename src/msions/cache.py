@@ -0,0 +1,285 @@
+"""
+This module contains functions that are useful for caching parsed
+MS files on disk in Python.
+
+Caching is off by default. Once enabled (with enable_cache or the
+MSIONS_CACHE_DIR environment variable), the DataFrames created from files by
+tic_df, peak_df, hk2df, simple_df, psms2df, peps2df, and dia_df are stored in a
+columnar format (Feather if pyarrow is installed, pickle otherwise) and loaded
+from disk the next time the same function is called with the same file and arguments.
+"""
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import functools
+import pandas as pd
+import msions
+
+try:
+	import pyarrow.feather as feather
+except ImportError:
+	feather = None
+
+# cache settings
+_CONFIG = {"enabled": False, "cache_dir": None, "max_bytes": 10e9}
+
+# file extensions of cache files (DataFrames, file fingerprints, mzML offsets, and gzip seek points)
+_CACHE_EXTS = (".feather", ".pkl", ".json", ".npz", ".gzidx")
+
+# version of the cached DataFrames (increase when the output of a cached function changes)
+_SCHEMA_VERSION = 2
+
+
+def enable_cache(cache_dir: str = None, max_bytes: float = 10e9):
+	"""
+	Cache the DataFrames created from files.
+
+	Parameters
+	----------
+	cache_dir : str
+		Directory to store cached DataFrames in. If not given, they are stored in
+		a .msions_cache directory next to each source file.
+	max_bytes : float
+		Maximum size of a cache directory. The least recently used cache files 
+		(DataFrames, file fingerprints, mzML offsets, and gzip seek points) are 
+		removed once it is exceeded, which is checked whenever a DataFrame is cached.
+
+	Examples
+	-------
+	>>> from msions.cache import enable_cache
+	>>> from msions.mzml import tic_df
+	>>> enable_cache("msions_cache")
+	>>> tic_df("test.mzML")  # parses the file
+	>>> tic_df("test.mzML")  # loads from the cache
+	"""
+	_CONFIG["enabled"] = True
+	_CONFIG["cache_dir"] = cache_dir
+	_CONFIG["max_bytes"] = max_bytes
+
+
+def disable_cache():
+	"""
+	Stop caching the DataFrames created from files.
+
+	Examples
+	-------
+	>>> from msions.cache import disable_cache
+	>>> disable_cache()
+	"""
+	_CONFIG["enabled"] = False
+
+
+def source_cache_dir(source: str) -> str:
+	"""
+	Find (and create) the cache directory of a source file.
+
+	Parameters
+	----------
+	source : str
+		The source file.
+
+	Returns
+	-------
+	str
+		The configured cache directory or the .msions_cache directory next to the
+		source file (None if caching is disabled).
+
+	Examples
+	-------
+	>>> from msions.cache import enable_cache, source_cache_dir
+	>>> enable_cache()
+	>>> source_cache_dir("test.mzML")
+	"""
+	if not _CONFIG["enabled"]:
+		return None
+
+	if _CONFIG["cache_dir"] is not None:
+		cache_dir = _CONFIG["cache_dir"]
+	else:
+		cache_dir = os.path.join(os.path.dirname(os.path.abspath(source)), ".msions_cache")
+	os.makedirs(cache_dir, exist_ok=True)
+
+	return cache_dir
+
+
+def file_fingerprint(source: str, cache_dir: str = None) -> dict:
+	"""
+	Create a fingerprint of a file from its path, size, modification time, and content hash.
+
+	The content hash is only recomputed when the size or modification time changes.
+
+	Parameters
+	----------
+	source : str
+		The file.
+	cache_dir : str
+		Directory to remember content hashes in.
+
+	Returns
+	-------
+	dict
+		The path, size, mtime, and hash of the file.
+
+	Examples
+	-------
+	>>> from msions.cache import file_fingerprint
+	>>> file_fingerprint("test.mzML")
+	"""
+	path = os.path.abspath(source)
+	stat = os.stat(path)
+	fingerprint = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": None}
+
+	# look for remembered content hash
+	fp_file = None
+	if cache_dir is not None:
+		fp_file = os.path.join(cache_dir, "fp-%s.json" % hashlib.sha1(path.encode()).hexdigest()[:16])
+		if os.path.exists(fp_file):
+			with open(fp_file, "r") as open_file:
+				old_fingerprint = json.load(open_file)
+			if all(old_fingerprint.get(key) == fingerprint[key] for key in ["path", "size", "mtime"]):
+				return old_fingerprint
+
+	# hash file contents
+	content_hash = hashlib.blake2b(digest_size=16)
+	with open(path, "rb") as open_file:
+		for block in iter(lambda: open_file.read(1 << 20), b""):
+			content_hash.update(block)
+	fingerprint["hash"] = content_hash.hexdigest()
+
+	# remember content hash
+	if fp_file is not None:
+		with open(fp_file, "w") as open_file:
+			json.dump(fingerprint, open_file)
+
+	return fingerprint
+
+
+def _store(df: pd.DataFrame, entry: str):
+	"""
+	Store a DataFrame in the cache (Feather if possible, pickle otherwise).
+	"""
+	if feather is not None:
+		try:
+			feather.write_feather(df, entry + ".feather.tmp", compression="uncompressed")
+			os.replace(entry + ".feather.tmp", entry + ".feather")
+			return
+		except Exception:
+			# some DataFrames (e.g., with a custom index) cannot be stored as Feather
+			if os.path.exists(entry + ".feather.tmp"):
+				os.remove(entry + ".feather.tmp")
+
+	with open(entry + ".pkl.tmp", "wb") as open_file:
+		pickle.dump(df, open_file, protocol=pickle.HIGHEST_PROTOCOL)
+	os.replace(entry + ".pkl.tmp", entry + ".pkl")
+
+
+def _load(entry: str) -> pd.DataFrame:
+	"""
+	Load a DataFrame from the cache (None if it is not cached).
+	"""
+	if feather is not None and os.path.exists(entry + ".feather"):
+		cache_file = entry + ".feather"
+		df = feather.read_feather(cache_file)
+	elif os.path.exists(entry + ".pkl"):
+		cache_file = entry + ".pkl"
+		with open(cache_file, "rb") as open_file:
+			df = pickle.load(open_file)
+	else:
+		return None
+
+	# mark as recently used
+	os.utime(cache_file)
+
+	return df
+
+
+def _evict(cache_dir: str):
+	"""
+	Remove the least recently used cache files until the cache directory is small enough.
+
+	Temporary files that are still being written are neither counted nor removed.
+	"""
+	entries = []
+	for file_name in os.listdir(cache_dir):
+		if file_name.endswith(_CACHE_EXTS) and ".tmp" not in file_name:
+			stat = os.stat(os.path.join(cache_dir, file_name))
+			entries.append((stat.st_mtime_ns, stat.st_size, file_name))
+
+	total_bytes = sum(size for _, size, _ in entries)
+	for _, size, file_name in sorted(entries):
+		if total_bytes <= _CONFIG["max_bytes"]:
+			break
+		os.remove(os.path.join(cache_dir, file_name))
+		total_bytes -= size
+
+
+def cached(func=None, ignore: tuple = ()):
+	"""
+	Cache the DataFrames a function creates from a file given as its first argument.
+
+	The cache key contains the msions and cache schema versions, the function, the file
+	fingerprint, and all other arguments except the ignored ones.
+
+	Parameters
+	----------
+	func : callable
+		The function.
+	ignore : tuple
+		Names of arguments that do not change the DataFrame (e.g., the number of 
+		worker processes), so they are left out of the cache key.
+
+	Examples
+	-------
+	>>> from msions.cache import cached
+	>>> @cached
+	... def read_file(input_file, option=False):
+	...     ...
+	>>> @cached(ignore=("workers",))
+	... def read_file(input_file, option=False, workers=None):
+	...     ...
+	"""
+	if func is None:
+		return functools.partial(cached, ignore=ignore)
+
+	signature = inspect.signature(func)
+	source_param = next(iter(signature.parameters))
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		# only cache file inputs when caching is enabled
+		if not _CONFIG["enabled"] or not args or not isinstance(args[0], str) or not os.path.isfile(args[0]):
+			return func(*args, **kwargs)
+
+		# create cache key from file and arguments
+		bound = signature.bind(*args, **kwargs)
+		bound.apply_defaults()
+		source = args[0]
+		cache_dir = source_cache_dir(source)
+		fingerprint = file_fingerprint(source, cache_dir)
+		arguments = [(name, value) for name, value in bound.arguments.items() 
+					 if name != source_param and name not in ignore]
+		key = hashlib.sha1(repr((msions.__version__, _SCHEMA_VERSION, func.__module__, func.__qualname__, 
+								 fingerprint, arguments)).encode()).hexdigest()
+		entry = os.path.join(cache_dir, "%s-%s" % (func.__name__, key[:24]))
+
+		# load cached DataFrame
+		df = _load(entry)
+		if df is not None:
+			return df
+
+		# create and cache DataFrame
+		df = func(*args, **kwargs)
+		if isinstance(df, pd.DataFrame):
+			_store(df, entry)
+			_evict(cache_dir)
+
+		return df
+
+	return wrapper
+
+
+# enable cache from environment
+if os.environ.get("MSIONS_CACHE_DIR"):
+	enable_cache(os.environ["MSIONS_CACHE_DIR"])
@@ -2,19 +2,108 @@
 This module contains functions that are useful for interacting with
 EncyclopeDIA files in Python.
 """
+import os
 import sqlite3
+from urllib.request import pathname2url
 import pandas as pd
 import numpy as np
+from typing import List, Tuple, Union
+from msions.utils import window_pairs
+from msions.cache import cached
 
 
-def dia_df(input_elib: str) -> pd.DataFrame:
+# default columns of entries DataFrames
+_ENTRY_COLS = ["PrecursorMz", "PrecursorCharge", "PeptideModSeq", "PeptideSeq", "RtInSeconds", 
+			   "RTInSecondsStart", "RTInSecondsStop"]
+
+
+def _connect_elib(input_elib: str) -> sqlite3.Connection:
+	"""
+	Open an elib file read-only.
+
+	The file is opened as immutable (no locking or change detection), so it must
+	not be written while it is read. Reads are memory-mapped with a larger page cache.
+	"""
+	uri = "file:%s?mode=ro&immutable=1" % pathname2url(os.path.abspath(input_elib))
+	elib_connection = sqlite3.connect(uri, uri=True)
+	elib_connection.execute("PRAGMA mmap_size = 1073741824")
+	elib_connection.execute("PRAGMA cache_size = -65536")
+
+	return elib_connection
+
+
+def _entries_query(elib_connection: sqlite3.Connection, columns: List[str] = None, q_value: float = None, 
+				   charges: List[int] = None, mz_range: Tuple[float, float] = None, 
+				   rt_range: Tuple[float, float] = None) -> Tuple[str, list]:
+	"""
+	Create the SQL query and parameters selecting filtered entries.
+	"""
+	# check columns against table
+	table_cols = {row[1].lower() for row in elib_connection.execute("PRAGMA table_info(entries)")}
+	columns = _ENTRY_COLS if columns is None else list(columns)
+	unknown_cols = [col for col in columns if col.lower() not in table_cols]
+	if unknown_cols:
+		raise ValueError("Columns not in entries table: %s" % ", ".join(unknown_cols))
+
+	conditions = []
+	params = []
+
+	# filter by precursor charge
+	if charges is not None:
+		charges = [int(charge) for charge in np.atleast_1d(charges)]
+		conditions.append("PrecursorCharge IN (%s)" % ", ".join("?"*len(charges)))
+		params.extend(charges)
+
+	# filter by precursor m/z
+	if mz_range is not None:
+		conditions.append("PrecursorMz BETWEEN ? AND ?")
+		params.extend(float(mz) for mz in mz_range)
+
+	# filter by retention time (seconds)
+	if rt_range is not None:
+		conditions.append("RTInSeconds BETWEEN ? AND ?")
+		params.extend(float(rt) for rt in rt_range)
+
+	# filter by peptide q-value
+	if q_value is not None:
+		if elib_connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peptidescores'").fetchone() is None:
+			raise ValueError("No peptidescores table in elib file to filter by q-value.")
+		conditions.append("""EXISTS (SELECT 1 FROM peptidescores 
+									 WHERE peptidescores.PeptideModSeq = entries.PeptideModSeq 
+									 AND peptidescores.PrecursorCharge = entries.PrecursorCharge 
+									 AND peptidescores.QValue <= ?)""")
+		params.append(float(q_value))
+
+	query = "SELECT %s FROM entries" % ", ".join(columns)
+	if conditions:
+		query += " WHERE " + " AND ".join(conditions)
+
+	return query, params
+
+
+@cached
+def dia_df(input_elib: str, columns: List[str] = None, q_value: float = None, charges: List[int] = None, 
+		   mz_range: Tuple[float, float] = None, rt_range: Tuple[float, float] = None) -> pd.DataFrame:
 	"""
 	Create a pandas DataFrame from an EncyclopeDIA elib output
+
+	Filters are applied by the SQLite query, so entries that are filtered out are
+	never loaded. The elib file is opened read-only.
 	
 	Parameters
 	----------
 	input_elib : str
 		The input elib file.
+	columns : List[str]
+		Columns of the entries table to select (the columns below if not given).
+	q_value : float
+		Only select entries whose peptide q-value (peptidescores table) is at most this.
+	charges : List[int]
+		Only select entries with these precursor charges.
+	mz_range : Tuple[float, float]
+		Only select entries with a precursor m/z in this range.
+	rt_range : Tuple[float, float]
+		Only select entries with a retention time (seconds) in this range.
 		
 	Returns
 	-------
@@ -26,21 +115,211 @@ def dia_df(input_elib: str) -> pd.DataFrame:
 	-------
 	>>> from msions.encyclopedia import dia_df
 	>>> dia_df("test.elib")
+	>>> dia_df("test.elib", q_value=0.01, charges=[2, 3], rt_range=(600, 3600))
 	"""
 	# create connection object
-	elib_connection = sqlite3.connect(input_elib)
+	elib_connection = _connect_elib(input_elib)
 
-	# create DataFrame with SQL query
-	encyclo_df = pd.read_sql_query("""SELECT PrecursorMz, PrecursorCharge, PeptideModSeq, PeptideSeq, RtInSeconds, RTInSecondsStart, RTInSecondsStop
-									FROM entries""", elib_connection)
+	try:
+		# create DataFrame with SQL query
+		query, params = _entries_query(elib_connection, columns, q_value, charges, mz_range, rt_range)
+		encyclo_df = pd.read_sql_query(query, elib_connection, params=params)
 
-	# close connection
-	elib_connection.close()
+	finally:
+		# close connection
+		elib_connection.close()
 
 	# return data frame
 	return encyclo_df
 
 
+def iter_dia_chunks(input_elib: str, chunk_rows: int = 100000, columns: List[str] = None, q_value: float = None, 
+					charges: List[int] = None, mz_range: Tuple[float, float] = None, 
+					rt_range: Tuple[float, float] = None):
+	"""
+	Iterate the entries of an EncyclopeDIA elib output in chunks of pandas DataFrames.
+
+	Parameters
+	----------
+	input_elib : str
+		The input elib file.
+	chunk_rows : int
+		Number of entries per chunk.
+	columns, q_value, charges, mz_range, rt_range
+		Selected columns and filters (see dia_df).
+
+	Yields
+	-------
+	pd.DataFrame
+		A pandas DataFrame of at most chunk_rows entries with the columns of dia_df.
+
+	Examples
+	-------
+	>>> from msions.encyclopedia import iter_dia_chunks
+	>>> for chunk_df in iter_dia_chunks("test.elib", chunk_rows=500000, q_value=0.01):
+	...     print(len(chunk_df))
+	"""
+	# create connection object
+	elib_connection = _connect_elib(input_elib)
+
+	try:
+		# read SQL query in chunks
+		query, params = _entries_query(elib_connection, columns, q_value, charges, mz_range, rt_range)
+		for chunk_df in pd.read_sql_query(query, elib_connection, params=params, chunksize=chunk_rows):
+			yield chunk_df
+
+	finally:
+		# close connection
+		elib_connection.close()
+
+
+def _index_stamp(input_elib: str) -> str:
+	"""
+	Identify the version of an elib file by its path, size, and modification time.
+	"""
+	stat = os.stat(input_elib)
+	return "%s|%d|%d" % (os.path.abspath(input_elib), stat.st_size, stat.st_mtime_ns)
+
+
+def _write_elib_index(input_elib: str, index_file: str, stamp: str, chunk_rows: int):
+	"""
+	Write the R*Tree index of the entries of an elib file and the stamp of the elib file.
+	"""
+	if os.path.exists(index_file):
+		os.remove(index_file)
+	index_connection = sqlite3.connect(index_file)
+	index_connection.execute("PRAGMA journal_mode = OFF")
+	index_connection.execute("PRAGMA synchronous = OFF")
+	index_connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+	index_connection.execute("""CREATE VIRTUAL TABLE entries_rtree USING rtree(id, min_mz, max_mz, min_rt, max_rt, 
+							 min_charge, max_charge, +PrecursorMz REAL, +RTInSecondsStart REAL, 
+							 +RTInSecondsStop REAL)""")
+
+	# copy entries (R*Tree coordinates are 32-bit, so exact values are kept too)
+	elib_connection = _connect_elib(input_elib)
+	try:
+		cursor = elib_connection.execute("""SELECT rowid, PrecursorMz, PrecursorMz, 
+										 MIN(RTInSecondsStart, RTInSecondsStop), MAX(RTInSecondsStart, RTInSecondsStop),
+										 PrecursorCharge, PrecursorCharge, PrecursorMz, RTInSecondsStart, 
+										 RTInSecondsStop FROM entries""")
+		for rows in iter(lambda: cursor.fetchmany(chunk_rows), []):
+			index_connection.executemany("INSERT INTO entries_rtree VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+	finally:
+		elib_connection.close()
+
+	index_connection.execute("INSERT INTO meta VALUES ('elib', ?)", (stamp,))
+	index_connection.commit()
+	index_connection.close()
+
+
+def build_elib_index(input_elib: str, index_file: str = None, chunk_rows: int = 100000) -> str:
+	"""
+	Build an R*Tree index of the entries of an EncyclopeDIA elib output.
+
+	The index is a sidecar SQLite file with a (PrecursorMz, RT window, 
+	PrecursorCharge) R*Tree over all entries, so entries can be matched without
+	loading the library. It is only rebuilt if the elib file changed, so runs 
+	sharing a library reuse the same index.
+
+	Parameters
+	----------
+	input_elib : str
+		The input elib file.
+	index_file : str
+		The index file (the elib file with an .rtree extension added if not given).
+	chunk_rows : int
+		Number of entries inserted at a time.
+
+	Returns
+	-------
+	str
+		The index file.
+
+	Examples
+	-------
+	>>> from msions.encyclopedia import build_elib_index
+	>>> build_elib_index("test.elib")
+	'test.elib.rtree'
+	"""
+	if index_file is None:
+		index_file = input_elib + ".rtree"
+
+	# reuse index if elib file did not change
+	stamp = _index_stamp(input_elib)
+	if os.path.exists(index_file):
+		index_connection = sqlite3.connect(index_file)
+		try:
+			row = index_connection.execute("SELECT value FROM meta WHERE key = 'elib'").fetchone()
+		except sqlite3.DatabaseError:
+			row = None
+		finally:
+			index_connection.close()
+		if row is not None and row[0] == stamp:
+			return index_file
+
+	# create index in a temporary file of this process (other processes may build the same index)
+	tmp_file = "%s.%d.tmp" % (index_file, os.getpid())
+	try:
+		_write_elib_index(input_elib, tmp_file, stamp, chunk_rows)
+		os.replace(tmp_file, index_file)
+	finally:
+		if os.path.exists(tmp_file):
+			os.remove(tmp_file)
+
+	return index_file
+
+
+def _index_match_pairs(hk_df: pd.DataFrame, index_file: str, rtol: float = 5e-6, 
+					   chunk_rows: int = 100000) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Find the positions of Hardklor features and the rowids of elib entries that match through an R*Tree index.
+	"""
+	# define Hardklor info to match (np.isclose tolerance, slightly widened)
+	hk_mz = hk_df.mz.to_numpy(dtype=float)
+	hk_rt = hk_df.rt_s.to_numpy(dtype=float)
+	tol = (1e-8 + rtol*np.abs(hk_mz))*(1 + 1e-9)
+	features = zip(range(len(hk_df)), (hk_mz - tol).tolist(), (hk_mz + tol).tolist(), hk_rt.tolist(), 
+				   hk_df.charge.to_numpy(dtype=float).tolist())
+
+	hk_pos_lst = []
+	elib_rowid_lst = []
+
+	index_connection = sqlite3.connect("file:%s?mode=ro" % pathname2url(os.path.abspath(index_file)), uri=True)
+	try:
+		# load features into temporary table
+		index_connection.execute("""CREATE TEMP TABLE features (pos INTEGER PRIMARY KEY, low_mz REAL, high_mz REAL, 
+								 rt REAL, charge REAL)""")
+		index_connection.executemany("INSERT INTO temp.features VALUES (?, ?, ?, ?, ?)", features)
+
+		# query R*Tree for each feature
+		cursor = index_connection.execute("""SELECT features.pos, entries_rtree.id, entries_rtree.PrecursorMz, 
+										  entries_rtree.RTInSecondsStart, entries_rtree.RTInSecondsStop
+										  FROM temp.features CROSS JOIN entries_rtree
+										  WHERE entries_rtree.max_mz >= features.low_mz 
+										  AND entries_rtree.min_mz <= features.high_mz
+										  AND entries_rtree.min_rt <= features.rt AND entries_rtree.max_rt >= features.rt
+										  AND entries_rtree.min_charge <= features.charge 
+										  AND entries_rtree.max_charge >= features.charge""")
+
+		for rows in iter(lambda: cursor.fetchmany(chunk_rows), []):
+			pair_hk, pair_elib, elib_mz, elib_start, elib_stop = np.array(rows, dtype=float).T
+			pair_hk = pair_hk.astype("int64")
+
+			# keep candidates within exact tolerance and retention time window
+			keep = np.isclose(elib_mz, hk_mz[pair_hk], rtol=rtol)
+			keep &= (elib_start <= hk_rt[pair_hk]) & (elib_stop >= hk_rt[pair_hk])
+			hk_pos_lst.append(pair_hk[keep])
+			elib_rowid_lst.append(pair_elib[keep].astype("int64"))
+
+	finally:
+		index_connection.close()
+
+	hk_pos = np.concatenate(hk_pos_lst) if hk_pos_lst else np.array([], dtype="int64")
+	elib_rowid = np.concatenate(elib_rowid_lst) if elib_rowid_lst else np.array([], dtype="int64")
+
+	return hk_pos, elib_rowid
+
+
 def match_hk(ref_row: pd.Series, other_df: pd.DataFrame) -> int: 
 	""" 
 	Match EncyclopeDIA elib output to Hardklor output
@@ -82,3 +361,113 @@ def match_hk(ref_row: pd.Series, other_df: pd.DataFrame) -> int:
 
 	# return number of matches
 	return(small_df.shape[0])
+
+
+def bulk_match_hk(hk_df: pd.DataFrame, encyclo_df: Union[pd.DataFrame, str], return_idx: bool = False, 
+				  rtol: float = 5e-6, index_file: str = None) -> Union[pd.Series, Tuple[pd.Series, pd.DataFrame]]:
+	"""
+	Match all Hardklor features to EncyclopeDIA elib output at once.
+
+	Gives the same counts as applying match_hk to every row, but the elib
+	entries are grouped by charge and sorted by PrecursorMz so that each
+	feature only looks at entries inside its m/z tolerance window.
+
+	If an elib file is given instead of a DataFrame, the entries are matched
+	through an R*Tree index (see build_elib_index), so the library does not
+	need to fit in memory.
+
+	Parameters
+	----------
+	hk_df : pd.DataFrame
+		The Hardklor pandas DataFrame (requires mz, charge, and rt_s columns).
+	encyclo_df : pd.DataFrame or str
+		The EncyclopeDIA pandas DataFrame (requires PrecursorMz, PrecursorCharge,
+		RTInSecondsStart, and RTInSecondsStop columns) or the elib file.
+	return_idx : bool
+		Also return the indices of the matched Hardklor and elib rows.
+	rtol : float
+		Relative m/z tolerance (5e-6 is 5 ppm).
+	index_file : str
+		The R*Tree index file used for an elib file (see build_elib_index).
+
+	Returns
+	-------
+	pd.Series or (pd.Series, pd.DataFrame)
+		Number of elib matches for each Hardklor feature. If return_idx is True,
+		a DataFrame with hk_idx and elib_idx columns for every match is also returned
+		(elib_idx is the rowid of the entries table if an elib file is given).
+
+	Examples
+	-------
+	>>> import msions.hardklor as hk
+	>>> import msions.encyclopedia as encyclo
+	>>> hk_df = hk.hk2df("test.hk")
+	>>> encyclo_df = encyclo.dia_df("test.elib")
+	>>> hk_df["in_encyclo"] = encyclo.bulk_match_hk(hk_df, encyclo_df)
+	>>> hk_df["in_encyclo"] = encyclo.bulk_match_hk(hk_df, "test.elib")
+	"""
+	# if it's an elib file
+	if isinstance(encyclo_df, str):
+		# match through R*Tree index
+		hk_pos, elib_pos = _index_match_pairs(hk_df, build_elib_index(encyclo_df, index_file), rtol)
+		count_series = pd.Series(np.bincount(hk_pos, minlength=len(hk_df)), index=hk_df.index, name="in_encyclo")
+
+		if return_idx:
+			order = np.lexsort((elib_pos, hk_pos))
+			match_df = pd.DataFrame({"hk_idx": hk_df.index[hk_pos[order]], "elib_idx": elib_pos[order]})
+			return count_series, match_df
+
+		return count_series
+
+	# define Hardklor info to match
+	hk_mz = hk_df.mz.to_numpy(dtype=float)
+	hk_charge = hk_df.charge.to_numpy()
+	hk_rt = hk_df.rt_s.to_numpy(dtype=float)
+
+	# initiate match counts and matched pairs
+	counts = np.zeros(len(hk_df), dtype="int64")
+	hk_pos_lst = []
+	elib_pos_lst = []
+
+	# match one charge state at a time
+	for charge, charge_idx in encyclo_df.groupby("PrecursorCharge").indices.items():
+		hk_pos = np.flatnonzero(hk_charge == charge)
+		if len(hk_pos) == 0:
+			continue
+
+		# sort elib entries by m/z
+		charge_idx = charge_idx[np.argsort(encyclo_df.PrecursorMz.to_numpy(dtype=float)[charge_idx], kind="stable")]
+		elib_mz = encyclo_df.PrecursorMz.to_numpy(dtype=float)[charge_idx]
+		elib_start = encyclo_df.RTInSecondsStart.to_numpy(dtype=float)[charge_idx]
+		elib_stop = encyclo_df.RTInSecondsStop.to_numpy(dtype=float)[charge_idx]
+
+		# find elib entries in m/z window of each feature (np.isclose tolerance, slightly widened)
+		mz = hk_mz[hk_pos]
+		tol = (1e-8 + rtol*np.abs(mz))*(1 + 1e-9)
+		pair_hk, pair_elib = window_pairs(elib_mz, mz - tol, mz + tol)
+
+		# keep candidates within tolerance and retention time window
+		keep = np.isclose(elib_mz[pair_elib], mz[pair_hk], rtol=rtol)
+		keep &= (elib_start[pair_elib] <= hk_rt[hk_pos][pair_hk]) & (elib_stop[pair_elib] >= hk_rt[hk_pos][pair_hk])
+		pair_hk = hk_pos[pair_hk[keep]]
+		pair_elib = charge_idx[pair_elib[keep]]
+
+		# add to match counts
+		counts += np.bincount(pair_hk, minlength=len(hk_df))
+
+		if return_idx:
+			hk_pos_lst.append(pair_hk)
+			elib_pos_lst.append(pair_elib)
+
+	# create Series of match counts
+	count_series = pd.Series(counts, index=hk_df.index, name="in_encyclo")
+
+	if return_idx:
+		hk_pos = np.concatenate(hk_pos_lst) if hk_pos_lst else np.array([], dtype="int64")
+		elib_pos = np.concatenate(elib_pos_lst) if elib_pos_lst else np.array([], dtype="int64")
+		order = np.lexsort((elib_pos, hk_pos))
+		match_df = pd.DataFrame({"hk_idx": hk_df.index[hk_pos[order]],
+								 "elib_idx": encyclo_df.index[elib_pos[order]]})
+		return count_series, match_df
+
+	return count_series
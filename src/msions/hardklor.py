@@ -2,12 +2,80 @@
 This module contains functions that are useful for interacting with
 Hardklor output files in Python.
 """
+import io
 import pandas as pd
 import numpy as np
-from typing import Union
+from typing import List, Union
+from msions.utils import compact_df
+from msions.cache import cached
 
 
-def hk2df(hk_file: str, by_int: bool = False) -> pd.DataFrame:
+# Hardklor peptide columns
+_PEP_COLS = ['mass', 'charge', 'intensity', 'base_peak', 'window', 'unk', 'mod', 'corr']
+_PEP_DTYPES = {'mass': 'float', 'charge': 'int64', 'intensity': 'int64', 'base_peak': 'float',
+			   'window': str, 'unk': str, 'mod': str, 'corr': str}
+
+# compact Hardklor data types (m/z and masses stay float64)
+_COMPACT_DTYPES = {'charge': 'int16', 'intensity': 'float32', 'corr': 'float32', 'scan_num': 'int32', 
+				   'rt': 'float32', 'rt_s': 'float32'}
+_COMPACT_DROP = ['window', 'unk', 'mod']
+
+
+def _lines2df(pep_lines: List[str], scan_nums: List[int], rts: List[float], starts: List[int]) -> pd.DataFrame:
+	"""
+	Read Hardklor peptide lines with the C reader of pandas and fill in the
+	scan number and retention time of the scan starting at each start position.
+	"""
+	# read peptide lines
+	if pep_lines:
+		pep_df = pd.read_csv(io.StringIO("".join(pep_lines)), sep="\t", header=None,
+							 names=['type'] + _PEP_COLS, usecols=_PEP_COLS, dtype=_PEP_DTYPES)
+	else:
+		pep_df = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in _PEP_DTYPES.items()})
+
+	# fill in scan number and retention time
+	num_peps = np.diff(starts + [len(pep_lines)])
+	pep_df['scan_num'] = np.repeat(np.array(scan_nums, dtype="int64"), num_peps)
+	pep_df['rt'] = np.repeat(np.array(rts, dtype="float"), num_peps)
+
+	return pep_df
+
+
+def _read_hk_chunks(hk_file: str, chunk_rows: int = 1000000):
+	"""
+	Read a Hardklor file in chunks of whole scans with about chunk_rows peptide lines each.
+
+	The 'S' scan lines are separated from the 'P' peptide lines so that the
+	peptide lines of each chunk can be read at once.
+	"""
+	with open(hk_file, "r") as open_file:
+		# peptide lines before the first scan line have scan 0
+		scan_nums = [0]
+		rts = [0.0]
+		starts = [0]
+		pep_lines = []
+
+		for line in open_file:
+			if line[0] == 'S':
+				# parse chunk when a new scan starts
+				if len(pep_lines) >= chunk_rows:
+					yield _lines2df(pep_lines, scan_nums, rts, starts)
+					scan_nums, rts, starts, pep_lines = [], [], [], []
+
+				# record scan info and where the scan starts
+				scan_info = line.split()
+				scan_nums.append(int(scan_info[1]))
+				rts.append(float(scan_info[2]))
+				starts.append(len(pep_lines))
+			elif line[0] == 'P':
+				pep_lines.append(line)
+
+		# parse remaining lines
+		yield _lines2df(pep_lines, scan_nums, rts, starts)
+
+
+@cached
+def hk2df(hk_file: str, by_int: bool = False, engine: str = "c", compact: bool = False) -> pd.DataFrame:
 	"""
 	Read a Hardklor tab-delimited file to a pandas DataFrame.
 	
@@ -20,6 +88,11 @@ def hk2df(hk_file: str, by_int: bool = False) -> pd.DataFrame:
 		The Hardklor tab-delimited file to read.
 	by_int: bool
 		Sort data by intensity.
+	engine: str
+		Parser to use ("c" reads peptide lines with the pandas C reader,
+		"python" splits every line in Python).
+	compact : bool
+		Use smaller data types and drop unused columns (see msions.utils.compact_df).
 		
 	Returns
 	-------
@@ -31,53 +104,101 @@ def hk2df(hk_file: str, by_int: bool = False) -> pd.DataFrame:
 	>>> import msions.hardklor as hk
 	>>> hk.hk2df("test.hk")	
 	"""
-	# open file
-	with open(hk_file, "r") as open_file:
-		scan_num = 0
-		rt = 0.0
-		pep_arrays = []
+	if engine == "c":
+		# read file in chunks, keep scan number, retention time, and all peptide info
+		pep_df = pd.concat(_read_hk_chunks(hk_file), ignore_index=True)
 
-		# read file, keep scan number, retention time, and all peptide info
-		for line in open_file:
-			if line[0] == 'S':               
-				scan_info = line.strip().split()
-				scan_num = int(scan_info[1])
-				rt = float(scan_info[2])        
-			else:
-				pep_info = line.strip().split()[1:]
-				pep_info.extend([scan_num, rt])
-				pep_arrays.append(pep_info)
-
-		# create data frame from info
-		pep_df = pd.DataFrame(pep_arrays,
-							  columns=['mass', 'charge',
-									   'intensity', 'base_peak',
-									   'window', 'unk',
-									  'mod', 'corr', 'scan_num', 'rt'])
-		# change data types
-		pep_df = pep_df.astype({'mass': 'float', 'charge': 'int64',
-								'intensity': 'int64', 'base_peak': 'float',
-							   'scan_num': 'int64', 'rt': 'float'})
-
-		# sort by intensity if true
-		if by_int:
-			pep_df.sort_values(by="intensity", ascending=False, inplace=True)
-			pep_df.reset_index(drop=True, inplace=True)
+	elif engine == "python":
+		# open file
+		with open(hk_file, "r") as open_file:
+			scan_num = 0
+			rt = 0.0
+			pep_arrays = []
+
+			# read file, keep scan number, retention time, and all peptide info
+			for line in open_file:
+				if line[0] == 'S':               
+					scan_info = line.strip().split()
+					scan_num = int(scan_info[1])
+					rt = float(scan_info[2])        
+				else:
+					pep_info = line.strip().split()[1:]
+					pep_info.extend([scan_num, rt])
+					pep_arrays.append(pep_info)
+
+			# create data frame from info
+			pep_df = pd.DataFrame(pep_arrays,
+								  columns=['mass', 'charge',
+										   'intensity', 'base_peak',
+										   'window', 'unk',
+										  'mod', 'corr', 'scan_num', 'rt'])
+			# change data types
+			pep_df = pep_df.astype({'mass': 'float', 'charge': 'int64',
+									'intensity': 'int64', 'base_peak': 'float',
+								   'scan_num': 'int64', 'rt': 'float'})
+
+	else:
+		raise ValueError("engine must be 'c' or 'python'.")
+
+	# sort by intensity if true
+	if by_int:
+		pep_df.sort_values(by="intensity", ascending=False, inplace=True)
+		pep_df.reset_index(drop=True, inplace=True)
+	
+	# calculate m/z
+	pep_df['mz'] = (pep_df['mass']+pep_df['charge']*1.00728)/pep_df['charge']
+
+	# round m/z to 4 decimal places
+	pep_df['mz'] = pep_df["mz"].round(4)
+
+	# calculate retention time in seconds
+	pep_df['rt_s'] = pep_df['rt']*60
+
+	# use smaller data types
+	if compact:
+		pep_df = compact_df(pep_df, _COMPACT_DTYPES, drop=_COMPACT_DROP)
+
+	# return data frame of info
+	return pep_df
+
+
+def iter_hk_chunks(hk_file: str, chunk_rows: int = 1000000):
+	"""
+	Iterate over a Hardklor tab-delimited file in chunks of whole scans.
+
+	Each chunk has the same columns as hk2df, so a Hardklor file can be
+	processed without reading every peptide row into memory.
+	
+	Parameters
+	----------
+	hk_file : str
+		The Hardklor tab-delimited file to read.
+	chunk_rows: int
+		Approximate number of peptide rows in each chunk (chunks end at a scan line).
 		
-		# calculate m/z
-		pep_df['mz'] = (pep_df['mass']+pep_df['charge']*1.00728)/pep_df['charge']
+	Yields
+	------
+	pd.DataFrame
+		A pandas DataFrame of a chunk of the input file.
 
-		# round m/z to 4 decimal places
-		pep_df['mz'] = pep_df["mz"].round(4)
+	Examples
+	-------
+	>>> import msions.hardklor as hk
+	>>> for chunk in hk.iter_hk_chunks("test.hk", chunk_rows=100000):
+	...     print(chunk.intensity.sum())
+	"""
+	for pep_df in _read_hk_chunks(hk_file, chunk_rows):
+		# calculate m/z
+		pep_df['mz'] = ((pep_df['mass']+pep_df['charge']*1.00728)/pep_df['charge']).round(4)
 
 		# calculate retention time in seconds
 		pep_df['rt_s'] = pep_df['rt']*60
 
-		# return data frame of info
-		return pep_df
+		yield pep_df
 
 
-def summarize_df(hk_input: Union[pd.DataFrame, str], full_ms1_df: pd.DataFrame = None) -> pd.DataFrame:
+def summarize_df(hk_input: Union[pd.DataFrame, str], full_ms1_df: pd.DataFrame = None, 
+				 chunk_rows: int = None) -> pd.DataFrame:
 	"""
 	Summarize the TIC in each scan from a Hardklor pandas DataFrame or Hardklor tab-delimited file.
 	
@@ -90,6 +211,9 @@ def summarize_df(hk_input: Union[pd.DataFrame, str], full_ms1_df: pd.DataFrame =
 		The Hardklor pandas DataFrame or Hardklor tab-delimited file.
 	full_ms1_df: pd.DataFrame
 		The pandas DataFrame containing the MS1 scan information.
+	chunk_rows: int
+		If given with a Hardklor file, the file is read in chunks of about
+		chunk_rows peptide rows and the TIC of each scan is summed on the fly.
 		
 	Returns
 	-------
@@ -102,20 +226,30 @@ def summarize_df(hk_input: Union[pd.DataFrame, str], full_ms1_df: pd.DataFrame =
 	>>> hk_df = hk.hk2df("test.hk")
 	>>> hk.summarize_df(hk_df)	
 	"""
-	# if it's a hardklor file
-	if isinstance(hk_input, str):
-		# create hardklor data frame
-		hk_df = hk2df(hk_input)
-		
-	# if it's a data frame already
+	# if it's a hardklor file to read in chunks
+	if isinstance(hk_input, str) and chunk_rows is not None:
+		# sum each chunk by scan number & rt
+		chunk_sums = [chunk_df.groupby(["scan_num", "rt"])["intensity"].sum() 
+					  for chunk_df in _read_hk_chunks(hk_input, chunk_rows)]
+
+		# combine sums of all chunks
+		sum_group = pd.DataFrame(pd.concat(chunk_sums).groupby(level=["scan_num", "rt"]).sum())
+
 	else:
-		hk_df = hk_input
+		# if it's a hardklor file
+		if isinstance(hk_input, str):
+			# create hardklor data frame
+			hk_df = hk2df(hk_input)
+			
+		# if it's a data frame already
+		else:
+			hk_df = hk_input
 
-	# group data frame by scan number & rt
-	byscan_rt = hk_df.groupby(["scan_num", "rt"])
-	
-	# sum by grouping
-	sum_group = pd.DataFrame(byscan_rt["intensity"].aggregate(sum))
+		# group data frame by scan number & rt
+		byscan_rt = hk_df.groupby(["scan_num", "rt"])
+		
+		# sum by grouping
+		sum_group = pd.DataFrame(byscan_rt["intensity"].aggregate(sum))
 	
 	# rename column
 	sum_group.rename(columns={'intensity': 'TIC'}, inplace=True)
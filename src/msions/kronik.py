@@ -5,10 +5,20 @@ Kronik output files in Python.
 import pandas as pd
 import numpy as np
 from typing import Union
+from msions.utils import window_pairs
+from msions.utils import compact_df
+from msions.cache import cached
 
+# compact Kronik data types (masses and m/z stay float64)
+_COMPACT_DTYPES = {'first_scan': 'int32', 'last_scan': 'int32', 'num_scans': 'int32', 'charge': 'int16',
+				   'best_int': 'float32', 'sum_int': 'float32', 'best_rt': 'float32', 'best_rt_s': 'float32',
+				   'CV': 'int16'}
 
+
+@cached
 def simple_df(kro_input: Union[pd.DataFrame, str], cv: Union[int, str] = None, topN: int = None, bestInt_thresh: float = None,
-			  sumInt_thresh: float = None, remove1: bool = False, by_int: bool = False) -> pd.DataFrame:
+			  sumInt_thresh: float = None, remove1: bool = False, by_int: bool = False, 
+			  compact: bool = False) -> pd.DataFrame:
 	"""
 	Create a simplified Kronik pandas DataFrame.
 	
@@ -30,6 +40,8 @@ def simple_df(kro_input: Union[pd.DataFrame, str], cv: Union[int, str] = None, t
 		Remove +1 charges from DataFrame.
 	by_int: bool
 		Sort data by summed intensity.
+	compact : bool
+		Use smaller data types and drop unused columns (see msions.utils.compact_df).
 		
 	Returns
 	-------
@@ -136,6 +148,10 @@ def simple_df(kro_input: Union[pd.DataFrame, str], cv: Union[int, str] = None, t
 	# calculate retention time in seconds
 	df_short['best_rt_s'] = df_short['best_rt']*60
 
+	# use smaller data types
+	if compact:
+		df_short = compact_df(df_short, _COMPACT_DTYPES)
+
 	return df_short
 
 
@@ -217,3 +233,75 @@ def match_rt_mass(ref_row: pd.Series, other_df: pd.DataFrame, rt_diff: float = N
 
 	# return number of rows (subtracting 1 for self-match)
 	return small_df.shape[0] - 1
+
+
+def bulk_match_rt_mass(kro_df: pd.DataFrame, other_df: pd.DataFrame = None, rt_diff: float = None, 
+					   rtol: float = 5e-6) -> pd.Series:
+	""" 
+	Match all Kronik features with Kronik output at once.
+
+	Gives the same counts as applying match_rt_mass to every row. Features are
+	grouped by charge and sorted by mass so that each feature only looks at
+	features inside its mass tolerance window before checking retention time.
+
+	Parameters 
+	---------- 
+	kro_df : pd.DataFrame
+		The Kronik pandas DataFrame with features to match.
+	other_df : pd.DataFrame
+		The other Kronik pandas DataFrame to match (kro_df if not given).
+	rt_diff : float
+		Retention time difference window to use to search for a match.
+	rtol : float
+		Relative mass tolerance (5e-6 is 5 ppm).
+
+	Returns 
+	------- 
+	pd.Series
+		Number of matches for each feature (not counting the self-match).
+
+	Examples 
+	------- 
+	>>> from msions.kronik import simple_df
+	>>> from msions.kronik import bulk_match_rt_mass 
+	>>> kro_df = simple_df("test.kro") 
+	>>> kro_df["redund"] = bulk_match_rt_mass(kro_df, rt_diff=1) 
+	""" 
+	# match features with themselves if no other DataFrame is given
+	if other_df is None:
+		other_df = kro_df
+
+	# define info to match
+	ref_mass = kro_df.mass.to_numpy(dtype=float)
+	ref_charge = kro_df.charge.to_numpy()
+	ref_rt = kro_df.best_rt.to_numpy(dtype=float)
+
+	# initiate match counts (subtracting 1 for self-match)
+	counts = np.full(len(kro_df), -1, dtype="int64")
+
+	# match one charge state at a time
+	for charge, charge_idx in other_df.groupby("charge").indices.items():
+		ref_pos = np.flatnonzero(ref_charge == charge)
+		if len(ref_pos) == 0:
+			continue
+
+		# sort other features by mass
+		charge_idx = charge_idx[np.argsort(other_df.mass.to_numpy(dtype=float)[charge_idx], kind="stable")]
+		other_mass = other_df.mass.to_numpy(dtype=float)[charge_idx]
+		other_rt = other_df.best_rt.to_numpy(dtype=float)[charge_idx]
+
+		# find features in mass window of each feature (np.isclose tolerance, slightly widened)
+		mass = ref_mass[ref_pos]
+		tol = (1e-8 + rtol*np.abs(mass))*(1 + 1e-9)
+		pair_ref, pair_other = window_pairs(other_mass, mass - tol, mass + tol)
+
+		# keep features within tolerance and retention time window
+		keep = np.isclose(other_mass[pair_other], mass[pair_ref], rtol=rtol)
+		if rt_diff is not None:
+			rt = ref_rt[ref_pos][pair_ref]
+			keep &= (other_rt[pair_other] >= rt - rt_diff) & (other_rt[pair_other] <= rt + rt_diff)
+
+		# add to match counts
+		counts += np.bincount(ref_pos[pair_ref[keep]], minlength=len(kro_df))
+
+	return pd.Series(counts, index=kro_df.index, name="redund")
@@ -7,7 +7,7 @@ import seaborn as sns  # for despine of plots
 from msions.mzml import tic_df
 from msions.encyclopedia import dia_df
 from msions.hardklor import hk2df
-from msions.encyclopedia import match_hk
+from msions.encyclopedia import bulk_match_hk
 from msions.hardklor import summarize_df
 import numpy as np
 from typing import List, Union
@@ -22,7 +22,8 @@ def plot_data(mzml_input: Union[pd.DataFrame, str],
 			  return_dfs = False,
 			  color: Union[str, List[str]] = ["black", "#1f77b4"], 
 			  no_labels: bool = False, alpha: float = 1.0, 
-			  fig_params: List[float] = None):
+			  fig_params: List[float] = None,
+			  chromatogram: bool = False):
 	"""
 	Plots TIC against retention time.
 
@@ -50,6 +51,9 @@ def plot_data(mzml_input: Union[pd.DataFrame, str],
 		Changes the alpha value for the line plot.
 	fig_params: List[float]
 		Sets the figure size and optionally the dpi.
+	chromatogram: bool
+		Reads the TIC chromatogram of an mzML file instead of its spectra for quick-look
+		TIC plots of all scans (the spectra are still parsed for ions or feature/ID input).
 	
 	Examples
 	-------
@@ -69,8 +73,12 @@ def plot_data(mzml_input: Union[pd.DataFrame, str],
 
 	# if it's an mzML file
 	if isinstance(mzml_input, str):
-		# create mzML data frame
-		df = tic_df(mzml_input)
+		# create mzML data frame (from the TIC chromatogram if only TIC is plotted)
+		tic_only = data_type.lower() == "tic" and feat_input is None and id_input is None
+		if chromatogram and tic_only:
+			df = tic_df(mzml_input, level="all", chromatogram=True)
+		else:
+			df = tic_df(mzml_input)
 		
 	# if it's a data frame already
 	else:
@@ -169,7 +177,7 @@ def plot_data(mzml_input: Union[pd.DataFrame, str],
 				sumid_feat_df = summarize_df(id_feat_df, full_ms1_df=df)
 			else:
 				# find Hardklor/encyclopeDIA match
-				feat_df["in_encyclo"] = feat_df.apply(match_hk, axis=1, other_df=id_df)
+				feat_df["in_encyclo"] = bulk_match_hk(feat_df, id_df)
 
 				# create DataFrame of only identified features
 				id_feat_df = feat_df[feat_df["in_encyclo"] > 0].reset_index(drop=True)
@@ -2,195 +2,1118 @@
 This module contains functions that are useful for interacting with
 mzML files in Python.
 """
+import io
+import os
+import re
+import gzip
+import zlib
+import base64
+import hashlib
+import xml.etree.ElementTree as ET
+from array import array
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 import pymzml
 import pandas as pd
-from typing import List, Union
+import numpy as np
+from typing import List, Optional, Tuple, Union
+from msions.utils import compact_df
+from msions.numpress import decode_numpress
+from msions.cache import cached
+from msions.cache import source_cache_dir
 
+try:
+	import indexed_gzip as igzip
+except ImportError:
+	igzip = None
 
-def tic_df(input_mzml: str, level: str = "1", include_ms1_info: bool = False, faims: bool = False) -> pd.DataFrame:
+
+# cvParam accessions used for scan information
+_MS_LEVEL = "MS:1000511"
+_SCAN_TIME = "MS:1000016"
+_TIC = "MS:1000285"
+_INJECTION_TIME = "MS:1000927"
+_FAIMS_CV = "MS:1001581"
+_SELECTED_MZ = "MS:1000744"
+_PEAK_INTENSITY = "MS:1000042"
+
+# cvParam accessions of binary data arrays
+_MZ_ARRAY = "MS:1000514"
+_INTENSITY_ARRAY = "MS:1000515"
+_TIME_ARRAY = "MS:1000595"
+_ARRAY_DTYPES = {"MS:1000521": "<f4", "MS:1000523": "<f8", "MS:1000519": "<i4", "MS:1000522": "<i8"}
+_ZLIB = "MS:1000574"
+_NO_COMPRESSION = "MS:1000576"
+
+# cvParam accessions of MS-Numpress compression (alone or followed by zlib compression)
+_NUMPRESS = {"MS:1002312": "linear", "MS:1002313": "pic", "MS:1002314": "slof"}
+_NUMPRESS_ZLIB = {"MS:1002746": "MS:1002312", "MS:1002747": "MS:1002313", "MS:1002748": "MS:1002314"}
+
+# cvParam accession of profile spectra
+_PROFILE = "MS:1000128"
+
+# cvParam accession of total ion current chromatograms
+_TIC_CHROMATOGRAM = "MS:1000235"
+
+# unit accessions of time arrays (seconds, minutes, and hours) and their factors to minutes
+_TIME_UNITS = {"UO:0000010": 1/60, "UO:0000031": 1.0, "UO:0000032": 60.0}
+
+# first bytes of gzipped files and distance between their seek points
+_GZIP_MAGIC = b"\x1f\x8b"
+_GZIP_SPACING = 1 << 20
+
+# pattern for trailing scan number of a native ID
+_SCAN_ID = re.compile(r'=(\d+)$')
+
+# patterns for the offset index of an mzML file
+_INDEX_LIST_OFFSET = re.compile(rb"<indexListOffset>\s*(\d+)\s*</indexListOffset>")
+_INDEX = re.compile(rb'<index\s+name="(\w+)"\s*>(.*?)</index>', re.S)
+_OFFSET = re.compile(rb'<offset\s+idRef="([^"]*)"[^>]*>\s*(\d+)\s*</offset>')
+_ELEMENT_START = re.compile(rb'<(spectrum|chromatogram)\s[^>]*?\bid="([^"]*)"')
+
+# offsets of scanned (non-indexed) mzML files by file stamp (if caching is disabled)
+_SCANNED_OFFSETS = {}
+
+# compact scan data types (m/z stays float64)
+_COMPACT_DTYPES = {'ms1_scan': 'int32', 'ms1_int': 'float32', 'scan_num': 'int32', 'rt': 'float32', 
+				   'TIC': 'float32', 'IT': 'float32', 'CV': 'int16', 'ions': 'float32'}
+
+
+def _scan_id(native_id: str, default: int = -1) -> int:
+	"""
+	Find the scan number at the end of a native ID (e.g., "... scan=152").
+	"""
+	match = _SCAN_ID.search(native_id.strip()) if native_id else None
+	return int(match.group(1)) if match else default
+
+
+def _spectrum_params(element) -> Tuple[dict, str]:
+	"""
+	Walk a spectrum element once and record its cvParams by accession.
+
+	The elements are visited in document order, so the first value of each accession
+	is kept, and the binary data arrays are not visited.
+
+	Returns
+	-------
+	Tuple[dict, str]
+		The cvParam values by accession and the spectrumRef of the first precursor.
+	"""
+	params = {}
+	precursor_ref = None
+	stack = list(reversed(element))
+
+	while stack:
+		child = stack.pop()
+		tag = child.tag.rpartition('}')[2]
+		if tag == "cvParam":
+			params.setdefault(child.get("accession"), child.get("value"))
+		elif tag != "binaryDataArrayList":
+			if tag == "precursor" and precursor_ref is None:
+				precursor_ref = child.get("spectrumRef", "")
+
+			# visit children next (first child on top)
+			stack.extend(reversed(child))
+
+	return params, precursor_ref
+
+
+def _iter_spectra(input_mzml: str, keep_binary: bool = False):
+	"""
+	Stream the spectrum elements of an mzML file (gzipped or not, or a file object) with iterparse.
+
+	Binary arrays are cleared as soon as they are parsed (unless keep_binary is True), 
+	each spectrum is removed from the tree after it is used, and parsing stops at 
+	the end of the spectrum list.
+	"""
+	# open gzipped files
+	if isinstance(input_mzml, str) and _is_gzip(input_mzml):
+		with _open_mzml(input_mzml) as open_file:
+			yield from _iter_spectra(open_file, keep_binary=keep_binary)
+		return
+
+	spectrum_list = None
+
+	for event, element in ET.iterparse(input_mzml, events=("start", "end")):
+		tag = element.tag.rpartition('}')[2]
+		if event == "start":
+			if tag == "spectrumList":
+				spectrum_list = element
+		elif tag == "binary":
+			if not keep_binary:
+				element.clear()
+		elif tag == "spectrum":
+			yield element
+			spectrum_list.clear()
+		elif tag == "spectrumList":
+			break
+
+
+def _tic_columns(elements, level: str = "1", include_ms1_info: bool = False, faims: bool = False) -> dict:
+	"""
+	Extract scan information from spectrum elements into typed NumPy columns.
+	"""
+	# create growable typed column buffers
+	int_cols = ["scan_num"]
+	float_cols = ["rt", "TIC", "IT"]
+	if include_ms1_info:
+		int_cols.insert(0, "ms1_scan")
+		float_cols = ["ms1_mz", "ms1_int"] + float_cols
+	if faims:
+		float_cols.append("CV")
+	buffers = {col: array("q") for col in int_cols}
+	buffers.update({col: array("d") for col in float_cols})
+
+	for element in elements:
+		params, precursor_ref = _spectrum_params(element)
+		ms_level = params.get(_MS_LEVEL)
+
+		# skip spectra from other MS levels
+		if (level == "1" and ms_level != "1") or (level == "2" and ms_level != "2"):
+			continue
+
+		# record scan, scan time, TIC, & injection time
+		buffers["scan_num"].append(_scan_id(element.get("id"), int(element.get("index", -2)) + 1))
+		buffers["rt"].append(float(params.get(_SCAN_TIME, "nan")))
+		buffers["TIC"].append(float(params.get(_TIC, "nan")))
+		buffers["IT"].append(float(params.get(_INJECTION_TIME) or "nan"))
+
+		# record triggering MS1 scan, m/z, and intensity (-1 for MS1 scans)
+		if include_ms1_info:
+			if ms_level == "1" or precursor_ref is None:
+				buffers["ms1_scan"].append(-1)
+				buffers["ms1_mz"].append(-1)
+				buffers["ms1_int"].append(-1)
+			else:
+				buffers["ms1_scan"].append(_scan_id(precursor_ref))
+				buffers["ms1_mz"].append(float(params.get(_SELECTED_MZ, "nan")))
+				buffers["ms1_int"].append(float(params.get(_PEAK_INTENSITY, "nan")))
+
+		# record FAIMS CV
+		if faims:
+			buffers["CV"].append(float(params.get(_FAIMS_CV, "nan")))
+
+	# view buffers as NumPy arrays
+	columns = {col: np.frombuffer(buffers[col], dtype="int64" if col in int_cols else "float64")
+			   for col in int_cols + float_cols}
+
+	return columns
+
+
+def _columns2tic_df(columns: dict, include_ms1_info: bool = False, faims: bool = False) -> pd.DataFrame:
+	"""
+	Create the tic_df pandas DataFrame from scan information columns.
+	"""
+	# define column order
+	col_order = ['scan_num', 'rt', 'TIC', 'IT']
+	if include_ms1_info:
+		col_order = ['ms1_scan', 'ms1_mz', 'ms1_int'] + col_order
+	if faims:
+		col_order.append('CV')
+
+	# create dataframe
+	tic_df = pd.DataFrame({col: columns[col] for col in col_order})
+
+	# round ms1_mz
+	if include_ms1_info:
+		tic_df['ms1_mz'] = tic_df['ms1_mz'].round(4)
+
+	# define CVs as integers when all scans have a CV
+	if faims and not tic_df['CV'].isna().any():
+		tic_df['CV'] = tic_df['CV'].astype("int64")
+
+	# round retention time
+	tic_df['rt'] = tic_df['rt'].round(4)
+
+	# calculate ions per scan
+	# ions per scan = ion current (for scan) * inject time /1000
+	tic_df["ions"] = tic_df['TIC']*tic_df['IT']/1000
+
+	# return data frame
+	return tic_df
+
+
+@cached(ignore=("workers",))
+def tic_df(input_mzml: str, level: str = "1", include_ms1_info: bool = False, faims: bool = False, 
+		   backend: str = "pymzml", compact: bool = False, workers: int = None, 
+		   chromatogram: bool = False) -> pd.DataFrame:
 	"""
 	Find the TIC and injection time for each scan in an mzML file.
+
+	Each spectrum is walked once and its cvParams are looked up by accession,
+	so the peak arrays are never decoded.
 	
 	Parameters
 	----------
 	input_mzml : str
-		The input mzML file.
+		The input mzML file (or gzipped mzML file).
 	level : str
-		Level of MS scan (1 or 2)
+		Level of MS scan ("1", "2", or "all")
 	include_ms1_info : bool
 		Returns MS1 scan number, m/z, and intensity associated with precursor analyzed in MS2
-		(requires level="2")
+		(requires level="2" or level="all")
 	faims : bool
 		Returns CV associated with each scan.
+	backend : str
+		Parser used to read spectra ("pymzml" or "xml"). The "xml" backend streams
+		only the scan headers and skips the binary peak arrays. Gzipped files are 
+		always read with the "xml" backend.
+	compact : bool
+		Use smaller data types and drop unused columns (see msions.utils.compact_df).
+	workers : int
+		Number of worker processes. If more than 1, the spectra are split into
+		shards by their offsets and parsed in parallel (backend is not used).
+	chromatogram : bool
+		Read the instrument TIC chromatogram from the chromatogramList instead of the
+		spectra. The chromatogram has a point for each scan of any level, so it is only
+		used with level="all". The spectra are still parsed for other levels, if 
+		include_ms1_info or faims is requested, or if the file has no TIC chromatogram
+		(or one with an unknown time unit).
 		
 	Returns
 	-------
 	pd.DataFrame
 		A pandas DataFrame containing the retention time, TIC, and injection time for each scan.
+		If read from the TIC chromatogram, only the retention time (in minutes) and TIC 
+		columns are returned.
 	
 	Examples
 	-------
 	>>> from msions.mzml import tic_df
 	>>> test_tic_df = tic_df("test.mzML")
+	>>> quick_tic_df = tic_df("test.mzML", level="all", chromatogram=True)
 	"""
-	# create Reader object
-	run = pymzml.run.Reader(input_mzml)
-
-	# create array
-	tic_lst = []
-
-    # record scan, scan time, TIC, & injection time
-	# if examining MS1
-	if level == "1":
-		# for each spectrum
-		for spectrum in run:
-			info_lst = []
-			if spectrum.ms_level == 1:
-				try:
-					if spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('name') == "ion injection time":
-						it_val = spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')
-						info_lst = [spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-									it_val]
-					elif spectrum.get_element_by_path(['scanList','scan','cvParam'])[3].get('name') == "ion injection time":
-						it_val = spectrum.get_element_by_path(['scanList','scan','cvParam'])[3].get('value')
-						info_lst = [spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-									it_val]
-				except:	
-					"File has different formatting than expected. Ion injection time needs to be re-defined."
-				
-				if faims:
-					try:
-						if spectrum.get_element_by_path(['scanList','scan','cvParam'])[7].get('name') == "FAIMS compensation voltage":
-							cv_val = spectrum.get_element_by_path(['scanList','scan','cvParam'])[7].get('value')
-							info_lst.append(int(float(cv_val)))
-					except:
-						"File has different formatting than expected. CV needs to be re-defined."
-				tic_lst.append(info_lst)
-	# if examining MS2
-	elif level == "2":
-		# for each spectrum
-		for spectrum in run:
-			info_lst = []
-			if spectrum.ms_level == 2:
-				if include_ms1_info:
-					# define triggered MS1 scan number
-					info_lst = [int(spectrum.get_element_by_path(['precursorList', 'precursor'])[0].get('spectrumRef').split('=')[3]),
-									# define triggered MS1 m/z
-									float(spectrum.get_element_by_path(['precursorList', 'precursor', 
-																		'selectedIonList', 'selectedIon', 'cvParam'])[0].get('value')),
-									# define triggered MS1 intensity
-									float(spectrum.get_element_by_path(['precursorList', 'precursor', 
-																		'selectedIonList', 'selectedIon', 'cvParam'])[2].get('value')),
-									spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-									# define injection time (IT)
-									spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]
-				else:
-					info_lst = [spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-								spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]
-				if faims:
-					info_lst.append(int(float(spectrum.get_element_by_path(['cvParam'])[7].get('value'))))
-				tic_lst.append(info_lst)
-	elif level == "all":
-		for spectrum in run:
-			info_lst = []
-			if spectrum.ms_level == 2:
-				if include_ms1_info:
-					# define triggered MS1 scan number
-					info_lst = [int(spectrum.get_element_by_path(['precursorList', 'precursor'])[0].get('spectrumRef').split('=')[3]),
-								# define triggered MS1 m/z
-								float(spectrum.get_element_by_path(['precursorList', 'precursor', 
-																	'selectedIonList', 'selectedIon', 'cvParam'])[0].get('value')),
-								# define triggered MS1 intensity
-								float(spectrum.get_element_by_path(['precursorList', 'precursor', 
-																	'selectedIonList', 'selectedIon', 'cvParam'])[2].get('value')),
-								spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-								# define injection time (IT)
-								spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]
-				else:
-					info_lst = [spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-								spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]
-				if faims:
-					info_lst.append(int(float(spectrum.get_element_by_path(['cvParam'])[7].get('value'))))
-			else:
-				if include_ms1_info:
-					info_lst = [-1,
-								-1,
-								-1,
-								spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-								spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]
-				else:
-					info_lst = [spectrum.ID, spectrum.scan_time[0], spectrum.TIC, 
-								spectrum.get_element_by_path(['scanList','scan','cvParam'])[2].get('value')]				
-				if faims:
-					info_lst.append(int(float(spectrum.get_element_by_path(['cvParam'])[7].get('value'))))
-			tic_lst.append(info_lst)
+	# read TIC chromatogram (of all scans)
+	if chromatogram and level == "all" and not include_ms1_info and not faims:
+		scan_df = _tic_chromatogram(input_mzml)
+		if scan_df is not None:
+			return compact_df(scan_df, _COMPACT_DTYPES) if compact else scan_df
 
-	# create dataframe
-	if (level == "2" or level == "all") and include_ms1_info:
-		if faims:
-			tic_df = pd.DataFrame(tic_lst,
-								  columns=['ms1_scan', 'ms1_mz', 'ms1_int','scan_num', 'rt', 'TIC', 'IT', 'CV'])
-			# round ms1_mz
-			tic_df['ms1_mz'] = tic_df['ms1_mz'].round(4)
+	# check parser
+	if backend not in ["pymzml", "xml"]:
+		raise ValueError("backend must be 'pymzml' or 'xml'.")
+
+	# extract scan information from each shard of spectra in parallel
+	if workers is not None and workers > 1:
+		shard_kwargs = dict(level=level, include_ms1_info=include_ms1_info and level != "1", faims=faims)
+		shard_columns = _map_shards(_tic_shard, input_mzml, workers, **shard_kwargs) or [_tic_columns([], **shard_kwargs)]
+		columns = {col: np.concatenate([shard[col] for shard in shard_columns]) for col in shard_columns[0]}
+
+	# extract scan information from each spectrum
+	else:
+		# stream spectrum elements (pymzml only opens gzipped files with a .gz extension)
+		if backend == "pymzml" and not _is_gzip(input_mzml):
+			spectra = (spectrum.element for spectrum in pymzml.run.Reader(input_mzml))
 		else:
-			tic_df = pd.DataFrame(tic_lst, 
-								  columns=['ms1_scan', 'ms1_mz', 'ms1_int','scan_num', 'rt', 'TIC', 'IT'])
-			# round ms1_mz
-			tic_df['ms1_mz'] = tic_df['ms1_mz'].round(4)
+			spectra = _iter_spectra(input_mzml)
+		columns = _tic_columns(spectra, level=level,
+							   include_ms1_info=include_ms1_info and level != "1", faims=faims)
+
+	# create data frame
+	scan_df = _columns2tic_df(columns, include_ms1_info=include_ms1_info and level != "1", faims=faims)
+
+	# use smaller data types
+	if compact:
+		scan_df = compact_df(scan_df, _COMPACT_DTYPES)
+
+	# return data frame
+	return scan_df
+
+
+def _tic_chromatogram(input_mzml: str) -> pd.DataFrame:
+	"""
+	Read the retention time and TIC of the total ion current chromatogram of an mzML file.
+
+	The chromatogram offsets are used to seek straight to the chromatogramList, so
+	the spectra are not parsed. The retention time is converted to minutes. Returns 
+	None if the file has no TIC chromatogram or its time unit is unknown.
+	"""
+	with IndexedMzML(input_mzml) as run:
+		# look at the chromatogram with ID "TIC" first
+		positions = sorted(range(len(run.chromatogram_ids)), key=lambda pos: run.chromatogram_ids[pos] != "TIC")
+
+		for pos in positions:
+			element = run.chromatogram_element(pos)
+			params, _ = _spectrum_params(element)
+			if _TIC_CHROMATOGRAM not in params:
+				continue
+
+			# decode time and intensity arrays
+			specs = _element_specs(element)
+			rt, tic = [np.asarray(_decode_binary(*specs[array_type]), dtype="float64") if array_type in specs 
+					   else np.empty(0) for array_type in [_TIME_ARRAY, _INTENSITY_ARRAY]]
+
+			# convert time to minutes (minutes if no unit is given)
+			units = [child.get("unitAccession") for child in element.iter() 
+					 if child.tag.rpartition('}')[2] == "cvParam" and child.get("accession") == _TIME_ARRAY]
+			unit = units[0] if units and units[0] else "UO:0000031"
+			if unit not in _TIME_UNITS:
+				return None
+
+			return pd.DataFrame({"rt": (rt*_TIME_UNITS[unit]).round(4), "TIC": tic})
+
+	return None
+
+
+def _iter_ms1_peaks(input_mzml: str, workers: int = None, threads: int = None):
+	"""
+	Yield the scan number, retention time, m/z array, and intensity array of each MS1 spectrum.
+
+	If workers is more than 1, shards of spectra are decoded in parallel and yielded in order.
+	If threads is more than 1, the binary arrays are decoded in a thread pool and yielded in order.
+	"""
+	# decode shards of spectra in parallel
+	if workers is not None and workers > 1:
+		for shard_peaks in _map_shards(_peak_shard, input_mzml, workers):
+			yield from shard_peaks
+		return
+
+	# decode binary arrays in a thread pool
+	if threads is not None and threads > 1:
+		yield from _iter_threaded_peaks(input_mzml, threads)
+		return
+
+	# stream spectra of gzipped files (pymzml only opens them with a .gz extension)
+	if _is_gzip(input_mzml):
+		obo_version = _obo_version(input_mzml)
+		for element in _iter_spectra(input_mzml, keep_binary=True):
+			spectra = pymzml.spec.Spectrum(element, obo_version=obo_version)
+			if spectra.ms_level == 1:
+				yield _ms1_peaks(spectra)
+		return
+
+	# loop through spectra
+	with pymzml.run.Reader(input_mzml) as run:
+		for spectra in run:
+			if spectra.ms_level == 1:
+				yield _ms1_peaks(spectra)
+
+
+def _ms1_peaks(spectra) -> Tuple[int, float, np.ndarray, np.ndarray]:
+	"""
+	Find the scan number, retention time, m/z array, and intensity array of a pymzml MS1 spectrum.
+
+	Spectra are decoded (and profile spectra centroided) by pymzml, except for centroided 
+	spectra with MS-Numpress arrays, which are decoded directly (pymzml decodes 
+	MS-Numpress arrays in pure Python and does not support all of its accessions).
+	"""
+	# find MS-Numpress arrays
+	params, _ = _spectrum_params(spectra.element)
+	specs = _element_specs(spectra.element)
+	numpress = any(compression is not None and compression[1] is not None for _, _, compression in specs.values())
+	# decode centroided MS-Numpress spectra directly and others with pymzml
+	if numpress and _PROFILE not in params:
+		mz, ips = _decode_peaks(specs)
 	else:
-		if faims:
-			tic_df = pd.DataFrame(tic_lst,
-								  columns=['scan_num', 'rt', 'TIC', 'IT', 'CV'])	
-		else:	
-			tic_df = pd.DataFrame(tic_lst,
-								  columns=['scan_num', 'rt', 'TIC', 'IT'])
+		peaks = np.asarray(spectra.peaks("centroided"), dtype="float64").reshape(-1, 2)
+		mz, ips = peaks[:, 0], peaks[:, 1]
+	scan_num = _scan_id(spectra.element.get("id"), int(spectra.element.get("index", -2)) + 1)
 
-	# round retention time
-	tic_df['rt'] = tic_df['rt'].round(4)
+	return scan_num, spectra.scan_time[0], mz, ips
 
-	# update column data types
-	tic_df['IT'] = tic_df['IT'].astype("float")
 
-	# calculate ions per scan
-	# ions per scan = ion current (for scan) * inject time /1000
-	tic_df["ions"] = tic_df['TIC']*tic_df['IT']/1000
+def _obo_version(input_mzml: str) -> str:
+	"""
+	Find the ontology version pymzml uses for the spectra of an mzML file (gzipped or not).
 
-	# return data frame
-	return tic_df
+	pymzml finds the version before the spectrum list, so only those bytes are handed 
+	to its reader (which is closed right away).
+	"""
+	header = b""
+	with _open_mzml(input_mzml) as open_file:
+		while b"<spectrumList" not in header:
+			block = open_file.read(1 << 20)
+			if not block:
+				break
+			header += block
 
+	# keep bytes up to the spectrumList start tag
+	start = header.find(b"<spectrumList")
+	if start >= 0:
+		header = header[:header.find(b">", start) + 1]
 
-def peak_df(input_mzml: str) -> pd.DataFrame:
+	with pymzml.run.Reader(io.BytesIO(header)) as run:
+		return run.OT.version
+
+
+def _iter_threaded_peaks(input_mzml: str, threads: int, queue_size: int = 4):
+	"""
+	Yield the MS1 peaks of an mzML file like _iter_ms1_peaks, decoding the binary arrays in a thread pool.
+
+	This thread parses the spectrum XML and hands the base64 text of each MS1 spectrum 
+	to the pool. At most threads*queue_size spectra are in flight and they are yielded 
+	in scan order. Profile spectra are centroided with pymzml in this thread.
+	"""
+	obo_version = None
+	pending = deque()
+
+	with ThreadPoolExecutor(max_workers=threads) as executor:
+		for element in _iter_spectra(input_mzml, keep_binary=True):
+			params, _ = _spectrum_params(element)
+
+			# skip spectra from other MS levels
+			if params.get(_MS_LEVEL) != "1":
+				continue
+
+			scan_num = _scan_id(element.get("id"), int(element.get("index", -2)) + 1)
+			rt = float(params.get(_SCAN_TIME, "nan"))
+
+			# centroid profile spectra like pymzml
+			if _PROFILE in params:
+				if obo_version is None:
+					obo_version = _obo_version(input_mzml)
+				_, _, mz, ips = _ms1_peaks(pymzml.spec.Spectrum(element, obo_version=obo_version))
+				peaks = Future()
+				peaks.set_result((mz, ips))
+
+			# decode binary arrays in the pool (text is copied before the element is cleared)
+			else:
+				peaks = executor.submit(_decode_peaks, _element_specs(element))
+			pending.append((scan_num, rt, peaks))
+
+			# yield decoded spectra in order
+			while len(pending) >= threads*queue_size:
+				scan_num, rt, peaks = pending.popleft()
+				yield (scan_num, rt) + peaks.result()
+
+		# yield remaining spectra
+		while pending:
+			scan_num, rt, peaks = pending.popleft()
+			yield (scan_num, rt) + peaks.result()
+
+
+@cached(ignore=("workers", "threads"))
+def peak_df(input_mzml: str, mz_dtype: str = "float64", int_dtype: str = "float64", 
+			workers: int = None, threads: int = None) -> pd.DataFrame:
 	""" 
 	Create a pandas DataFrame containing the m/z, 
-	ion current, and retention time for all MS1 peaks.
+	ion current, retention time, and scan number for all MS1 peaks.
+
+	The peak arrays of each spectrum are collected and concatenated once,
+	so the DataFrame is built in linear time.
 	
 	Parameters
 	----------
 	input_mzml : str
-		The input mzML file.
+		The input mzML file (or gzipped mzML file).
+	mz_dtype : str
+		Data type of the m/z column (e.g., "float64").
+	int_dtype : str
+		Data type of the ion current column (e.g., "float32" to halve its memory).
+	workers : int
+		Number of worker processes. If more than 1, the spectra are split into
+		shards by their offsets and decoded in parallel.
+	threads : int
+		Number of decoding threads. If more than 1, the spectrum XML is read in
+		this thread while the base64 and zlib decoding of the binary arrays runs
+		in a thread pool (the peaks stay in scan order).
 		
 	Returns
 	-------
 	pd.DataFrame
-		A pandas DataFrame containing the m/z, ion current, and retention time for all MS1 peaks.
+		A pandas DataFrame containing the m/z, ion current, retention time, and scan number for all MS1 peaks.
 
 	Examples 
 	------- 
 	>>> from msions.mzml import peak_df
 	>>> peak_df("test.mzML")
+	>>> peak_df("test.mzML", threads=4)
 	""" 
-	# create run object
-	run = pymzml.run.Reader(input_mzml)
+	# initiate per-spectrum arrays
+	mz_lst = []
+	ips_lst = []
+	rt_lst = []
+	scan_lst = []
+	num_peaks = []
 
-	# initiate peak DataFrame
-	peak_df = pd.DataFrame(columns=["mz", "ips", "rt"])
+	# collect peaks of each MS1 spectrum
+	for scan_num, rt, mz, ips in _iter_ms1_peaks(input_mzml, workers, threads):
+		mz_lst.append(mz)
+		ips_lst.append(ips)
+		rt_lst.append(rt)
+		scan_lst.append(scan_num)
+		num_peaks.append(len(mz))
 
-	# loop through spectra
-	for spectra in run:
+	# concatenate peaks once
+	peak_df = pd.DataFrame({"mz": np.concatenate(mz_lst or [np.empty(0)]).round(4).astype(mz_dtype),
+							"ips": np.concatenate(ips_lst or [np.empty(0)]).astype(int_dtype),
+							"rt": np.repeat(np.array(rt_lst, dtype="float64"), num_peaks),
+							"scan_num": np.repeat(np.array(scan_lst, dtype="int64"), num_peaks)})
+
+	return peak_df
+
+
+def iter_peak_chunks(input_mzml: str, chunk_peaks: int = 1000000, mz_dtype: str = "float64", 
+					 int_dtype: str = "float64"):
+	""" 
+	Iterate over all MS1 peaks of an mzML file in fixed-size chunks.
+
+	Each chunk has the same columns as peak_df, so the peaks of a whole run
+	can be processed with bounded memory.
+	
+	Parameters
+	----------
+	input_mzml : str
+		The input mzML file (or gzipped mzML file).
+	chunk_peaks : int
+		Number of peaks in each chunk (the last chunk may be smaller).
+	mz_dtype : str
+		Data type of the m/z column (e.g., "float64").
+	int_dtype : str
+		Data type of the ion current column (e.g., "float32").
+		
+	Yields
+	------
+	pd.DataFrame
+		A pandas DataFrame containing the m/z, ion current, retention time, and scan number for a chunk of MS1 peaks.
+
+	Examples 
+	------- 
+	>>> from msions.mzml import iter_peak_chunks
+	>>> for chunk in iter_peak_chunks("test.mzML", chunk_peaks=500000):
+	...     print(chunk.ips.sum())
+	""" 
+	# initiate buffered arrays
+	buffers = {"mz": [], "ips": [], "rt": [], "scan_num": []}
+	num_buffered = 0
+
+	for scan_num, rt, mz, ips in _iter_ms1_peaks(input_mzml):
+		# add spectrum to buffer
+		buffers["mz"].append(mz.round(4).astype(mz_dtype))
+		buffers["ips"].append(ips.astype(int_dtype))
+		buffers["rt"].append(np.full(len(mz), rt, dtype="float64"))
+		buffers["scan_num"].append(np.full(len(mz), scan_num, dtype="int64"))
+		num_buffered += len(mz)
+
+		# yield full chunks (concatenate once and slice by offset)
+		if num_buffered >= chunk_peaks:
+			columns = {col: np.concatenate(arrays) for col, arrays in buffers.items()}
+			start = 0
+			while num_buffered - start >= chunk_peaks:
+				yield pd.DataFrame({col: values[start:start + chunk_peaks] for col, values in columns.items()})
+				start += chunk_peaks
+
+			# copy remaining peaks so the concatenated arrays can be freed
+			buffers = {col: [values[start:].copy()] for col, values in columns.items()}
+			num_buffered -= start
+
+	# yield remaining peaks
+	if num_buffered > 0:
+		yield pd.DataFrame({col: np.concatenate(arrays) for col, arrays in buffers.items()})
+
+
+def _array_spec(array_element) -> Tuple[str, str, str, str]:
+	"""
+	Find the array type accession, base64 text, data type, and compression of a binaryDataArray element.
+
+	The compression is a tuple of the zlib accession (or None) and the MS-Numpress accession (or None).
+	"""
+	params, _ = _spectrum_params(array_element)
+	dtype = next((dtype for accession, dtype in _ARRAY_DTYPES.items() if accession in params), "<f8")
+	array_type = next((array_type for array_type in [_MZ_ARRAY, _INTENSITY_ARRAY, _TIME_ARRAY] if array_type in params), None)
+
+	# find zlib and MS-Numpress compression
+	numpress = next((accession for accession in _NUMPRESS if accession in params), None)
+	numpress_zlib = next((accession for accession in _NUMPRESS_ZLIB if accession in params), None)
+	if numpress_zlib is not None:
+		compression = (_ZLIB, _NUMPRESS_ZLIB[numpress_zlib])
+	elif _ZLIB in params or _NO_COMPRESSION in params or numpress is not None:
+		compression = (_ZLIB if _ZLIB in params else None, numpress)
+	else:
+		compression = None
+	binary = next((child for child in array_element if child.tag.rpartition('}')[2] == "binary"), None)
+	text = (binary.text or "") if binary is not None else ""
+
+	return array_type, text, dtype, compression
+
+
+def _decode_binary(text: str, dtype: str, compression: Tuple[str, str]) -> np.ndarray:
+	"""
+	Decode base64 (and zlib and/or MS-Numpress) text directly into a NumPy array.
+	"""
+	data = base64.b64decode(text)
+	if compression is None:
+		if data:
+			raise ValueError("Unsupported binary data array compression.")
+		return np.frombuffer(data, dtype=dtype)
+
+	zlib_compression, numpress = compression
+	if zlib_compression == _ZLIB:
+		data = zlib.decompress(data)
+	if numpress is not None:
+		return decode_numpress(data, _NUMPRESS[numpress])
+
+	return np.frombuffer(data, dtype=dtype)
+
+
+def _decode_array(array_element) -> Tuple[str, np.ndarray]:
+	"""
+	Decode a binaryDataArray element into its array type accession and NumPy array.
+	"""
+	array_type, text, dtype, compression = _array_spec(array_element)
+
+	return array_type, _decode_binary(text, dtype, compression)
+
+
+def _element_specs(element) -> dict:
+	"""
+	Find the base64 text, data type, and compression of each binary data array of a spectrum (or chromatogram) element.
+	"""
+	specs = {}
+	for array_element in element.iter():
+		if array_element.tag.rpartition('}')[2] == "binaryDataArray":
+			array_type, text, dtype, compression = _array_spec(array_element)
+			specs[array_type] = (text, dtype, compression)
+
+	return specs
+
+
+def _decode_peaks(specs: dict) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Decode the m/z and intensity arrays of a spectrum as float64.
+	"""
+	return tuple(np.asarray(_decode_binary(*specs[array_type]) if array_type in specs else np.empty(0), dtype="float64")
+				 for array_type in [_MZ_ARRAY, _INTENSITY_ARRAY])
+
+
+def _element_peaks(element) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Decode the m/z and intensity arrays of a spectrum element as float64.
+	"""
+	return _decode_peaks(_element_specs(element))
+
+
+def _is_gzip(input_mzml: str) -> bool:
+	"""
+	Check whether a file is gzipped (e.g., .mzML.gz).
+	"""
+	with open(input_mzml, "rb") as open_file:
+		return open_file.read(2) == _GZIP_MAGIC
+
+
+def _file_stamp(input_mzml: str) -> str:
+	"""
+	Create a stamp of an mzML file from its path, size, and modification time.
+	"""
+	stat = os.stat(input_mzml)
+
+	return "%s|%d|%d" % (os.path.abspath(input_mzml), stat.st_size, stat.st_mtime_ns)
+
+
+def _stamp_file(input_mzml: str, prefix: str, ext: str) -> Optional[str]:
+	"""
+	Find the cache file of an mzML file for its path, size, and modification time (None if caching is disabled).
+	"""
+	try:
+		cache_dir = source_cache_dir(input_mzml)
+	except OSError:
+		return None
+	if cache_dir is None:
+		return None
+
+	return os.path.join(cache_dir, "%s-%s%s" % (prefix, hashlib.sha1(_file_stamp(input_mzml).encode()).hexdigest()[:24], ext))
+
+
+def _open_mzml(input_mzml: str):
+	"""
+	Open an mzML file (gzipped or not) for seekable binary reading.
+
+	Gzipped files are opened with indexed_gzip if it is installed. Its seek points 
+	(zran-style checkpoints every 1 MB of uncompressed data) are built in one pass 
+	and, if caching is enabled, stored in the cache directory, so seeks in later 
+	calls and other processes only decompress from the nearest seek point. Without indexed_gzip, gzip is used 
+	and every backward seek decompresses from the start of the file.
+	"""
+	if not _is_gzip(input_mzml):
+		return open(input_mzml, "rb")
+	if igzip is None:
+		return gzip.open(input_mzml, "rb")
+
+	# import stored seek points
+	index_file = _stamp_file(input_mzml, "gzindex", ".gzidx")
+	if index_file is not None and os.path.exists(index_file):
+		return igzip.IndexedGzipFile(input_mzml, spacing=_GZIP_SPACING, index_file=index_file)
+
+	# build seek points (and store them if caching is enabled)
+	gz_file = igzip.IndexedGzipFile(input_mzml, spacing=_GZIP_SPACING)
+	gz_file.build_full_index()
+	if index_file is not None:
+		try:
+			gz_file.export_index(index_file + ".tmp")
+			os.replace(index_file + ".tmp", index_file)
+		except OSError:
+			pass
+
+	return gz_file
+
+
+def _read_index_list(open_file) -> dict:
+	"""
+	Read the spectrum and chromatogram offsets from the indexList of an indexed mzML file.
+
+	Returns an empty dictionary if the file has no (valid) index.
+	"""
+	# find indexList offset at end of file
+	file_size = open_file.seek(0, os.SEEK_END)
+	open_file.seek(max(0, file_size - 4096))
+	match = _INDEX_LIST_OFFSET.search(open_file.read())
+	if match is None or int(match.group(1)) >= file_size:
+		return {}
+
+	# read offsets of each index
+	open_file.seek(int(match.group(1)))
+	index_list = open_file.read()
+	offsets = {}
+	for index_match in _INDEX.finditer(index_list):
+		pairs = _OFFSET.findall(index_match.group(2))
+		offsets[index_match.group(1).decode()] = ([native_id.decode() for native_id, _ in pairs],
+												  np.array([int(offset) for _, offset in pairs], dtype="int64"))
+
+	# check offsets point at elements
+	for name, (native_ids, name_offsets) in offsets.items():
+		for offset in name_offsets[[0, -1]] if len(name_offsets) else []:
+			open_file.seek(offset)
+			if not open_file.read(len(name) + 1) == b"<" + name.encode():
+				return {}
+
+	return offsets
+
+
+def _scan_index(open_file, chunk_size: int = 1 << 24) -> dict:
+	"""
+	Find the spectrum and chromatogram offsets by scanning a (non-indexed) mzML file.
+	"""
+	offsets = {"spectrum": ([], []), "chromatogram": ([], [])}
+	overlap = 1 << 16
+	position = 0
+	last_offset = -1
+
+	open_file.seek(0)
+	while True:
+		chunk = open_file.read(chunk_size)
+		if not chunk:
+			break
+		if len(chunk) == chunk_size:
+			# keep reading past the chunk so that start tags are not split
+			chunk += open_file.read(overlap)
+			open_file.seek(position + chunk_size)
+
+		for match in _ELEMENT_START.finditer(chunk):
+			offset = position + match.start()
+			if offset > last_offset:
+				name = match.group(1).decode()
+				offsets[name][0].append(match.group(2).decode())
+				offsets[name][1].append(offset)
+				last_offset = offset
+		position += chunk_size
+
+	return {name: (native_ids, np.array(name_offsets, dtype="int64")) 
+			for name, (native_ids, name_offsets) in offsets.items()}
+
+
+def _mzml_offsets(input_mzml: str) -> dict:
+	"""
+	Find the spectrum and chromatogram offsets of an mzML file.
+
+	The indexList of indexed mzML files is used. Other files are scanned once and
+	their offsets are kept in memory, or stored in the cache directory if caching
+	is enabled (see msions.cache.enable_cache).
+	"""
+	with _open_mzml(input_mzml) as open_file:
+		offsets = _read_index_list(open_file)
+		if offsets:
+			return offsets
+
+		# look for offsets found before (cached or in memory)
+		cache_file = _stamp_file(input_mzml, "offsets", ".npz")
+		stamp = _file_stamp(input_mzml)
+		if cache_file is None and stamp in _SCANNED_OFFSETS:
+			return _SCANNED_OFFSETS[stamp]
+		if cache_file is not None and os.path.exists(cache_file):
+			with np.load(cache_file) as cached_offsets:
+				return {name: (cached_offsets[name + "_ids"].tolist(), cached_offsets[name + "_offsets"]) 
+						for name in ["spectrum", "chromatogram"]}
+
+		# scan file and keep offsets in memory (or cache them if caching is enabled)
+		offsets = _scan_index(open_file)
+		if cache_file is None:
+			_SCANNED_OFFSETS[stamp] = offsets
+		else:
+			try:
+				np.savez(cache_file + ".tmp.npz", **{name + suffix: np.array(values[i], dtype=dtype) 
+													  for name, values in offsets.items() 
+													  for i, suffix, dtype in [(0, "_ids", str), (1, "_offsets", "int64")]})
+				os.replace(cache_file + ".tmp.npz", cache_file)
+			except OSError:
+				pass
+
+		return offsets
+
+
+class IndexedMzML:
+	"""
+	Random access to the spectra of an mzML file.
+
+	The offsets of indexed mzML files are read from their indexList, and other
+	files are scanned once for their offsets (which are kept in memory, or cached
+	if caching is enabled). A spectrum is read by seeking to its offset and 
+	parsing only that element, so looking up a few scans does not require a pass
+	over the whole file.
+
+	Parameters
+	----------
+	input_mzml : str
+		The input mzML file (or gzipped mzML file).
+
+	Attributes
+	----------
+	ids : List[str]
+		Native ID of each spectrum.
+	scan_nums : np.ndarray
+		Scan number of each spectrum (as in tic_df).
+	offsets : np.ndarray
+		Byte offset of each spectrum.
+
+	Examples
+	-------
+	>>> from msions.mzml import IndexedMzML
+	>>> with IndexedMzML("test.mzML") as run:
+	...     ms1_df = run.scans_df(rt_range=(20, 25), level="1")
+	...     mz, ips = run.peaks(152)
+	"""
+	def __init__(self, input_mzml: str):
+		self.input_mzml = input_mzml
+		offsets = _mzml_offsets(input_mzml)
+		self.ids, self.offsets = offsets.get("spectrum", ([], np.empty(0, dtype="int64")))
+		self.chromatogram_ids, self.chromatogram_offsets = offsets.get("chromatogram", ([], np.empty(0, dtype="int64")))
+		self.scan_nums = np.array([_scan_id(native_id, i + 1) for i, native_id in enumerate(self.ids)], dtype="int64")
+		self._positions = {scan_num: i for i, scan_num in reversed(list(enumerate(self.scan_nums.tolist())))}
+		self._rts = {}
+		self._file = _open_mzml(input_mzml)
+
+	def close(self):
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def __len__(self) -> int:
+		return len(self.offsets)
+
+	def __repr__(self) -> str:
+		return "IndexedMzML(%r, %d spectra)" % (self.input_mzml, len(self))
+
+	def _read(self, offset: int, size_hint: int, end_tag: bytes) -> bytes:
+		"""
+		Read the bytes of an element from its offset to its end tag.
+		"""
+		self._file.seek(offset)
+		data = self._file.read(max(size_hint, 1 << 12))
+		end = data.find(end_tag)
+		while end < 0:
+			more = self._file.read(max(len(data), 1 << 16))
+			if not more:
+				raise ValueError("No %s at offset %d." % (end_tag.decode(), offset))
+			data += more
+			end = data.find(end_tag, len(data) - len(more) - len(end_tag))
+
+		return data[:end + len(end_tag)]
+
+	def element(self, pos: int) -> ET.Element:
+		"""
+		Parse the spectrum element at a position (0 to len - 1).
+		"""
+		offsets = self.offsets
+		size_hint = int(offsets[pos + 1] - offsets[pos]) if pos + 1 < len(offsets) else 0
+
+		return ET.fromstring(self._read(int(offsets[pos]), size_hint, b"</spectrum>"))
+
+	def chromatogram_element(self, pos: int) -> ET.Element:
+		"""
+		Parse the chromatogram element at a position (0 to the number of chromatograms - 1).
+		"""
+		offsets = self.chromatogram_offsets
+		size_hint = int(offsets[pos + 1] - offsets[pos]) if pos + 1 < len(offsets) else 0
+
+		return ET.fromstring(self._read(int(offsets[pos]), size_hint, b"</chromatogram>"))
+
+	def position(self, scan: Union[int, str]) -> int:
+		"""
+		Find the position of a spectrum by scan number or native ID.
+		"""
+		if isinstance(scan, str):
+			return self.ids.index(scan)
+		if int(scan) not in self._positions:
+			raise KeyError("Scan %s is not in %s." % (scan, self.input_mzml))
+
+		return self._positions[int(scan)]
+
+	def spectrum(self, scan: Union[int, str]) -> ET.Element:
+		"""
+		Parse the spectrum element of a scan number or native ID.
+		"""
+		return self.element(self.position(scan))
+
+	def rt(self, pos: int) -> float:
+		"""
+		Find the scan start time of the spectrum at a position.
+		"""
+		if pos not in self._rts:
+			params, _ = _spectrum_params(self.element(pos))
+			self._rts[pos] = float(params.get(_SCAN_TIME, "nan"))
+
+		return self._rts[pos]
+
+	def rt_slice(self, rt_range: Tuple[float, float]) -> slice:
+		"""
+		Find the positions of the spectra in a retention time range (inclusive) by binary search.
+
+		Spectra are expected in order of retention time, as acquired.
+		"""
+		def bisect(rt: float, right: bool) -> int:
+			low, high = 0, len(self)
+			while low < high:
+				mid = (low + high)//2
+				if self.rt(mid) < rt or (right and self.rt(mid) == rt):
+					low = mid + 1
+				else:
+					high = mid
+			return low
+
+		return slice(bisect(rt_range[0], False), bisect(rt_range[1], True))
+
+	def scans_df(self, scans: List[Union[int, str]] = None, rt_range: Tuple[float, float] = None, 
+				 level: str = "all", include_ms1_info: bool = False, faims: bool = False) -> pd.DataFrame:
+		"""
+		Create a tic_df pandas DataFrame of selected spectra.
+
+		Parameters
+		----------
+		scans : List[int or str]
+			Scan numbers or native IDs of the spectra.
+		rt_range : Tuple[float, float]
+			Retention time range of the spectra (used if scans is not given).
+		level, include_ms1_info, faims
+			As in tic_df.
+
+		Returns
+		-------
+		pd.DataFrame
+			A pandas DataFrame with the columns of tic_df.
+		"""
+		if scans is not None:
+			positions = [self.position(scan) for scan in scans]
+		elif rt_range is not None:
+			positions = range(len(self))[self.rt_slice(rt_range)]
+		else:
+			positions = range(len(self))
+
+		include_ms1_info = include_ms1_info and level != "1"
+		columns = _tic_columns((self.element(pos) for pos in positions), level=level,
+							   include_ms1_info=include_ms1_info, faims=faims)
+
+		return _columns2tic_df(columns, include_ms1_info=include_ms1_info, faims=faims)
+
+	def peaks(self, scan: Union[int, str]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Decode the m/z and intensity arrays of a scan number or native ID.
+		"""
+		return _element_peaks(self.spectrum(scan))
+
+
+def _spectrum_shards(input_mzml: str, num_shards: int) -> Tuple[bytes, bytes, List[Tuple[int, int]]]:
+	"""
+	Split the spectra of an mzML file into contiguous byte ranges of about equal size.
+
+	Returns the bytes before the first spectrum (header), the closing tags that 
+	make a shard a valid mzML document (footer), and the byte range of each shard.
+	"""
+	offsets = _mzml_offsets(input_mzml).get("spectrum", ([], np.empty(0, dtype="int64")))[1]
+	if len(offsets) == 0:
+		return b"", b"", []
+
+	with _open_mzml(input_mzml) as open_file:
+		# read everything before first spectrum
+		header = open_file.read(int(offsets[0]))
+
+		# find end of spectrum list
+		open_file.seek(int(offsets[-1]))
+		data = b""
+		while b"</spectrumList>" not in data:
+			more = open_file.read(1 << 20)
+			if not more:
+				raise ValueError("No </spectrumList> in %s." % input_mzml)
+			data += more
+		end = int(offsets[-1]) + data.index(b"</spectrumList>")
+
+	# close elements opened in header
+	footer = b"</spectrumList></run></mzML>" + (b"</indexedmzML>" if b"<indexedmzML" in header else b"")
+
+	# split at spectrum offsets closest to equal byte ranges
+	targets = np.linspace(offsets[0], end, num_shards + 1)[1:-1]
+	bounds = np.unique(np.r_[offsets[0], offsets[np.searchsorted(offsets, targets)], end])
+
+	return header, footer, list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _shard_spectra(input_mzml: str, header: bytes, footer: bytes, start: int, stop: int, keep_binary: bool = False):
+	"""
+	Stream the spectrum elements of one shard of an mzML file.
+	"""
+	with _open_mzml(input_mzml) as open_file:
+		open_file.seek(start)
+		shard = open_file.read(stop - start)
+
+	yield from _iter_spectra(io.BytesIO(header + shard + footer), keep_binary=keep_binary)
+
+
+def _tic_shard(input_mzml: str, header: bytes, footer: bytes, start: int, stop: int, **kwargs) -> dict:
+	"""
+	Extract scan information columns from one shard of an mzML file.
+	"""
+	return _tic_columns(_shard_spectra(input_mzml, header, footer, start, stop), **kwargs)
+
+
+def _peak_shard(input_mzml: str, header: bytes, footer: bytes, start: int, stop: int, 
+				obo_version: str = None) -> list:
+	"""
+	Decode the MS1 peaks of one shard of an mzML file like _iter_ms1_peaks.
+	"""
+	shard_peaks = []
+	for element in _shard_spectra(input_mzml, header, footer, start, stop, keep_binary=True):
+		spectra = pymzml.spec.Spectrum(element, obo_version=obo_version)
 		if spectra.ms_level == 1:
-			peak_array = pd.DataFrame(spectra.peaks("centroided")).rename(columns={0: "mz", 1: "ips"})
-			peak_array["mz"] = peak_array["mz"].round(4)
-			peak_array["rt"] = spectra.scan_time[0]
-			peak_df = pd.concat([peak_df, peak_array])	
+			shard_peaks.append(_ms1_peaks(spectra))
+
+	return shard_peaks
+
+
+def _run_shard(task: tuple):
+	"""
+	Run a shard function in a worker process.
+	"""
+	shard_func, args, kwargs = task
+	return shard_func(*args, **kwargs)
+
+
+def _map_shards(shard_func, input_mzml: str, workers: int, shards_per_worker: int = 4, **kwargs) -> list:
+	"""
+	Run a shard function over contiguous shards of spectra in a process pool (results in file order).
+	"""
+	header, footer, shards = _spectrum_shards(input_mzml, workers*shards_per_worker)
+
+	if not shards:
+		return []
+
+	# spectra are decoded with the obo version of the file
+	if shard_func is _peak_shard:
+		kwargs["obo_version"] = _obo_version(input_mzml)
 
-	return peak_df
\ No newline at end of file
+	tasks = [(shard_func, (input_mzml, header, footer, start, stop), kwargs) for start, stop in shards]
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		return list(executor.map(_run_shard, tasks))
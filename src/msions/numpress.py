@@ -0,0 +1,145 @@
+"""
+This module contains functions that are useful for decoding
+MS-Numpress compressed arrays in Python.
+
+MS-Numpress stores the m/z (linear), retention time (linear), and ion count
+(pic and slof) arrays of mzML files in fewer bytes. The arrays are decoded
+with NumPy for whole arrays at once, so no per-value Python loop is needed.
+"""
+import numpy as np
+
+# positions of the (up to 8) nibbles of an encoded integer
+_NIBBLES = np.arange(8)
+
+
+def _fixed_point(data: np.ndarray) -> float:
+	"""
+	Read the fixed point (big-endian float64) at the start of linear and slof encoded data.
+	"""
+	if len(data) < 8:
+		raise ValueError("Corrupt MS-Numpress data: not enough bytes to read the fixed point.")
+
+	return float(data[:8].view(">f8")[0])
+
+
+def _decode_ints(data: np.ndarray) -> np.ndarray:
+	"""
+	Decode the variable-length integers of a half-byte (nibble) stream.
+
+	Each integer is a head nibble (the number of leading 0 or 0xf nibbles) followed
+	by its other nibbles, least significant first. Since each integer starts where the
+	previous one ends, the starts are found by pointer jumping: the starts of integers
+	0 to 2^k - 1 give the starts of integers 2^k to 2^(k+1) - 1 with jumps of 2^k integers.
+	"""
+	# split bytes into nibbles
+	nibbles = np.empty(2*len(data), dtype="uint8")
+	nibbles[0::2] = data >> 4
+	nibbles[1::2] = data & 0xf
+	num_nibbles = len(nibbles)
+	if num_nibbles == 0:
+		return np.empty(0, dtype="uint32")
+
+	# find number of leading nibbles and next start of an integer starting at each nibble
+	heads = nibbles.astype("int64")
+	leading = np.where(heads <= 8, heads, heads - 8)
+	jumps = np.append(np.minimum(np.arange(num_nibbles) + 9 - leading, num_nibbles), num_nibbles)
+
+	# follow starts from the first nibble
+	starts = np.zeros(1, dtype="int64")
+	while starts[-1] < num_nibbles:
+		starts = np.concatenate([starts, jumps[starts]])
+		jumps = jumps[jumps]
+	starts = starts[starts < num_nibbles]
+
+	# skip padding nibble at the end
+	if starts[-1] + 9 - leading[starts[-1]] > num_nibbles:
+		if starts[-1] != num_nibbles - 1 or nibbles[-1] != 0:
+			raise ValueError("Corrupt MS-Numpress data: integer runs past the end.")
+		starts = starts[:-1]
+
+	# combine nibbles of each integer
+	sizes = 8 - leading[starts]
+	digits = nibbles[np.minimum(starts[:, None] + 1 + _NIBBLES, num_nibbles - 1)].astype("uint64")
+	values = np.where(_NIBBLES < sizes[:, None], digits << (4*_NIBBLES).astype("uint64"), 0).sum(axis=1, dtype="uint64")
+
+	# fill leading 0xf nibbles of negative integers
+	negative = heads[starts] > 8
+	values[negative] |= (1 << 32) - (1 << (4*sizes[negative])).astype("uint64")
+
+	return values.astype("uint32")
+
+
+def _decode_linear(data: np.ndarray) -> np.ndarray:
+	"""
+	Decode linear prediction encoded data (e.g., m/z or retention time).
+	"""
+	fixed_point = _fixed_point(data)
+	if len(data) == 8:
+		return np.empty(0)
+	if len(data) < 12 or 12 < len(data) < 16:
+		raise ValueError("Corrupt MS-Numpress data: not enough bytes to read the first values.")
+
+	# read first two values
+	firsts = data[8:16].view("<u4").astype("int64")
+	if len(data) == 12:
+		return firsts[:1]/fixed_point
+
+	# add residuals to linear predictions (second differences)
+	residuals = _decode_ints(data[16:]).view("int32").astype("int64")
+	steps = (firsts[1] - firsts[0]) + np.cumsum(residuals)
+	ints = np.concatenate([firsts, firsts[1] + np.cumsum(steps)])
+
+	return ints/fixed_point
+
+
+def _decode_pic(data: np.ndarray) -> np.ndarray:
+	"""
+	Decode positive integer compressed data (e.g., ion counts).
+	"""
+	return _decode_ints(data).astype("float64")
+
+
+def _decode_slof(data: np.ndarray) -> np.ndarray:
+	"""
+	Decode short logged float encoded data (e.g., ion counts).
+	"""
+	fixed_point = _fixed_point(data)
+	if len(data) % 2 != 0:
+		raise ValueError("Corrupt MS-Numpress data: odd number of bytes.")
+
+	return np.exp(data[8:].view("<u2")/fixed_point) - 1
+
+
+# decoder of each MS-Numpress method
+_DECODERS = {"linear": _decode_linear, "pic": _decode_pic, "slof": _decode_slof}
+
+
+def decode_numpress(data: bytes, method: str) -> np.ndarray:
+	"""
+	Decode an MS-Numpress compressed array.
+
+	Parameters
+	----------
+	data : bytes
+		The encoded bytes (after base64 decoding and zlib decompression).
+	method : str
+		The MS-Numpress method ("linear", "pic", or "slof").
+
+	Returns
+	-------
+	np.ndarray
+		The decoded float64 array.
+
+	Examples
+	-------
+	>>> from msions.numpress import decode_numpress
+	>>> decode_numpress(encoded_mz, "linear")
+	"""
+	if method not in _DECODERS:
+		raise ValueError("method must be 'linear', 'pic', or 'slof'.")
+
+	data = np.frombuffer(data, dtype="uint8")
+	if len(data) == 0:
+		return np.empty(0)
+
+	return _DECODERS[method](data)
@@ -0,0 +1,197 @@
+"""
+This module contains functions that are useful for storing whole MS1
+peak maps on disk in Python.
+
+A peak map is a directory with a scan table (scan number, retention time, and
+offset of the first peak of each MS1 scan) and the m/z and ion current of all
+peaks in two contiguous binary arrays. The peak arrays are memory-mapped when
+read, so a range of scans can be sliced without loading the rest of the run.
+"""
+import os
+import json
+import shutil
+import pandas as pd
+import numpy as np
+from typing import Tuple, Union
+from msions.mzml import _iter_ms1_peaks
+
+# version of the peak map layout
+_VERSION = 1
+
+
+def write_peak_map(peak_input: Union[pd.DataFrame, str], peak_map_dir: str, mz_dtype: str = "float64",
+				   int_dtype: str = "float32") -> str:
+	"""
+	Write the MS1 peaks of an mzML file or peak_df DataFrame to a peak map directory.
+
+	Spectra are streamed from mzML files, so the peaks of a run never need to
+	fit in memory. The m/z values are stored unrounded.
+
+	Parameters
+	----------
+	peak_input : pd.DataFrame or str
+		The input mzML file or a peak_df pandas DataFrame (peaks of each scan in consecutive rows).
+	peak_map_dir : str
+		The peak map directory to create (replaced if it exists).
+	mz_dtype : str
+		Data type of the stored m/z values.
+	int_dtype : str
+		Data type of the stored ion currents.
+
+	Returns
+	-------
+	str
+		The peak map directory.
+
+	Examples
+	-------
+	>>> from msions.peakmap import write_peak_map
+	>>> write_peak_map("test.mzML", "test.peaks")
+	"""
+	# if it's a data frame already
+	if isinstance(peak_input, pd.DataFrame):
+		scan_nums = peak_input["scan_num"].to_numpy()
+		starts = np.flatnonzero(np.r_[True, scan_nums[1:] != scan_nums[:-1]]) if len(scan_nums) else np.empty(0, dtype="int64")
+		bounds = np.r_[starts, len(scan_nums)]
+		mz = peak_input["mz"].to_numpy()
+		ips = peak_input["ips"].to_numpy()
+		rts = peak_input["rt"].to_numpy()
+		spectra = ((scan_nums[start], rts[start], mz[start:stop], ips[start:stop])
+				   for start, stop in zip(bounds[:-1], bounds[1:]))
+
+	# if it's an mzML file
+	else:
+		spectra = _iter_ms1_peaks(peak_input)
+
+	# write to temporary directory
+	tmp_dir = peak_map_dir.rstrip(os.sep) + ".tmp"
+	if os.path.exists(tmp_dir):
+		shutil.rmtree(tmp_dir)
+	os.makedirs(tmp_dir)
+
+	scan_lst = []
+	rt_lst = []
+	offsets = [0]
+
+	# append peaks of each scan to contiguous arrays
+	with open(os.path.join(tmp_dir, "mz.bin"), "wb") as mz_file, open(os.path.join(tmp_dir, "ips.bin"), "wb") as ips_file:
+		for scan_num, rt, scan_mz, scan_ips in spectra:
+			mz_file.write(np.ascontiguousarray(scan_mz, dtype=np.dtype(mz_dtype).newbyteorder("<")).tobytes())
+			ips_file.write(np.ascontiguousarray(scan_ips, dtype=np.dtype(int_dtype).newbyteorder("<")).tobytes())
+			scan_lst.append(scan_num)
+			rt_lst.append(rt)
+			offsets.append(offsets[-1] + len(scan_mz))
+
+	# write scan table and layout
+	np.savez(os.path.join(tmp_dir, "scans.npz"), scan_num=np.array(scan_lst, dtype="int64"),
+			 rt=np.array(rt_lst, dtype="float64"), offsets=np.array(offsets, dtype="int64"))
+	with open(os.path.join(tmp_dir, "meta.json"), "w") as open_file:
+		json.dump({"version": _VERSION, "num_scans": len(scan_lst), "num_peaks": offsets[-1],
+				   "mz_dtype": np.dtype(mz_dtype).newbyteorder("<").str,
+				   "int_dtype": np.dtype(int_dtype).newbyteorder("<").str}, open_file)
+
+	# replace peak map directory
+	if os.path.exists(peak_map_dir):
+		shutil.rmtree(peak_map_dir)
+	os.replace(tmp_dir, peak_map_dir)
+
+	return peak_map_dir
+
+
+class PeakMap:
+	"""
+	Memory-mapped MS1 peak map written by write_peak_map.
+
+	The scan table is loaded in memory, while the m/z and ion current arrays
+	are memory-mapped, so slicing a range of scans only reads those peaks.
+
+	Parameters
+	----------
+	peak_map_dir : str
+		The peak map directory.
+
+	Attributes
+	----------
+	scan_num, rt : np.ndarray
+		Scan number and retention time of each MS1 scan (in acquisition order).
+	offsets : np.ndarray
+		Position of the first peak of each scan in mz and ips (plus the number of peaks).
+	mz, ips : np.memmap
+		m/z and ion current of all peaks.
+
+	Examples
+	-------
+	>>> from msions.peakmap import PeakMap
+	>>> peak_map = PeakMap("test.peaks")
+	>>> peak_map.to_df(rt_range=(20, 25))
+	"""
+	def __init__(self, peak_map_dir: str):
+		with open(os.path.join(peak_map_dir, "meta.json"), "r") as open_file:
+			meta = json.load(open_file)
+		if meta["version"] != _VERSION:
+			raise ValueError("Unsupported peak map version: %s" % meta["version"])
+
+		# load scan table
+		with np.load(os.path.join(peak_map_dir, "scans.npz")) as scans:
+			self.scan_num = scans["scan_num"]
+			self.rt = scans["rt"]
+			self.offsets = scans["offsets"]
+
+		# memory-map peak arrays
+		self.mz = self._memmap(os.path.join(peak_map_dir, "mz.bin"), meta["mz_dtype"], meta["num_peaks"])
+		self.ips = self._memmap(os.path.join(peak_map_dir, "ips.bin"), meta["int_dtype"], meta["num_peaks"])
+
+	@staticmethod
+	def _memmap(path: str, dtype: str, num_peaks: int) -> np.ndarray:
+		"""
+		Memory-map a peak array (np.memmap cannot map empty files).
+		"""
+		if num_peaks == 0:
+			return np.empty(0, dtype=dtype)
+		return np.memmap(path, dtype=dtype, mode="r", shape=(num_peaks,))
+
+	def __len__(self) -> int:
+		return len(self.scan_num)
+
+	def __repr__(self) -> str:
+		return "PeakMap(%d scans, %d peaks)" % (len(self), self.offsets[-1])
+
+	def scan_slice(self, rt_range: Tuple[float, float] = None, scan_range: Tuple[int, int] = None) -> slice:
+		"""
+		Find the positions of the scans in a retention time and/or scan number range (both inclusive).
+		"""
+		start, stop = 0, len(self)
+		if rt_range is not None:
+			start = max(start, np.searchsorted(self.rt, rt_range[0], side="left"))
+			stop = min(stop, np.searchsorted(self.rt, rt_range[1], side="right"))
+		if scan_range is not None:
+			start = max(start, np.searchsorted(self.scan_num, scan_range[0], side="left"))
+			stop = min(stop, np.searchsorted(self.scan_num, scan_range[1], side="right"))
+
+		return slice(int(start), int(max(start, stop)))
+
+	def peaks(self, rt_range: Tuple[float, float] = None,
+			  scan_range: Tuple[int, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Get the m/z and ion current arrays of the peaks in a retention time and/or scan number range.
+
+		The arrays are views of the memory-mapped peak map.
+		"""
+		scans = self.scan_slice(rt_range, scan_range)
+		peak_start, peak_stop = self.offsets[scans.start], self.offsets[scans.stop]
+
+		return self.mz[peak_start:peak_stop], self.ips[peak_start:peak_stop]
+
+	def to_df(self, rt_range: Tuple[float, float] = None, scan_range: Tuple[int, int] = None) -> pd.DataFrame:
+		"""
+		Create a peak_df pandas DataFrame (mz, ips, rt, and scan_num) of the peaks
+		in a retention time and/or scan number range.
+		"""
+		scans = self.scan_slice(rt_range, scan_range)
+		mz, ips = self.peaks(rt_range, scan_range)
+		num_peaks = np.diff(self.offsets[scans.start:scans.stop + 1])
+
+		return pd.DataFrame({"mz": np.asarray(mz, dtype="float64").round(4).astype(mz.dtype),
+							 "ips": np.array(ips),
+							 "rt": np.repeat(self.rt[scans], num_peaks),
+							 "scan_num": np.repeat(self.scan_num[scans], num_peaks)})
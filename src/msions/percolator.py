@@ -2,15 +2,185 @@
 This module contains functions that are useful for interacting with
 XMLs, such as Percolator output.
 """
+import re
+import html
+import warnings
 import xml.etree.ElementTree as ET
 import pandas as pd
-from typing import Union, List
+from typing import Dict, Union, List, Tuple
+from functools import lru_cache
+from itertools import chain
 import numpy as np
+from msions.utils import window_pairs
+from msions.utils import compact_df
+from msions.cache import cached
+
+# columns of PSM and peptide DataFrames
+_PSM_COLS = ['peptide', 'protein_s', 'q_value', 'exp_mass', 'calc_mass', 'scan_num']
+_PEP_COLS = ['peptide', 'q_value', 'exp_mass', 'calc_mass', 'protein', 'scan_num']
+_PROT_COLS = ['protein', 'q_value', 'pep', 'peptides']
+
+# pattern for the namespace prefix of the root element
+_POUT_ROOT = re.compile(rb'<(\w+:)?percolator_output\b')
+
+# compact PSM and peptide data types (masses stay float64)
+_COMPACT_DTYPES = {'peptide': 'category', 'protein_s': 'category', 'protein': 'category', 
+				   'q_value': 'float32', 'scan_num': 'int32'}
+
+
+def _iter_pout(xmlfile: str, *tags: str):
+	"""
+	Iterate the psm, peptide, or protein elements of a Percolator XML file with their namespace prefix.
+
+	The file is streamed and each element is cleared once it was processed, so
+	memory does not grow with the size of the file. Reading stops once all
+	requested sections were read.
+	"""
+	prefix = None
+	depth = 0
+	section = None
+
+	with open(xmlfile, "rb") as open_file:
+		for event, element in ET.iterparse(open_file, events=("start", "end")):
+			if event == "start":
+				depth += 1
+
+				# detect namespace (and version) from root element
+				if prefix is None:
+					prefix = element.tag[:element.tag.index("}")+1] if element.tag.startswith("{") else ""
+					item_tags = {prefix + tag for tag in tags}
+					section_tags = {prefix + tag + "s" for tag in tags}
+
+				# remember section (psms, peptides, ...)
+				elif depth == 2:
+					section = element
+				continue
+
+			depth -= 1
+
+			# psm, peptide, or protein element
+			if depth == 2:
+				if element.tag in item_tags:
+					yield prefix, element
+				section.clear()
+
+			# stop after the requested sections
+			elif depth == 1:
+				section_tags.discard(element.tag)
+				if not section_tags:
+					break
+				element.clear()
+
+
+@lru_cache()
+def _pout_patterns(prefix: bytes) -> Dict[str, re.Pattern]:
+	"""
+	Compile the patterns of the psm, peptide, and protein elements and their values for an element prefix.
+	"""
+	patterns = {tag: re.compile(rb'<' + prefix + tag.encode() + rb'>([^<]*)<') 
+				for tag in ['q_value', 'pep', 'exp_mass', 'calc_mass', 'protein_id', 'psm_id']}
+	patterns['item'] = re.compile(rb'<' + prefix + rb'(psm|peptide|protein)\s[^>]*?(?:psm|peptide|protein)_id="([^"]*)"')
+	patterns['seq'] = re.compile(rb'<' + prefix + rb'peptide_seq\s[^>]*?\bseq="([^"]*)"')
+
+	return patterns
+
+
+def _iter_pout_items(xmlfile: str, *tags: str, chunk_size: int = 1 << 24):
+	"""
+	Stream the psm, peptide, or protein elements of a Percolator XML file in chunks.
+
+	The file is read in chunks that end after a complete element and each chunk is 
+	split into the elements of one kind with one regular expression, which is several 
+	times faster than building elements with iterparse. For each chunk and kind of 
+	element, the value patterns of the file, the tag, and the IDs and contents of the 
+	elements (as bytes) are yielded. Reading stops once all requested sections were read.
+	"""
+	patterns = None
+	sections = set(tags)
+	buffer = b""
+
+	with open(xmlfile, "rb") as open_file:
+		while sections:
+			block = open_file.read(chunk_size)
+			buffer += block
+
+			# detect element prefix from root element
+			if patterns is None:
+				root = _POUT_ROOT.search(buffer)
+				if root is None and block:
+					continue
+				prefix = root.group(1) or b"" if root else b""
+				patterns = _pout_patterns(prefix)
+				item_ends = [b"</" + prefix + tag + b">" for tag in [b"psm", b"peptide", b"protein", b"psms", 
+																	  b"peptides", b"proteins"]]
+
+			# cut chunk after last complete element
+			if block:
+				cut = max(buffer.rfind(item_end) + len(item_end) if item_end in buffer else 0 for item_end in item_ends)
+				if cut == 0:
+					continue
+				chunk, buffer = buffer[:cut], buffer[cut:]
+			else:
+				chunk, buffer = buffer, b""
+
+			# split chunk into elements (tag, ID, and content)
+			parts = patterns['item'].split(chunk)
+			for tag in tags:
+				items = [i for i in range(1, len(parts), 3) if parts[i] == tag.encode()]
+				if items:
+					yield patterns, tag, [parts[i+1] for i in items], [parts[i+2] for i in items]
+
+			# stop after the requested sections
+			sections.difference_update([tag for tag in tags if b"</" + prefix + tag.encode() + b"s>" in chunk])
+			if not block:
+				break
+
+
+def _findall(pattern: re.Pattern, contents: List[bytes]) -> List[list]:
+	"""
+	Find the values of a pattern in the content of each element.
+	"""
+	return [pattern.findall(content) for content in contents]
+
+
+def _floats(values: List[list]) -> np.ndarray:
+	"""
+	Convert the last value found in each element to a float (NaN if there is none).
+	"""
+	return np.array([found[-1] if found else b"nan" for found in values]).astype("float64")
+
+
+def _scans(psm_ids: List[bytes]) -> List[int]:
+	"""
+	Read the scan numbers of PSM IDs.
+	"""
+	return [int(psm_id.strip().split(b'_')[2]) for psm_id in psm_ids]
+
+
+def _text(value: bytes) -> str:
+	"""
+	Decode the bytes of an XML text or attribute value.
+	"""
+	return html.unescape(value.decode()) if b"&" in value else value.decode()
+
+
+def _dict_prefix(xml_dicts: List[dict], id_key: str) -> str:
+	"""
+	Find the namespace prefix of parsed PSM or peptide dictionaries.
+	"""
+	for key in (xml_dicts[0] if len(xml_dicts) > 0 else []):
+		if key.endswith("}" + id_key) or key == id_key:
+			return key[:-len(id_key)]
+
+	return '{http://per-colator.com/percolator_out/15}'
 
 
 def parse_psms(xmlfile: str) -> List[dict]:
 	"""
 	Parse the PSMs in an XML file.
+
+	The namespace of the Percolator output version is detected from the file
+	and used as the prefix of the dictionary keys.
 	
 	Parameters
 	----------
@@ -27,42 +197,27 @@ def parse_psms(xmlfile: str) -> List[dict]:
 	>>> from msions.percolator import parse_psms
 	>>> parse_psms("test.xml")
 	"""
-	# create element tree object
-	tree = ET.parse(xmlfile)
-
-	# get root element
-	root = tree.getroot()
-
 	# create empty list for PSMs
 	psms = []
 
-	# define root string
-	root_string = './{http://per-colator.com/percolator_out/15}psms/{http://per-colator.com/percolator_out/15}psm'
-
 	# iterate PSMs
-	for psm in root.findall(root_string):
+	for prefix, psm in _iter_pout(xmlfile, "psm"):
 
 		# empty PSM dictionary
 		psm_dict = {}
 
-		psm_dict['{http://per-colator.com/percolator_out/15}psm_id'] = psm.attrib['{http://per-colator.com/percolator_out/15}psm_id']
+		psm_dict[prefix+'psm_id'] = psm.attrib[prefix+'psm_id']
 
 		# iterate child elements of PSM
 		for child in psm:
 
 			# record PSM information in dictionary
-			if child.tag == '{http://per-colator.com/percolator_out/15}protein_id':
-				if '{http://per-colator.com/percolator_out/15}protein_id' in psm_dict.keys():
-					psm_dict['{http://per-colator.com/percolator_out/15}protein_id'].append(child.text)
-					# might need .encode(utf8)?
-				else:
-					psm_dict['{http://per-colator.com/percolator_out/15}protein_id'] = [child.text]
-					# might need encode?
-			elif child.tag == '{http://per-colator.com/percolator_out/15}peptide_seq':
-				psm_dict['{http://per-colator.com/percolator_out/15}peptide_seq'] = (child.attrib['seq'])
+			if child.tag == prefix+'protein_id':
+				psm_dict.setdefault(prefix+'protein_id', []).append(child.text)
+			elif child.tag == prefix+'peptide_seq':
+				psm_dict[prefix+'peptide_seq'] = child.attrib['seq']
 			else:
 				psm_dict[child.tag] = child.text
-				# might need encode?
 
 		# append PSM dictionary to PSM list
 		psms.append(psm_dict)
@@ -75,6 +230,9 @@ def parse_peps(xmlfile: str) -> List[dict]:
 	"""
 	Parse the peptides in an XML file.
 
+	The namespace of the Percolator output version is detected from the file
+	and used as the prefix of the dictionary keys.
+
 	Parameters
 	----------
 	xmlfile : str
@@ -87,43 +245,29 @@ def parse_peps(xmlfile: str) -> List[dict]:
 
 	Examples
 	-------
-	>>> from msions.msxml import parse_peps
+	>>> from msions.percolator import parse_peps
 	>>> parse_peps("test.xml")
 	"""
-	# create element tree object
-	tree = ET.parse(xmlfile)
-
-	# get root element
-	root = tree.getroot()
-
 	# create empty list for peptides
 	peptides = []
 
-	root_string = './{http://per-colator.com/percolator_out/15}peptides/{http://per-colator.com/percolator_out/15}peptide'
-
 	# iterate peptides
-	for peptide in root.findall(root_string):
+	for prefix, peptide in _iter_pout(xmlfile, "peptide"):
 
 		# empty peptide dictionary
 		pep = {}
 
-		pep['{http://per-colator.com/percolator_out/15}peptide_id'] = peptide.attrib['{http://per-colator.com/percolator_out/15}peptide_id']
+		pep[prefix+'peptide_id'] = peptide.attrib[prefix+'peptide_id']
 
 		# iterate child elements of peptide
 		for child in peptide:
 
 			# record peptide information in dictionary
-			if child.tag == '{http://per-colator.com/percolator_out/15}psm_ids':
+			if child.tag == prefix+'psm_ids':
 				for grand_child in child:
-					if '{http://per-colator.com/percolator_out/15}psm_ids' in pep.keys():
-						pep['{http://per-colator.com/percolator_out/15}psm_ids'].append(grand_child.text)
-						# might need .encode(utf8)?
-					else:
-						pep['{http://per-colator.com/percolator_out/15}psm_ids'] = [grand_child.text]
-						# might need encode?
+					pep.setdefault(prefix+'psm_ids', []).append(grand_child.text)
 			else:
 				pep[child.tag] = child.text
-				# might need encode?
 
 		# append peptide dictionary to peptides list
 		peptides.append(pep)
@@ -132,14 +276,94 @@ def parse_peps(xmlfile: str) -> List[dict]:
 	return peptides
 
 
-def psms2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
+def _psm_chunk(patterns: Dict[str, re.Pattern], psm_ids: List[bytes], 
+			   contents: List[bytes]) -> Tuple[list, ...]:
+	"""
+	Read the peptide, proteins, q-value, masses, and scan number of psm elements.
+	"""
+	seqs = [_text(found[-1]) if found else None for found in _findall(patterns['seq'], contents)]
+	prots = [','.join(map(_text, found)) for found in _findall(patterns['protein_id'], contents)]
+
+	return (seqs, prots, _floats(_findall(patterns['q_value'], contents)), 
+			_floats(_findall(patterns['exp_mass'], contents)), _floats(_findall(patterns['calc_mass'], contents)), 
+			_scans(psm_ids))
+
+
+def _pep_chunk(patterns: Dict[str, re.Pattern], peptide_ids: List[bytes], 
+			   contents: List[bytes]) -> Tuple[list, ...]:
+	"""
+	Read the peptide, q-value, masses, protein, and PSM IDs of peptide elements.
+	"""
+	prots = [_text(found[-1]) if found else None for found in _findall(patterns['protein_id'], contents)]
+
+	return ([_text(peptide_id) for peptide_id in peptide_ids], _floats(_findall(patterns['q_value'], contents)), 
+			_floats(_findall(patterns['exp_mass'], contents)), _floats(_findall(patterns['calc_mass'], contents)), 
+			prots, _findall(patterns['psm_id'], contents))
+
+
+def _prot_chunk(patterns: Dict[str, re.Pattern], protein_ids: List[bytes], 
+				contents: List[bytes]) -> Tuple[list, ...]:
+	"""
+	Read the protein, q-value, posterior error probability, and peptides of protein elements.
+	"""
+	seqs = [','.join(map(_text, found)) for found in _findall(patterns['seq'], contents)]
+
+	return ([_text(protein_id) for protein_id in protein_ids], _floats(_findall(patterns['q_value'], contents)), 
+			_floats(_findall(patterns['pep'], contents)), seqs)
+
+
+def _concat_columns(chunks: List[tuple], num_columns: int) -> Tuple[list, ...]:
+	"""
+	Concatenate the columns of chunks (lists and arrays).
+	"""
+	if not chunks:
+		return ([],)*num_columns
+
+	return tuple(np.concatenate(column) if isinstance(column[0], np.ndarray) else list(chain.from_iterable(column)) 
+				 for column in zip(*chunks))
+
+
+def _psm_columns(xmlfile: str) -> Tuple[list, ...]:
+	"""
+	Stream the PSMs of an XML file directly into columns.
+	"""
+	chunks = [_psm_chunk(patterns, psm_ids, contents) 
+			  for patterns, _, psm_ids, contents in _iter_pout_items(xmlfile, "psm")]
+
+	return _concat_columns(chunks, len(_PSM_COLS))
+
+
+def _pep_columns(xmlfile: str) -> Tuple[list, ...]:
+	"""
+	Stream the peptides of an XML file directly into columns (one row per PSM).
+	"""
+	chunks = []
+	for patterns, _, peptide_ids, contents in _iter_pout_items(xmlfile, "peptide"):
+		*values, psm_ids = _pep_chunk(patterns, peptide_ids, contents)
+
+		# repeat peptide values for each of its PSMs
+		num_psms = np.array([len(found) for found in psm_ids], dtype=np.int64)
+		rows = np.repeat(np.arange(len(num_psms)), num_psms)
+		chunks.append(tuple(value[rows] if isinstance(value, np.ndarray) else [value[row] for row in rows] 
+							for value in values) + (_scans([psm_id for found in psm_ids for psm_id in found]),))
+
+	return _concat_columns(chunks, len(_PEP_COLS))
+
+
+@cached
+def psms2df(xml_input: Union[List[dict], str], compact: bool = False) -> pd.DataFrame:
 	"""
 	Create a pandas DataFrame of PSM XML information.
 
+	XML files are streamed in chunks and tokenized without building elements, so 
+	large files are read quickly in bounded memory.
+
 	Parameters
 	----------
 	xml_input : list[dict] or str
 		The PSM list of dictionaries or the XML file.
+	compact : bool
+		Use smaller data types and drop unused columns (see msions.utils.compact_df).
 		
 	Returns
 	-------
@@ -153,35 +377,24 @@ def psms2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
 	""" 
 	# if it's an XML file
 	if isinstance(xml_input, str):
-		# create list of dictionaries
-		psm_xml = parse_psms(xml_input)
+		# stream PSM columns
+		columns = _psm_columns(xml_input)
 
 	# if it's a list of dictionaries already
 	else:
-		psm_xml = xml_input
+		# define prefix
+		prefix = _dict_prefix(xml_input, 'psm_id')
 
-	# define prefix
-	prefix = '{http://per-colator.com/percolator_out/15}'
-
-	# initiate array
-	xml_lst = []
-
-	# iterate through peptide xml
-	for psm in psm_xml:
-		seq = psm[prefix+'peptide_seq']
-		prots = ','.join(psm[prefix+'protein_id'])
-		q_val = psm[prefix+'q_value']
-		exp_mass = psm[prefix+'exp_mass']
-		calc_mass = psm[prefix+'calc_mass']
-		scan = psm[prefix+'psm_id'].strip().split('_')[2]
-		xml_lst.append([seq, prots, q_val, exp_mass, calc_mass, scan])
+		# collect PSM columns
+		columns = ([psm[prefix+'peptide_seq'] for psm in xml_input],
+				   [','.join(psm[prefix+'protein_id']) for psm in xml_input],
+				   [psm[prefix+'q_value'] for psm in xml_input],
+				   [psm[prefix+'exp_mass'] for psm in xml_input],
+				   [psm[prefix+'calc_mass'] for psm in xml_input],
+				   [psm[prefix+'psm_id'].strip().split('_')[2] for psm in xml_input])
 
 	# create pandas DataFrame
-	xml_df = pd.DataFrame(xml_lst, 
-						  columns=['peptide', 'protein_s',
-								   'q_value',
-								   'exp_mass', 'calc_mass',
-								   'scan_num'])
+	xml_df = pd.DataFrame({col: np.array(values, dtype=object) for col, values in zip(_PSM_COLS, columns)})
 
 	# change data types
 	xml_df = xml_df.astype({'q_value': 'float',
@@ -189,18 +402,28 @@ def psms2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
 							'calc_mass': 'float',
 							'scan_num': 'int64'})
 
+	# use smaller data types
+	if compact:
+		xml_df = compact_df(xml_df, _COMPACT_DTYPES)
+
 	# return data frame
 	return xml_df	
 
 
-def peps2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
+@cached
+def peps2df(xml_input: Union[List[dict], str], compact: bool = False) -> pd.DataFrame:
 	"""
 	Create a pandas DataFrame of peptide XML information.
 
+	XML files are streamed in chunks and tokenized without building elements, so 
+	large files are read quickly in bounded memory.
+
 	Parameters
 	----------
 	xml_input : list[dict] or str
 		The peptide list of dictionaries or the XML file.
+	compact : bool
+		Use smaller data types and drop unused columns (see msions.utils.compact_df).
 		
 	Returns
 	-------
@@ -214,35 +437,31 @@ def peps2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
 	""" 
 	# if it's an XML file
 	if isinstance(xml_input, str):
-		# create list of dictionaries
-		pep_xml = parse_peps(xml_input)
+		# stream peptide columns
+		columns = _pep_columns(xml_input)
 
 	# if it's a list of dictionaries already
 	else:
-		pep_xml = xml_input
-
-	# define prefix
-	prefix = '{http://per-colator.com/percolator_out/15}'
-
-	# initiate array
-	xml_lst = []
-
-	# iterate through peptide xml
-	for peptide in pep_xml:
-		seq = peptide[prefix+'peptide_id']
-		q_val = peptide[prefix+'q_value']
-		exp_mass = peptide[prefix+'exp_mass']
-		calc_mass = peptide[prefix+'calc_mass']
-		prot = peptide[prefix+'protein_id']
-		for psm in peptide[prefix+'psm_ids']:
-			scan = psm.strip().split('_')[2]
-			xml_lst.append([seq, q_val, exp_mass, calc_mass, prot, scan])
+		# define prefix
+		prefix = _dict_prefix(xml_input, 'peptide_id')
+
+		# initiate array
+		xml_lst = []
+
+		# iterate through peptide xml
+		for peptide in xml_input:
+			seq = peptide[prefix+'peptide_id']
+			q_val = peptide[prefix+'q_value']
+			exp_mass = peptide[prefix+'exp_mass']
+			calc_mass = peptide[prefix+'calc_mass']
+			prot = peptide[prefix+'protein_id']
+			for psm in peptide[prefix+'psm_ids']:
+				scan = psm.strip().split('_')[2]
+				xml_lst.append([seq, q_val, exp_mass, calc_mass, prot, scan])
+		columns = list(zip(*xml_lst)) if xml_lst else [[]]*len(_PEP_COLS)
 
 	# create pandas DataFrame
-	xml_df = pd.DataFrame(xml_lst,
-						  columns=['peptide', 'q_value',
-								   'exp_mass', 'calc_mass',
-								   'protein', 'scan_num'])
+	xml_df = pd.DataFrame({col: np.array(values, dtype=object) for col, values in zip(_PEP_COLS, columns)})
 
 	# change data types
 	xml_df = xml_df.astype({'q_value': 'float',
@@ -250,10 +469,99 @@ def peps2df(xml_input: Union[List[dict], str]) -> pd.DataFrame:
 							'calc_mass': 'float',
 							'scan_num': 'int64'})
 
+	# use smaller data types
+	if compact:
+		xml_df = compact_df(xml_df, _COMPACT_DTYPES)
+
 	# return data frame
 	return xml_df
 
 
+def pout2dfs(xml_input: str, proteins: bool = False) -> Dict[str, pd.DataFrame]:
+	"""
+	Create pandas DataFrames of the PSMs and peptides (and proteins) of an XML file in one pass.
+
+	PSMs are linked to the peptide they belong to by the integer pep_idx column
+	(the row of the peptide in the peptide DataFrame, -1 if the PSM is not listed
+	by any peptide). PSMs are linked after all sections were read, so the order
+	of the sections does not matter, and a warning is given for PSM IDs of
+	peptides that are not in the psms section. Unlike peps2df, the peptide
+	DataFrame has one row per peptide.
+
+	Parameters
+	----------
+	xml_input : str
+		The XML file.
+	proteins : bool
+		Whether to also read the protein section.
+
+	Returns
+	-------
+	Dict[str, pd.DataFrame]
+		A "psms" pandas DataFrame (psms2df columns and pep_idx), a "peptides"
+		pandas DataFrame (peptide, q_value, exp_mass, calc_mass, protein, and 
+		num_psms), and a "proteins" pandas DataFrame (protein, q_value, pep, and
+		peptides) if proteins is True.
+
+	Examples
+	-------
+	>>> from msions.percolator import pout2dfs
+	>>> pout_dfs = pout2dfs("test.xml")
+	>>> pout_dfs["psms"].join(pout_dfs["peptides"], on="pep_idx", rsuffix="_pep")
+	"""
+	chunks = {"psm": [], "peptide": [], "protein": []}
+	read_chunk = {"psm": _psm_chunk, "peptide": _pep_chunk, "protein": _prot_chunk}
+	psm_ids = []
+
+	# read all sections in one pass
+	tags = ("psm", "peptide", "protein") if proteins else ("psm", "peptide")
+	for patterns, tag, item_ids, contents in _iter_pout_items(xml_input, *tags):
+		chunks[tag].append(read_chunk[tag](patterns, item_ids, contents))
+		if tag == "psm":
+			psm_ids.extend(item_ids)
+
+	# create PSM DataFrame
+	psm_df = pd.DataFrame(dict(zip(_PSM_COLS, _concat_columns(chunks["psm"], len(_PSM_COLS)))))
+	psm_df = psm_df.astype({'q_value': 'float',
+							'exp_mass': 'float',
+							'calc_mass': 'float',
+							'scan_num': 'int64'})
+
+	# create peptide DataFrame
+	*pep_columns, pep_psm_ids = _concat_columns(chunks["peptide"], len(_PEP_COLS))
+	pep_cols = _PEP_COLS[:-1] + ['num_psms']
+	pep_df = pd.DataFrame(dict(zip(pep_cols, pep_columns + [[len(found) for found in pep_psm_ids]])))
+	pep_df = pep_df.astype({'q_value': 'float',
+							'exp_mass': 'float',
+							'calc_mass': 'float',
+							'num_psms': 'int64'})
+
+	# link PSMs to their peptides (after all sections were read)
+	psm_rows = {psm_id: row for row, psm_id in enumerate(psm_ids)}
+	pep_idx = np.full(len(psm_ids), -1, dtype=np.int64)
+	unseen = []
+	for pep_row, found in enumerate(pep_psm_ids):
+		for psm_id in found:
+			psm_row = psm_rows.get(psm_id)
+			if psm_row is None:
+				unseen.append(psm_id)
+			else:
+				pep_idx[psm_row] = pep_row
+	if unseen:
+		warnings.warn("%d PSM IDs of peptides are not in the psms section of %s (e.g., %s)." 
+					  % (len(unseen), xml_input, _text(unseen[0]).strip()))
+	psm_df['pep_idx'] = pep_idx
+
+	pout_dfs = {"psms": psm_df, "peptides": pep_df}
+
+	# create protein DataFrame
+	if proteins:
+		prot_df = pd.DataFrame(dict(zip(_PROT_COLS, _concat_columns(chunks["protein"], len(_PROT_COLS)))))
+		pout_dfs["proteins"] = prot_df.astype({'q_value': 'float', 'pep': 'float'})
+
+	return pout_dfs
+
+
 def id_scans(perc_target, ms2_tic_df):
 	"""
 	Create a column saying whether an MS2 was identified
@@ -281,10 +589,15 @@ def id_scans(perc_target, ms2_tic_df):
 	ms2_tic_df["IDd"] = np.isin(ms2_tic_df["scan_num"], perc_sig['scan'])
 
 
-def match_kro(kro_df: pd.DataFrame, xml_input: pd.DataFrame, ms_input: pd.DataFrame, faims: bool = False):
+def match_kro(kro_df: pd.DataFrame, xml_input: pd.DataFrame, ms_input: pd.DataFrame, faims: bool = False, 
+			  chunk_size: int = 10000):
 	"""
 	Determine if Kronik features were identified or not
 
+	The MS scan information is looked up by scan number once, and Kronik features
+	are sorted by mass (within each CV for FAIMS runs) so that each PSM only checks
+	the features inside its mass window for scan, m/z, and CV agreement.
+
 	Parameters
 	----------
 	kro_df : pd.DataFrame
@@ -295,6 +608,8 @@ def match_kro(kro_df: pd.DataFrame, xml_input: pd.DataFrame, ms_input: pd.DataFr
 		The pandas DataFrame of MS2 scan and precursor information.
 	faims : bool
 		Whether data is from FAIMS runs
+	chunk_size : int
+		Number of PSMs to match at a time.
 
 	Examples
 	-------
@@ -305,60 +620,86 @@ def match_kro(kro_df: pd.DataFrame, xml_input: pd.DataFrame, ms_input: pd.DataFr
 	xml_df = xml_input
 	ms_df = ms_input
 
-	# initiate ID list
-	kro_id_lst = len(kro_df)*[0]
-	xml_id_lst = []
-	xml_int_lst = []
-	xml_tic_lst = []
-	xml_it_lst = []
-
-	for row in xml_df.itertuples():
-		# define info to match
-		ms2_ref_scan = row.scan_num
-		ms1_ref_mass = row.exp_mass
-		subset_ms2_df = ms_df[ms_df.scan_num == ms2_ref_scan]
-		ms1_ref_mz = subset_ms2_df.ms1_mz
-		ms1_ref_scan = subset_ms2_df.ms1_scan.reset_index(drop=True)[0]
-
-		# find TIC and IT for MS1
-		subset_ms_df = ms_df[ms_df.scan_num == ms1_ref_scan]
-		xml_tic_lst.append(subset_ms_df.TIC.reset_index(drop=True)[0])
-		xml_it_lst.append(subset_ms_df.IT.reset_index(drop=True)[0])
-		
-		# filter Kronik DataFrame
-		kro_filt = kro_df[(kro_df.first_scan <= ms1_ref_scan) & (kro_df.last_scan >= ms1_ref_scan)]
-		kro_filt = kro_filt[np.isclose(kro_filt.mz, ms1_ref_mz, atol=1.01)]
-		kro_filt = kro_filt[np.isclose(kro_filt.mass, ms1_ref_mass, atol=1.01)]
+	# create scan number lookup of MS scan information
+	ms_lookup = ms_df.drop_duplicates(subset="scan_num").set_index("scan_num")
+
+	# find triggering MS1 scan and m/z for each PSM
+	ms2_info = ms_lookup.reindex(xml_df.scan_num.to_numpy())
+	ms1_ref_scan = ms2_info.ms1_scan.to_numpy(dtype=float)
+	ms1_ref_mz = ms2_info.ms1_mz.to_numpy(dtype=float)
+	ms1_ref_mass = xml_df.exp_mass.to_numpy(dtype=float)
+
+	# find TIC and IT for MS1
+	ms1_info = ms_lookup.reindex(ms2_info.ms1_scan.to_numpy())
+
+	# define Kronik info to match
+	kro_first = kro_df.first_scan.to_numpy()
+	kro_last = kro_df.last_scan.to_numpy()
+	kro_mz = kro_df.mz.to_numpy(dtype=float)
+	kro_mass = kro_df.mass.to_numpy(dtype=float)
+
+	# if FAIMS experiment, only match features with the same CV
+	if faims:
+		ref_cv = ms2_info.CV.to_numpy()
+		kro_groups = kro_df.groupby("CV").indices.items()
+	else:
+		kro_groups = [(None, np.arange(len(kro_df)))]
+
+	# initiate matched pairs
+	psm_pos_lst = []
+	kro_pos_lst = []
 
-		# if FAIMS experiment
+	for cv, kro_idx in kro_groups:
 		if faims:
-			# define CV to match
-			ref_cv = int(ms_df[ms_df.scan_num == ms2_ref_scan].CV)
-
-			# further filter DataFrame
-			kro_filt = kro_filt[kro_filt.CV == ref_cv]
-
-		# determine indices that are ID'd
-		idx_lst = kro_filt.index
-		num_idxs = len(idx_lst)
-
-		# add ID'd indices to ID lists and feature intensities to XML dataframe
-		if num_idxs == 1:
-			kro_id_lst[idx_lst[0]] = 1
-			xml_int_lst.append(kro_filt.best_int.reset_index(drop=True)[0])
-		elif num_idxs > 1:
-			for idx_single in kro_filt.index:
-				kro_id_lst[idx_single] = num_idxs
-			xml_int_lst.append(max(kro_filt.best_int))
+			group_psms = np.flatnonzero(ref_cv == cv)
 		else:
-			xml_int_lst.append(0)
-		xml_id_lst.append(num_idxs)
+			group_psms = np.arange(len(xml_df))
+
+		# sort Kronik features by mass
+		kro_idx = kro_idx[np.argsort(kro_mass[kro_idx], kind="stable")]
+		sorted_mass = kro_mass[kro_idx]
+
+		for chunk_start in range(0, len(group_psms), chunk_size):
+			psm_pos = group_psms[chunk_start:chunk_start+chunk_size]
+
+			# find features in mass window of each PSM (np.isclose tolerance, slightly widened)
+			mass = ms1_ref_mass[psm_pos]
+			tol = (1.01 + 1e-5*np.abs(mass))*(1 + 1e-9)
+			pair_psm, pair_kro = window_pairs(sorted_mass, mass - tol, mass + tol)
+			pair_psm = psm_pos[pair_psm]
+			pair_kro = kro_idx[pair_kro]
+
+			# keep features that contain the MS1 scan and match m/z and mass
+			keep = (kro_first[pair_kro] <= ms1_ref_scan[pair_psm]) & (kro_last[pair_kro] >= ms1_ref_scan[pair_psm])
+			keep &= np.isclose(kro_mz[pair_kro], ms1_ref_mz[pair_psm], atol=1.01)
+			keep &= np.isclose(kro_mass[pair_kro], ms1_ref_mass[pair_psm], atol=1.01)
+			psm_pos_lst.append(pair_psm[keep])
+			kro_pos_lst.append(pair_kro[keep])
+
+	# order matched pairs by PSM
+	pair_psm = np.concatenate(psm_pos_lst) if psm_pos_lst else np.array([], dtype="int64")
+	pair_kro = np.concatenate(kro_pos_lst) if kro_pos_lst else np.array([], dtype="int64")
+	order = np.argsort(pair_psm, kind="stable")
+	pair_psm = pair_psm[order]
+	pair_kro = pair_kro[order]
+
+	# count matched features for each PSM
+	xml_id_lst = np.bincount(pair_psm, minlength=len(xml_df))
+
+	# find highest feature intensity for each PSM
+	xml_int_lst = np.zeros(len(xml_df), dtype=kro_df.best_int.dtype)
+	np.maximum.at(xml_int_lst, pair_psm, kro_df.best_int.to_numpy()[pair_kro])
+
+	# label ID'd features with number of matches for the last PSM they matched
+	kro_id_lst = np.zeros(len(kro_df), dtype="int64")
+	last_kro, last_idx = np.unique(pair_kro[::-1], return_index=True)
+	kro_id_lst[last_kro] = xml_id_lst[pair_psm[::-1][last_idx]]
 
 	# add IDs to Kronik DataFrame
 	kro_df["ID_d"] = kro_id_lst
 	xml_df["in_kro"] = xml_id_lst
 	xml_df["best_int"] = xml_int_lst
-	xml_df["TIC"] = xml_tic_lst
-	xml_df["IT"] = xml_it_lst
+	xml_df["TIC"] = ms1_info.TIC.to_numpy()
+	xml_df["IT"] = ms1_info.IT.to_numpy()
 	xml_df["ions"] = xml_df['best_int']*xml_df['IT']/1000
-	# xml_df["norm_int"] = xml_df["best_int"]/xml_df["TIC"]
\ No newline at end of file
+	# xml_df["norm_int"] = xml_df["best_int"]/xml_df["TIC"]
@@ -5,9 +5,76 @@ MS data.
 import numpy as np
 import pandas as pd
 import math
-from typing import List
+from typing import List, Tuple, Union
 
-def bin_list(start: float, end: float, bin_size: float, bin_mult: float = 1) -> List[float]:
+class UniformBins:
+	"""
+	Uniformly spaced bin edges.
+
+	Behaves like the list of bin edges from bin_list, but bin_data and
+	BinAccumulator find the bin of each value arithmetically
+	(floor((value - start)/width)) instead of searching the edges.
+	
+	Parameters
+	----------
+	start : float
+		The starting bin edge.
+	stop : float
+		The value that bin edges stay below.
+	width : float
+		The width of the bins.
+	
+	Examples
+	-------
+	>>> from msions.utils import UniformBins
+	>>> rt_bins = UniformBins(0, 101, 0.25)
+	>>> rt_bins.bin_index([0.1, 0.3, 200])
+	array([ 0,  1, -1])
+	"""
+	def __init__(self, start: float, stop: float, width: float):
+		self.start = start
+		self.width = width
+		self.edges = np.arange(start, stop, width)
+
+	def __len__(self) -> int:
+		return len(self.edges)
+
+	def __getitem__(self, idx):
+		return self.edges[idx]
+
+	def __iter__(self):
+		return iter(self.edges)
+
+	def __array__(self, dtype=None, copy=None) -> np.ndarray:
+		return self.edges if dtype is None else self.edges.astype(dtype)
+
+	def __repr__(self) -> str:
+		return "UniformBins(start=%r, width=%r, num_edges=%d)" % (self.start, self.width, len(self.edges))
+
+	def bin_index(self, values) -> np.ndarray:
+		"""
+		Find the left-closed bin of each value (-1 if outside the bin edges).
+		"""
+		values = np.asarray(values, dtype="float64")
+		num_bins = len(self.edges) - 1
+
+		# calculate bin from start and width
+		with np.errstate(invalid="ignore"):
+			idx = np.floor((values - self.start)/self.width)
+		idx = np.clip(np.nan_to_num(idx, nan=-1), 0, max(num_bins - 1, 0)).astype("int64")
+
+		# correct floating point rounding at bin edges
+		idx -= values < self.edges[idx]
+		idx += values >= self.edges[np.minimum(idx + 1, num_bins)]
+
+		# label values outside the bin edges
+		idx[~((values >= self.edges[0]) & (values < self.edges[-1]))] = -1
+
+		return idx
+
+
+def bin_list(start: float, end: float, bin_size: float, bin_mult: float = 1, 
+			 uniform: bool = False) -> Union[List[float], UniformBins]:
 	"""
 	Create a list of bin edges.
 	
@@ -21,10 +88,12 @@ def bin_list(start: float, end: float, bin_size: float, bin_mult: float = 1) ->
 		The size of the bins.		
 	bin_mult : float
 		A multiplier to adjust bin sizing.
+	uniform : bool
+		Return the bin edges as UniformBins for arithmetic binning.
 
 	Returns
 	-------
-	List[float]
+	List[float] or UniformBins
 		A list of bin edges.
 	
 	Examples
@@ -36,6 +105,9 @@ def bin_list(start: float, end: float, bin_size: float, bin_mult: float = 1) ->
 	>>> mz_end = 1005
 	>>> bin_mz_list = bin_list(mz_start, mz_end, mz_bin_size, mz_bin_mult)
 	"""    
+	if uniform:
+		return UniformBins(start, math.ceil(end+(bin_mult-1)*end+1), bin_size*bin_mult)
+
 	bin_list = []
 
 	for num in np.arange(start, math.ceil(end+(bin_mult-1)*end+1), bin_size*bin_mult):
@@ -53,9 +125,9 @@ def bin_data(df: pd.DataFrame, type: str, bin_rt_list: List[float] = None, bin_m
 		The pandas DataFrame of data.
 	type : str
 		Type of binning ("rt", "mz", "both").
-	bin_rt_list : List[float]
+	bin_rt_list : List[float] or UniformBins
 		List of retention time bin edges.		
-	bin_mz_list : List[float]
+	bin_mz_list : List[float] or UniformBins
 		List of m/z bin edges.		
 
 	Returns
@@ -76,21 +148,217 @@ def bin_data(df: pd.DataFrame, type: str, bin_rt_list: List[float] = None, bin_m
 	"""    
 	if type == "rt":
 		# create bin column
-		df['bin_rt'] = pd.cut(df.rt, bin_rt_list, right=False)
+		df['bin_rt'] = _cut(df.rt, bin_rt_list)
 		# sum intensities into bins
-		df_binned = df.groupby(['mz','bin_rt'], as_index=False)[['ips']].sum()       
+		df_binned = df.groupby(['mz','bin_rt'], as_index=False, observed=False)[['ips']].sum()       
 
 	elif type == "mz":
 		# create bin column
-		df['bin_mz'] = pd.cut(df.mz, bin_mz_list, right=False)
+		df['bin_mz'] = _cut(df.mz, bin_mz_list)
 		# sum intensities into bins
-		df_binned = df.groupby(['rt','bin_mz'], as_index=False)[['ips']].sum()
+		df_binned = df.groupby(['rt','bin_mz'], as_index=False, observed=False)[['ips']].sum()
 
 	elif type == "both":
-		# create bin columns
-		df['bin_rt'] = pd.cut(df.rt, bin_rt_list, right=False)
-		df['bin_mz'] = pd.cut(df.mz, bin_mz_list, right=False)
 		# sum intensities into bins
-		df_binned = df.groupby(['bin_rt','bin_mz'], as_index=False)[['ips']].sum()
+		df_binned = BinAccumulator(bin_rt_list, bin_mz_list).add(df).to_df()
+
+	return df_binned
+
+class BinAccumulator:
+	"""
+	Accumulate summed ion current in retention time and m/z bins.
+
+	Peaks are added in chunks (e.g., from mzml.iter_peak_chunks) into a dense
+	histogram, so a whole run can be binned without building its peak table.
+	Bins are closed on the left, like bin_data.
+	
+	Parameters
+	----------
+	bin_rt_list : List[float] or UniformBins
+		List of retention time bin edges.		
+	bin_mz_list : List[float] or UniformBins
+		List of m/z bin edges.
+	dtype : str
+		Data type of the summed ion current.
+	
+	Examples
+	-------
+	>>> from msions.mzml import iter_peak_chunks
+	>>> from msions.utils import bin_list, BinAccumulator
+	>>> bins = BinAccumulator(bin_list(0, 100, 0.25), bin_list(399, 1005, 4, 1.0005))
+	>>> for chunk in iter_peak_chunks("test.mzML"):
+	...     bins.add(chunk)
+	>>> bin_df = bins.to_df()
+	"""
+	def __init__(self, bin_rt_list: List[float], bin_mz_list: List[float], dtype: str = "float64"):
+		self.rt_bins = bin_rt_list
+		self.mz_bins = bin_mz_list
+		self.rt_edges = np.asarray(bin_rt_list, dtype="float64")
+		self.mz_edges = np.asarray(bin_mz_list, dtype="float64")
+		self.hist = np.zeros((len(self.rt_edges) - 1, len(self.mz_edges) - 1), dtype=dtype)
+
+	def add(self, df: pd.DataFrame) -> "BinAccumulator":
+		"""
+		Add the ion current of a DataFrame of peaks (rt, mz, and ips columns) to the bins.
+		"""
+		# find bin of each peak
+		rt_idx = _bin_index(self.rt_bins, df.rt.to_numpy(dtype="float64"))
+		mz_idx = _bin_index(self.mz_bins, df.mz.to_numpy(dtype="float64"))
+		keep = (rt_idx >= 0) & (mz_idx >= 0)
+
+		# sum intensities into bins
+		n_rt, n_mz = self.hist.shape
+		self.hist += np.bincount(rt_idx[keep]*n_mz + mz_idx[keep], 
+								 weights=df.ips.to_numpy(dtype="float64")[keep],
+								 minlength=n_rt*n_mz).reshape(n_rt, n_mz).astype(self.hist.dtype)
+
+		return self
+
+	def to_array(self) -> np.ndarray:
+		"""
+		Return the binned ion current as an array of shape (retention time bins, m/z bins).
+		"""
+		return self.hist.copy()
+
+	def to_df(self, drop_empty: bool = False) -> pd.DataFrame:
+		"""
+		Return the binned ion current as a pandas DataFrame like bin_data(type="both").
+		"""
+		n_rt, n_mz = self.hist.shape
+		rt_codes = np.repeat(np.arange(n_rt), n_mz)
+		mz_codes = np.tile(np.arange(n_mz), n_rt)
+		ips = self.hist.ravel()
+
+		# only keep bins with ion current
+		if drop_empty:
+			keep = ips != 0
+			rt_codes, mz_codes, ips = rt_codes[keep], mz_codes[keep], ips[keep]
+
+		# use the same bin categories as pd.cut
+		rt_dtype = pd.cut(np.empty(0), self.rt_edges, right=False).dtype
+		mz_dtype = pd.cut(np.empty(0), self.mz_edges, right=False).dtype
+
+		return pd.DataFrame({"bin_rt": pd.Categorical.from_codes(rt_codes, dtype=rt_dtype),
+							 "bin_mz": pd.Categorical.from_codes(mz_codes, dtype=mz_dtype),
+							 "ips": ips})
+
+
+def _bin_index(bins: Union[List[float], UniformBins], values: np.ndarray) -> np.ndarray:
+	"""
+	Find the left-closed bin of each value (-1 if outside the bin edges).
+	"""
+	# calculate bins arithmetically for uniform bins
+	if isinstance(bins, UniformBins):
+		return bins.bin_index(values)
+
+	edges = np.asarray(bins, dtype="float64")
+	idx = np.searchsorted(edges, values, side="right") - 1
+	idx[(idx >= len(edges) - 1) | np.isnan(values)] = -1
+
+	return idx
+
+
+def _cut(values: pd.Series, bins: Union[List[float], UniformBins]) -> pd.Categorical:
+	"""
+	Bin values like pd.cut(values, bins, right=False).
+	"""
+	if isinstance(bins, UniformBins):
+		return pd.Categorical.from_codes(bins.bin_index(values), 
+										 dtype=pd.cut(np.empty(0), bins.edges, right=False).dtype)
+
+	return pd.cut(values, bins, right=False)
+
+
+def window_pairs(sorted_vals: np.ndarray, low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Find all positions of sorted values that fall inside a set of windows.
+	
+	Parameters
+	----------
+	sorted_vals : np.ndarray
+		Values sorted in ascending order.
+	low : np.ndarray
+		Lower edge of each window (inclusive).
+	high : np.ndarray
+		Upper edge of each window (inclusive).
+
+	Returns
+	-------
+	Tuple[np.ndarray, np.ndarray]
+		Window positions and sorted value positions for every pair.
+	
+	Examples
+	-------
+	>>> import numpy as np
+	>>> from msions.utils import window_pairs
+	>>> window_pairs(np.array([1.0, 2.0, 3.0]), np.array([0.5, 2.5]), np.array([2.0, 3.5]))
+	(array([0, 0, 1]), array([0, 1, 2]))
+	"""
+	# find first and last position within each window
+	lo = np.searchsorted(sorted_vals, low, side="left")
+	hi = np.searchsorted(sorted_vals, high, side="right")
+	n_pairs = np.maximum(hi - lo, 0)
+
+	# expand windows into pairs
+	window_pos = np.repeat(np.arange(len(lo)), n_pairs)
+	val_pos = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs) + np.repeat(lo, n_pairs)
+
+	return window_pos, val_pos
+
+
+def compact_df(df: pd.DataFrame, dtypes: dict, drop: List[str] = None) -> pd.DataFrame:
+	"""
+	Downcast the columns of a pandas DataFrame to smaller data types.
+
+	This is the compact=True mode of the DataFrame builders (hk2df, simple_df,
+	tic_df, psms2df, and peps2df), which follow the same precision contract:
+
+	- m/z and mass columns stay float64, because they are matched at ppm tolerances
+	  (float32 would move an m/z of 1000 by up to 0.06 ppm and a mass of 4000 by up to 0.25 mDa).
+	- Retention times, intensities, TIC, injection times, ions, scores, and q-values
+	  are float32 (about 7 significant digits, i.e. 0.25 ms at 60 min).
+	- Scan numbers are int32, charges and CVs int16.
+	- Peptide and protein strings are categoricals.
+	- Columns that are not used by msions are dropped.
+
+	Integer columns are only downcast if all values fit and none are missing.
+
+	Parameters
+	----------
+	df : pd.DataFrame
+		The pandas DataFrame to downcast.
+	dtypes : dict
+		Data type of each column (columns not in df are skipped).
+	drop : List[str]
+		Columns to drop (columns not in df are skipped).
+
+	Returns
+	-------
+	pd.DataFrame
+		The downcast pandas DataFrame.
+
+	Examples
+	-------
+	>>> from msions.utils import compact_df
+	>>> compact_df(hk_df, {"intensity": "float32", "scan_num": "int32"}, drop=["window"])
+	"""
+	# drop unused columns
+	if drop is not None:
+		df = df.drop(columns=[col for col in drop if col in df.columns])
+
+	# downcast columns
+	new_dtypes = {}
+	for col, dtype in dtypes.items():
+		if col not in df.columns:
+			continue
+
+		# check integers fit
+		if dtype != "category" and np.dtype(dtype).kind == "i":
+			values = df[col]
+			if values.isna().any() or (len(values) > 0 and (values.min() < np.iinfo(dtype).min or
+															 values.max() > np.iinfo(dtype).max)):
+				continue
+
+		new_dtypes[col] = dtype
 
-	return df_binned
\ No newline at end of file
+	return df.astype(new_dtypes)
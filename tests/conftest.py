@@ -0,0 +1,25 @@
+import sqlite3
+import pytest
+
+@pytest.fixture
+def elib_file(tmp_path):
+	"""Create a small elib file with entries and peptidescores tables"""
+	elib_file = str(tmp_path / "test.elib")
+	elib_connection = sqlite3.connect(elib_file)
+	elib_connection.execute("""CREATE TABLE entries (PrecursorCharge int, PrecursorMz double, PeptideModSeq string, 
+							   PeptideSeq string, RTInSeconds float, RTInSecondsStart float, RTInSecondsStop float, 
+							   Score double)""")
+	elib_connection.execute("""CREATE TABLE peptidescores (PrecursorCharge int, PeptideModSeq string, 
+							   QValue float)""")
+	entries = [(2, 500.25, "PEPTIDE", "PEPTIDE", 600.0, 590.0, 610.0, 1.0),
+			   (3, 400.5, "PEPTIDEK", "PEPTIDEK", 1200.0, 1190.0, 1210.0, 2.0),
+			   (2, 700.75, "PEPTIDER", "PEPTIDER", 1800.0, 1790.0, 1810.0, 3.0),
+			   (4, 350.1, "PEPTIDES", "PEPTIDES", 2400.0, 2390.0, 2410.0, 4.0)]
+	elib_connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+	elib_connection.executemany("INSERT INTO peptidescores VALUES (?, ?, ?)", 
+								[(2, "PEPTIDE", 0.001), (3, "PEPTIDEK", 0.05), (2, "PEPTIDER", 0.005), 
+								 (4, "PEPTIDES", 0.009)])
+	elib_connection.commit()
+	elib_connection.close()
+
+	return elib_file
@@ -0,0 +1,27 @@
+from msions.utils import bin_list
+from msions.utils import BinAccumulator
+from msions.mzml import iter_peak_chunks
+from msions.mzml import peak_df
+import numpy as np
+import pandas as pd
+
+def test_bin_accumulator():
+	"""Test binning of streamed MS1 peak chunks"""
+	bin_rt_list = bin_list(0, 100, 0.25, 1)
+	bin_mz_list = bin_list(399, 1005, 4, 1.0005)
+
+	# bin chunks of peaks
+	bins = BinAccumulator(bin_rt_list, bin_mz_list)
+	for chunk in iter_peak_chunks("tests/mzml_fixture.mzML", chunk_peaks=500):
+		bins.add(chunk)
+
+	# compare to binning all peaks with pd.cut
+	df = peak_df("tests/mzml_fixture.mzML")
+	df['bin_rt'] = pd.cut(df.rt, bin_rt_list, right=False)
+	df['bin_mz'] = pd.cut(df.mz, bin_mz_list, right=False)
+	expected_df = df.groupby(['bin_rt','bin_mz'], as_index=False, observed=False)[['ips']].sum()
+	actual_df = bins.to_df()
+	assert bins.to_array().shape == (len(bin_rt_list) - 1, len(bin_mz_list) - 1), "Histogram has the wrong shape."
+	assert actual_df.bin_rt.equals(expected_df.bin_rt) and actual_df.bin_mz.equals(expected_df.bin_mz), "Bins were not created properly."
+	assert np.allclose(actual_df.ips, expected_df.ips), "Ion current was not binned properly."
+	assert len(bins.to_df(drop_empty=True)) == sum(expected_df.ips > 0), "Empty bins were not dropped."
@@ -44,3 +44,8 @@ def test_bin_data():
 	expected_num_rows = 521885
 	actual_num_rows = bin_df.shape[0]
 	assert actual_num_rows == expected_num_rows, "rt was not binned properly."
+
+	# test uniform bins give the same DataFrame
+	uniform_rt_bins = bin_list(rt_start, rt_end, rt_bin_size, rt_bin_mult, uniform=True)
+	uniform_df = bin_data(peak_df, type="rt", bin_rt_list=uniform_rt_bins)
+	assert uniform_df.equals(bin_df), "rt was not binned properly with uniform bins."
@@ -1,4 +1,5 @@
 from msions.utils import bin_list
+import numpy as np
 
 
 def test_bin_list():
@@ -9,4 +10,14 @@ def test_bin_list():
 	mz_bin_mult = 1.0005
 	expected_num_edges = 152
 	actual_num_edges = len(bin_list(mz_start, mz_end, mz_bin_size, mz_bin_mult))
-	assert actual_num_edges == expected_num_edges, "List of bin edges was not created properly."
\ No newline at end of file
+	assert actual_num_edges == expected_num_edges, "List of bin edges was not created properly."
+
+def test_uniform_bins():
+	"""Test uniform bin edges and arithmetic bin assignment"""
+	bin_mz_list = bin_list(399, 1005, 4, 1.0005)
+	uniform_bins = bin_list(399, 1005, 4, 1.0005, uniform=True)
+	assert list(uniform_bins) == bin_mz_list, "Uniform bin edges do not match list of bin edges."
+	values = np.array(bin_mz_list + [398.9, 1003.4, np.nan, 500.0])
+	expected_idx = np.searchsorted(bin_mz_list, values, side="right") - 1
+	expected_idx[-5:-1] = -1
+	assert np.array_equal(uniform_bins.bin_index(values), expected_idx), "Values were not assigned to the right bins."
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+from msions.encyclopedia import build_elib_index
+
+def test_build_elib_index(elib_file):
+	"""Test R*Tree index is built once and rebuilt when the elib file changes"""
+	# test index is built
+	index_file = build_elib_index(elib_file)
+	assert index_file == elib_file + ".rtree", "Index file was not created next to the elib file."
+	index_connection = sqlite3.connect(index_file)
+	num_entries = index_connection.execute("SELECT COUNT(*) FROM entries_rtree").fetchone()[0]
+	index_connection.close()
+	assert num_entries == 4, "Index does not contain all entries."
+
+	# test index is reused
+	mtime = os.stat(index_file).st_mtime_ns
+	build_elib_index(elib_file)
+	assert os.stat(index_file).st_mtime_ns == mtime, "Index was rebuilt for an unchanged elib file."
+
+	# test index is rebuilt
+	elib_connection = sqlite3.connect(elib_file)
+	elib_connection.execute("DELETE FROM entries WHERE PrecursorCharge = 4")
+	elib_connection.commit()
+	elib_connection.close()
+	index_connection = sqlite3.connect(build_elib_index(elib_file))
+	num_entries = index_connection.execute("SELECT COUNT(*) FROM entries_rtree").fetchone()[0]
+	index_connection.close()
+	assert num_entries == 3, "Index was not rebuilt for a changed elib file."
+
+def test_concurrent_index(elib_file):
+	"""Test the temporary index files of other processes are left alone"""
+	other_tmp_file = "%s.rtree.%d.tmp" % (elib_file, os.getpid() + 1)
+	with open(other_tmp_file, "w") as open_file:
+		open_file.write("partial index of another process")
+	index_file = build_elib_index(elib_file)
+	assert os.path.exists(other_tmp_file), "Temporary index file of another process was removed."
+	tmp_files = [name for name in os.listdir(os.path.dirname(index_file)) if name.endswith(".tmp")]
+	assert tmp_files == [os.path.basename(other_tmp_file)], "Temporary index file was not moved into place."
@@ -0,0 +1,46 @@
+import sqlite3
+from msions.encyclopedia import bulk_match_hk
+from msions.encyclopedia import match_hk
+import msions.hardklor as hk
+import pandas as pd
+import numpy as np
+
+
+def test_bulk_match_hk():
+	"""Test bulk match function for Hardklor and EncyclopeDIA output"""
+	hk_df = hk.hk2df("tests/hk_fixture.hk")
+
+	# create elib-like DataFrame from Hardklor features with shifted m/z
+	rng = np.random.default_rng(0)
+	encyclo_df = pd.DataFrame({"PrecursorMz": np.repeat(hk_df.mz.to_numpy(), 2)*(1 + rng.uniform(-1e-5, 1e-5, 2*len(hk_df))),
+							   "PrecursorCharge": np.repeat(hk_df.charge.to_numpy(), 2),
+							   "RTInSecondsStart": np.repeat(hk_df.rt_s.to_numpy(), 2) - rng.uniform(-5, 30, 2*len(hk_df)),
+							   "RTInSecondsStop": np.repeat(hk_df.rt_s.to_numpy(), 2) + rng.uniform(-5, 30, 2*len(hk_df))})
+
+	expected_matches = hk_df.apply(match_hk, axis=1, other_df=encyclo_df)
+	actual_matches, match_df = bulk_match_hk(hk_df, encyclo_df, return_idx=True)
+	assert expected_matches.sum() > 0, "Test fixture did not create any matches."
+	assert (actual_matches == expected_matches).all(), "Bulk Hardklor and EncyclopeDIA match function did not work properly."
+	assert len(match_df) == actual_matches.sum(), "Matched indices were not returned properly."
+
+
+def test_index_match_hk(tmp_path):
+	"""Test bulk match through an R*Tree index of an elib file"""
+	hk_df = hk.hk2df("tests/hk_fixture.hk")
+
+	# create elib file from Hardklor features with shifted m/z
+	rng = np.random.default_rng(1)
+	encyclo_df = pd.DataFrame({"PrecursorMz": np.repeat(hk_df.mz.to_numpy(), 2)*(1 + rng.uniform(-1e-5, 1e-5, 2*len(hk_df))),
+							   "PrecursorCharge": np.repeat(hk_df.charge.to_numpy(), 2),
+							   "RTInSecondsStart": np.repeat(hk_df.rt_s.to_numpy(), 2) - rng.uniform(-5, 30, 2*len(hk_df)),
+							   "RTInSecondsStop": np.repeat(hk_df.rt_s.to_numpy(), 2) + rng.uniform(-5, 30, 2*len(hk_df))})
+	elib_file = str(tmp_path / "test.elib")
+	elib_connection = sqlite3.connect(elib_file)
+	encyclo_df.to_sql("entries", elib_connection, index=False)
+	elib_connection.close()
+
+	expected_matches, expected_df = bulk_match_hk(hk_df, encyclo_df, return_idx=True)
+	actual_matches, match_df = bulk_match_hk(hk_df, elib_file, return_idx=True)
+	assert expected_matches.sum() > 0, "Test fixture did not create any matches."
+	assert (actual_matches == expected_matches).all(), "Indexed Hardklor and EncyclopeDIA match function did not work properly."
+	assert (match_df.elib_idx.to_numpy() == expected_df.elib_idx.to_numpy() + 1).all(), "Matched rowids were not returned properly."
@@ -0,0 +1,17 @@
+from msions.kronik import simple_df
+from msions.kronik import match_rt_mass
+from msions.kronik import bulk_match_rt_mass
+
+def test_bulk_match_rt_mass():
+	"""Test bulk match function for Kronik DataFrames"""
+	kro_df = simple_df("tests/kro_fixture.kro")
+	redund_df = kro_df.copy().iloc[0:1000, ]
+	expected_matches = 1042
+	actual_matches = sum(bulk_match_rt_mass(redund_df, other_df=kro_df, rt_diff=1))
+	assert actual_matches == expected_matches, "Bulk Kronik match function did not work properly."
+
+	# test self-match without retention time window
+	self_df = kro_df.copy().iloc[0:500, ]
+	expected_self = self_df.apply(match_rt_mass, axis=1, other_df=self_df)
+	actual_self = bulk_match_rt_mass(self_df)
+	assert (actual_self == expected_self).all(), "Bulk Kronik self-match function did not work properly."
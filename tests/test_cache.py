@@ -0,0 +1,66 @@
+import os
+import msions.cache
+from msions.cache import enable_cache
+from msions.cache import disable_cache
+from msions.hardklor import hk2df
+from msions.mzml import peak_df
+
+def test_cache(tmp_path):
+	"""Test DataFrames are loaded from the cache"""
+	enable_cache(str(tmp_path))
+	try:
+		first_df = hk2df("tests/hk_fixture.hk")
+		cache_files = [name for name in os.listdir(tmp_path) if name.startswith("hk2df-")]
+		second_df = hk2df("tests/hk_fixture.hk")
+		third_df = hk2df("tests/hk_fixture.hk", by_int=True)
+	finally:
+		disable_cache()
+	assert len(cache_files) == 1, "DataFrame was not cached."
+	assert first_df.equals(second_df), "Cached DataFrame is not the same as the parsed DataFrame."
+	assert first_df.equals(hk2df("tests/hk_fixture.hk")), "Cached DataFrame is not the same as the parsed DataFrame."
+	assert not first_df.equals(third_df), "Cache key does not include the arguments."
+
+def test_pickle_cache(tmp_path, monkeypatch):
+	"""Test DataFrames are cached as pickles without pyarrow"""
+	monkeypatch.setattr(msions.cache, "feather", None)
+	enable_cache(str(tmp_path))
+	try:
+		first_df = hk2df("tests/hk_fixture.hk")
+		second_df = hk2df("tests/hk_fixture.hk")
+	finally:
+		disable_cache()
+	assert any(name.endswith(".pkl") for name in os.listdir(tmp_path)), "DataFrame was not cached as a pickle."
+	assert first_df.equals(second_df), "Cached DataFrame is not the same as the parsed DataFrame."
+
+def test_evict_cache(tmp_path):
+	"""Test the cache directory is kept below its maximum size"""
+	enable_cache(str(tmp_path), max_bytes=0)
+	try:
+		hk2df("tests/hk_fixture.hk")
+	finally:
+		disable_cache()
+	assert os.listdir(tmp_path) == [], "Least recently used cache files were not removed."
+
+def test_cache_version(tmp_path, monkeypatch):
+	"""Test DataFrames cached by another schema version are not used"""
+	enable_cache(str(tmp_path))
+	try:
+		hk2df("tests/hk_fixture.hk")
+		monkeypatch.setattr(msions.cache, "_SCHEMA_VERSION", msions.cache._SCHEMA_VERSION + 1)
+		hk2df("tests/hk_fixture.hk")
+	finally:
+		disable_cache()
+	cache_files = [name for name in os.listdir(tmp_path) if name.startswith("hk2df-")]
+	assert len(cache_files) == 2, "Cache key does not include the schema version."
+
+def test_cache_ignore(tmp_path):
+	"""Test arguments that do not change the DataFrame are not in the cache key"""
+	enable_cache(str(tmp_path))
+	try:
+		first_df = peak_df("tests/mzml_fixture.mzML")
+		second_df = peak_df("tests/mzml_fixture.mzML", threads=2)
+	finally:
+		disable_cache()
+	cache_files = [name for name in os.listdir(tmp_path) if name.startswith("peak_df-")]
+	assert len(cache_files) == 1, "Cache key includes the number of threads."
+	assert first_df.equals(second_df), "Cached DataFrame is not the same as the parsed DataFrame."
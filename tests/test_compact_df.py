@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from msions.utils import compact_df
+from msions.hardklor import hk2df
+from msions.kronik import simple_df
+from msions.mzml import tic_df
+from msions.percolator import psms2df
+from msions.percolator import peps2df
+
+def test_compact_df():
+	"""Test columns are downcast only if their values fit"""
+	df = pd.DataFrame({"scan_num": [1, 2, 3], "big": [1, 2, 2**40], "missing": [1.0, np.nan, 3.0],
+					   "rt": [1.5, 2.5, 3.5], "peptide": ["PEPTIDE", "PEPTIDE", "PEPTIDEK"], "unused": [0, 0, 0]})
+	actual_df = compact_df(df, {"scan_num": "int32", "big": "int32", "missing": "int16", "rt": "float32", 
+								"peptide": "category", "absent": "int16"}, drop=["unused", "absent"])
+	expected_dtypes = {"scan_num": "int32", "big": "int64", "missing": "float64", "rt": "float32", "peptide": "category"}
+	assert actual_df.dtypes.astype(str).to_dict() == expected_dtypes, "Columns were not downcast correctly."
+
+def test_compact_builders():
+	"""Test compact DataFrames keep m/z and masses exactly and other values closely"""
+	builders = [lambda compact: hk2df("tests/hk_fixture.hk", compact=compact),
+				lambda compact: simple_df("tests/kro_fixture.kro", compact=compact),
+				lambda compact: tic_df("tests/mzml_fixture.mzML", level="all", include_ms1_info=True, compact=compact),
+				lambda compact: psms2df("tests/psm_fixture.pout.xml", compact=compact),
+				lambda compact: peps2df("tests/pep_fixture.pout.xml", compact=compact)]
+
+	for builder in builders:
+		full_df = builder(False)
+		actual_df = builder(True)
+		assert actual_df.memory_usage(deep=True).sum() < full_df.memory_usage(deep=True).sum(), "DataFrame was not compacted."
+		for col in actual_df.columns:
+			if col in ["mz", "mass", "ms1_mz", "exp_mass", "calc_mass", "base_peak"]:
+				assert actual_df[col].dtype == "float64", "m/z or mass column was downcast."
+				assert actual_df[col].equals(full_df[col]), "m/z or mass column was changed."
+			elif pd.api.types.is_numeric_dtype(actual_df[col]):
+				assert np.allclose(actual_df[col].astype(float), full_df[col].astype(float), rtol=1e-6, equal_nan=True), "Column was not kept closely."
+			else:
+				assert (actual_df[col].astype(str) == full_df[col].astype(str)).all(), "String column was changed."
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from msions.numpress import decode_numpress
+
+# arrays encoded with the MS-Numpress reference implementation
+LINEAR_BYTES = b'Ak 6@\x00\x00\x00\x88\xa9\xc4Ta*1U-`F9\x1e\xdb\x0f\xe0Q\xed\xb0\xf7'
+PIC_BYTES = b'\x87\x17\xf6\x01o\xf5\x8e1Q\xdc\xb5p'
+SLOF_BYTES = b'@\xb1`\x00\x00\x00\x00\x00\x00\x00\xec\x0f\nx\xf7\xff'
+
+def test_decode_numpress():
+	"""Test decoding of MS-Numpress linear, pic, and slof arrays"""
+	linear = decode_numpress(LINEAR_BYTES, "linear")
+	assert np.allclose(linear, [100.0, 100.5, 101.25, 100.75, 250.125], rtol=0, atol=1e-6), "Linear array was not decoded correctly."
+	pic = decode_numpress(PIC_BYTES, "pic")
+	assert pic.tolist() == [0, 1, 15, 16, 255, 1000, 123456789], "Pic array was not decoded correctly."
+	slof = decode_numpress(SLOF_BYTES, "slof")
+	assert np.allclose(slof, [0, 1.5, 1000, 2.5e6], rtol=2e-4), "Slof array was not decoded correctly."
+	assert len(decode_numpress(b"", "linear")) == 0, "Empty array was not decoded correctly."
+	with pytest.raises(ValueError):
+		decode_numpress(PIC_BYTES, "zlib")
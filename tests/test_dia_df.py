@@ -1,3 +1,4 @@
+import pytest
 from msions.encyclopedia import dia_df
 
 def test_dia_df():
@@ -6,3 +7,23 @@ def test_dia_df():
 	actual_type = type(dia_df("tests/large_fixtures/elib_fixture.elib")).__name__
 	assert actual_type == expected_type, "DataFrame was not created correctly. Check format of file."
 
+def test_dia_filters(elib_file):
+	"""Test filters are applied to an elib file"""
+	# test all entries and default columns
+	all_df = dia_df(elib_file)
+	assert all_df.shape == (4, 7), "Number of rows or columns in DataFrame is unexpected."
+
+	# test each filter
+	assert dia_df(elib_file, charges=[2]).PeptideModSeq.tolist() == ["PEPTIDE", "PEPTIDER"], "Charges were not filtered."
+	assert dia_df(elib_file, mz_range=(390, 510)).PeptideModSeq.tolist() == ["PEPTIDE", "PEPTIDEK"], "m/z was not filtered."
+	assert dia_df(elib_file, rt_range=(1000, 2000)).PeptideModSeq.tolist() == ["PEPTIDEK", "PEPTIDER"], "RT was not filtered."
+	assert dia_df(elib_file, q_value=0.01).PeptideModSeq.tolist() == ["PEPTIDE", "PEPTIDER", "PEPTIDES"], "q-values were not filtered."
+
+	# test combined filters and columns
+	actual_df = dia_df(elib_file, columns=["PeptideModSeq", "Score"], q_value=0.01, charges=[2, 4], rt_range=(1000, 3000))
+	assert actual_df.columns.tolist() == ["PeptideModSeq", "Score"], "Columns were not selected."
+	assert actual_df.PeptideModSeq.tolist() == ["PEPTIDER", "PEPTIDES"], "Filters were not combined."
+
+	# test unknown columns
+	with pytest.raises(ValueError):
+		dia_df(elib_file, columns=["PeptideModSeq; DROP TABLE entries"])
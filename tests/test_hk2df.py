@@ -15,3 +15,9 @@ def test_byint():
 	actual_int = actual.loc[0,"intensity"]
 	assert actual_type == expected_type, "DataFrame was not created correctly. Check format of file."
 	assert actual_int == expected_int, "Test Failed. DataFrame may not be sorted correctly."
+
+def test_engines():
+	"""Test C and Python parsers create the same DataFrame"""
+	c_df = hk2df("tests/hk_fixture.hk")
+	python_df = hk2df("tests/hk_fixture.hk", engine="python")
+	assert c_df.equals(python_df), "C parser did not create the same DataFrame as the Python parser."
@@ -0,0 +1,140 @@
+import os
+import gzip
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from msions.mzml import IndexedMzML
+from msions.mzml import tic_df
+from msions.mzml import peak_df
+from msions.mzml import iter_peak_chunks
+from msions.peakmap import write_peak_map
+from msions.peakmap import PeakMap
+from msions.mzml import igzip
+from msions.cache import enable_cache
+from msions.cache import disable_cache
+
+def test_indexed_mzml():
+	"""Test random access to spectra of an indexed mzML file"""
+	expected_df = tic_df("tests/mzml_fixture.mzML", level="all", include_ms1_info=True)
+	with IndexedMzML("tests/mzml_fixture.mzML") as run:
+		assert len(run) == 302, "Number of spectra is unexpected."
+		assert run.scans_df(level="all", include_ms1_info=True).equals(expected_df), "Spectra are not the same as tic_df."
+
+		# test lookup by scan number
+		actual_df = run.scans_df(scans=[5, 100, 200], level="all")
+		assert actual_df.scan_num.tolist() == [5, 100, 200], "Spectra were not found by scan number."
+
+		# test lookup by retention time
+		rts = np.array([run.rt(pos) for pos in range(len(run))])
+		rt_df = run.scans_df(rt_range=(rts[50], rts[121]))
+		expected_scans = run.scan_nums[(rts >= rts[50]) & (rts <= rts[121])]
+		assert rt_df.scan_num.tolist() == expected_scans.tolist(), "Spectra were not found by retention time."
+
+		# test peaks
+		ms1_peaks = peak_df("tests/mzml_fixture.mzML")
+		mz, ips = run.peaks(152)
+		assert np.array_equal(mz.round(4), ms1_peaks.mz[ms1_peaks.scan_num == 152]), "m/z array was not decoded correctly."
+		assert np.array_equal(ips, ms1_peaks.ips[ms1_peaks.scan_num == 152]), "Intensity array was not decoded correctly."
+
+def test_non_indexed_mzml(tmp_path):
+	"""Test offsets of a non-indexed mzML file are found and cached"""
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	mzml_dir = tmp_path / "mzml"
+	mzml_dir.mkdir()
+	mzml_file = mzml_dir / "non_indexed.mzML"
+	mzml_file.write_bytes(re.sub(rb"<indexListOffset>.*?</indexListOffset>", b"", mzml_bytes))
+
+	with IndexedMzML("tests/mzml_fixture.mzML") as indexed_run, IndexedMzML(str(mzml_file)) as run:
+		assert np.array_equal(run.offsets, indexed_run.offsets), "Spectrum offsets were not found correctly."
+		assert run.chromatogram_ids == ["TIC"], "Chromatogram offsets were not found correctly."
+		assert run.scans_df(scans=[7]).equals(indexed_run.scans_df(scans=[7])), "Spectrum was not read correctly."
+	assert os.listdir(mzml_dir) == ["non_indexed.mzML"], "Files were written while caching is disabled."
+
+	# test offsets are cached if caching is enabled
+	cache_dir = tmp_path / "cache"
+	enable_cache(str(cache_dir))
+	try:
+		with IndexedMzML(str(mzml_file)) as run:
+			assert np.array_equal(run.offsets, indexed_run.offsets), "Spectrum offsets were not found correctly."
+	finally:
+		disable_cache()
+	cache_files = [name for name in os.listdir(cache_dir) if name.startswith("offsets-")]
+	assert len(cache_files) == 1, "Offsets were not cached."
+
+def test_gzip_mzml(tmp_path):
+	"""Test gzipped mzML files are read like the uncompressed file"""
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	gz_file = str(tmp_path / "gzipped.mzML.gz")
+	with gzip.open(gz_file, "wb") as open_file:
+		open_file.write(mzml_bytes)
+
+	for kwargs in [{"level": "all", "backend": "xml"}, {"level": "all", "workers": 2}, {"level": "all", "chromatogram": True}]:
+		assert tic_df(gz_file, **kwargs).equals(tic_df("tests/mzml_fixture.mzML", **kwargs)), "Gzipped spectra were not read correctly."
+	assert peak_df(gz_file, threads=2).equals(peak_df("tests/mzml_fixture.mzML")), "Gzipped peaks were not read correctly."
+
+	# test random access (twice to use stored seek points)
+	for _ in range(2):
+		with IndexedMzML("tests/mzml_fixture.mzML") as indexed_run, IndexedMzML(gz_file) as run:
+			assert np.array_equal(run.offsets, indexed_run.offsets), "Spectrum offsets were not found correctly."
+			assert run.scans_df(scans=[7, 152]).equals(indexed_run.scans_df(scans=[7, 152])), "Spectra were not read correctly."
+	assert os.listdir(tmp_path) == ["gzipped.mzML.gz"], "Files were written while caching is disabled."
+
+	# test seek points are stored if caching is enabled (and indexed_gzip is installed)
+	cache_dir = tmp_path / "cache"
+	enable_cache(str(cache_dir))
+	try:
+		with IndexedMzML(gz_file) as run:
+			assert np.array_equal(run.offsets, indexed_run.offsets), "Spectrum offsets were not found correctly."
+	finally:
+		disable_cache()
+	if igzip is not None:
+		assert len([name for name in os.listdir(cache_dir) if name.startswith("gzindex-")]) == 1, "Seek points were not stored."
+
+def test_gzip_no_extension(tmp_path):
+	"""Test gzipped mzML files are found by their first bytes instead of their extension"""
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	gz_file = str(tmp_path / "gzipped.mzML")
+	with gzip.open(gz_file, "wb") as open_file:
+		open_file.write(mzml_bytes)
+
+	for kwargs in [{}, {"level": "all"}, {"level": "2", "include_ms1_info": True}]:
+		assert tic_df(gz_file, **kwargs).equals(tic_df("tests/mzml_fixture.mzML", **kwargs)), "Gzipped spectra were not read correctly."
+	assert peak_df(gz_file).equals(peak_df("tests/mzml_fixture.mzML")), "Gzipped peaks were not read correctly."
+	chunks = pd.concat(iter_peak_chunks(gz_file, chunk_peaks=1000), ignore_index=True)
+	assert chunks.equals(peak_df("tests/mzml_fixture.mzML")), "Gzipped peak chunks were not read correctly."
+	peak_map = PeakMap(write_peak_map(gz_file, str(tmp_path / "gzipped.peaks")))
+	assert peak_map.to_df().equals(peak_df("tests/mzml_fixture.mzML", int_dtype="float32")), "Gzipped peak map was not written correctly."
+
+def test_gzip_seek_points(tmp_path, monkeypatch):
+	"""Test seek points of gzipped mzML files are stored and imported with indexed_gzip"""
+	indexed_gzip = pytest.importorskip("indexed_gzip")
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	gz_file = str(tmp_path / "gzipped.mzML.gz")
+	with gzip.open(gz_file, "wb") as open_file:
+		open_file.write(mzml_bytes)
+
+	cache_dir = tmp_path / "cache"
+	enable_cache(str(cache_dir))
+	try:
+		with IndexedMzML(gz_file) as run:
+			expected_df = run.scans_df(scans=[7, 152])
+		index_files = [name for name in os.listdir(cache_dir) if name.startswith("gzindex-")]
+		assert len(index_files) == 1, "Seek points were not stored."
+
+		# test stored seek points are imported instead of built again
+		opened = []
+		def open_gzip(*args, **kwargs):
+			opened.append(kwargs)
+			return gzip_class(*args, **kwargs)
+		gzip_class = indexed_gzip.IndexedGzipFile
+		monkeypatch.setattr(indexed_gzip, "IndexedGzipFile", open_gzip)
+		with IndexedMzML(gz_file) as run:
+			assert run.scans_df(scans=[7, 152]).equals(expected_df), "Spectra were not read with stored seek points."
+		assert opened and all(kwargs.get("index_file") for kwargs in opened), "Stored seek points were not imported."
+	finally:
+		disable_cache()
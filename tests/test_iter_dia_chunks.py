@@ -0,0 +1,13 @@
+import pandas as pd
+from msions.encyclopedia import dia_df
+from msions.encyclopedia import iter_dia_chunks
+
+def test_iter_dia_chunks(elib_file):
+	"""Test chunks of an elib file are the same as the whole DataFrame"""
+	chunks = list(iter_dia_chunks(elib_file, chunk_rows=3))
+	assert [len(chunk_df) for chunk_df in chunks] == [3, 1], "Chunks have an unexpected number of rows."
+	assert pd.concat(chunks, ignore_index=True).equals(dia_df(elib_file)), "Chunks are not the same as the DataFrame."
+
+	# test filtered chunks
+	chunks = list(iter_dia_chunks(elib_file, chunk_rows=1, charges=[2]))
+	assert len(chunks) == 2, "Chunks were not filtered."
@@ -0,0 +1,15 @@
+from msions.mzml import iter_peak_chunks
+from msions.mzml import peak_df
+import pandas as pd
+
+def test_iter_peak_chunks():
+	"""Test chunked iteration over MS1 peaks of an mzML file"""
+	chunks = list(iter_peak_chunks("tests/mzml_fixture.mzML", chunk_peaks=500))
+	expected_sizes = [500, 500, 329]
+	actual_sizes = [len(chunk) for chunk in chunks]
+	assert actual_sizes == expected_sizes, "Chunks were not created with the right number of peaks."
+	chunk_df = pd.concat(chunks, ignore_index=True)
+	assert chunk_df.equals(peak_df("tests/mzml_fixture.mzML")), "Chunks do not contain the same peaks as peak_df."
+	small_chunks = list(iter_peak_chunks("tests/mzml_fixture.mzML", chunk_peaks=100))
+	assert [len(chunk) for chunk in small_chunks] == [100]*13 + [29], "Spectra spanning many chunks were not split correctly."
+	assert pd.concat(small_chunks, ignore_index=True).equals(chunk_df), "Small chunks do not contain the same peaks."
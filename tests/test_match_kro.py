@@ -17,4 +17,21 @@ def test_match_kro():
 	perc_matches = sum(perc_df.in_kro)
 	assert kro_matches == expected_matches, "Kronik and Percolator match function did not work properly. Please look at Kronik input"
 	assert perc_matches == expected_matches, "Kronik and Percolator match function did not work properly. Please look at Percolator input"
-	
\ No newline at end of file
+	
+
+def test_match_kro_lookup():
+	"""Test scan lookups of match function for Kronik and Percolator XML output"""
+	kro_df = pd.DataFrame({"first_scan": [1, 5, 30], "last_scan": [10, 20, 40],
+						   "mass": [1000.0, 1000.5, 2000.0], "charge": [2, 2, 2],
+						   "best_int": [100.0, 300.0, 50.0], "mz": [501.00728, 501.25728, 1001.00728]})
+	ms_df = pd.DataFrame({"ms1_scan": [-1, 1, -1, 6, -1, 11, -1, 31],
+						  "ms1_mz": [-1, 501.1, -1, 501.1, -1, 501.2, -1, 900.0],
+						  "scan_num": [1, 2, 6, 7, 11, 12, 31, 32],
+						  "TIC": [10.0, 1.0, 20.0, 2.0, 30.0, 3.0, 40.0, 4.0],
+						  "IT": [5.0, 1.0, 6.0, 1.0, 7.0, 1.0, 8.0, 1.0]})
+	perc_df = pd.DataFrame({"scan_num": [2, 12, 32, 7], "exp_mass": [1000.2, 1000.4, 2000.0, 1000.2]})
+	match_kro(kro_df, perc_df, ms_df)
+	assert list(perc_df.in_kro) == [1, 1, 0, 2], "PSMs were not matched to Kronik features properly."
+	assert list(perc_df.best_int) == [100, 300, 0, 300], "Feature intensities were not added properly."
+	assert list(perc_df.TIC) == [10, 30, 40, 20], "MS1 TIC was not looked up properly."
+	assert list(kro_df.ID_d) == [2, 2, 0], "Kronik features were not labeled properly."
@@ -1,3 +1,4 @@
+import numpy as np
 from msions.mzml import peak_df
 
 def test_peak_df():
@@ -9,3 +10,33 @@ def test_peak_df():
 	actual_rows = ms1_peaks.shape[0]
 	assert (actual_type == expected_type) and (actual_rows == expected_rows), "DataFrame was not created correctly. Check format of file."
 
+def test_peak_dtypes():
+	"""Test data types and scan numbers of MS1 peak DataFrame"""
+	ms1_peaks = peak_df("tests/mzml_fixture.mzML", int_dtype="float32")
+	assert str(ms1_peaks.ips.dtype) == "float32", "Ion current data type was not changed."
+	assert str(ms1_peaks.mz.dtype) == "float64", "m/z data type was not kept."
+	assert list(ms1_peaks.scan_num.unique()) == [1, 152], "Scan numbers were not added correctly."
+
+
+def test_workers():
+	"""Test parallel decoding of spectrum shards gives the same DataFrame"""
+	expected_df = peak_df("tests/mzml_fixture.mzML")
+	actual_df = peak_df("tests/mzml_fixture.mzML", workers=2)
+	assert actual_df.equals(expected_df), "Parallel DataFrame is not the same as the sequential DataFrame."
+
+
+def test_threads():
+	"""Test threaded decoding of binary arrays gives the same DataFrame"""
+	expected_df = peak_df("tests/mzml_fixture.mzML")
+	actual_df = peak_df("tests/mzml_fixture.mzML", threads=2)
+	assert actual_df.equals(expected_df), "Threaded DataFrame is not the same as the sequential DataFrame."
+
+
+def test_numpress():
+	"""Test MS-Numpress arrays are decoded like zlib arrays"""
+	expected_df = peak_df("tests/mzml_fixture.mzML")
+	for threads in [None, 2]:
+		actual_df = peak_df("tests/mzml_numpress_fixture.mzML", threads=threads)
+		assert actual_df.scan_num.equals(expected_df.scan_num), "Scan numbers are not the same."
+		assert np.allclose(actual_df.mz, expected_df.mz, rtol=0, atol=1e-4), "Linear m/z arrays were not decoded correctly."
+		assert np.allclose(actual_df.ips, expected_df.ips, rtol=2e-4, atol=0.5), "Pic/slof intensity arrays were not decoded correctly."
@@ -0,0 +1,27 @@
+from msions.mzml import peak_df
+from msions.peakmap import write_peak_map
+from msions.peakmap import PeakMap
+
+def test_peak_map(tmp_path):
+	"""Test peak map written from an mzML file is read back like peak_df"""
+	peak_map_dir = write_peak_map("tests/mzml_fixture.mzML", str(tmp_path / "test.peaks"))
+	peak_map = PeakMap(peak_map_dir)
+	expected_df = peak_df("tests/mzml_fixture.mzML", int_dtype="float32")
+	assert len(peak_map) == 2, "Number of scans in peak map is unexpected."
+	assert peak_map.to_df().equals(expected_df), "Peak map is not the same as peak_df."
+
+	# test slicing by retention time and scan number
+	rt_df = peak_map.to_df(rt_range=(peak_map.rt[1], peak_map.rt[1] + 1))
+	scan_df = peak_map.to_df(scan_range=(100, 200))
+	expected_df = expected_df[expected_df.scan_num == 152].reset_index(drop=True)
+	assert rt_df.equals(expected_df), "Peak map was not sliced by retention time correctly."
+	assert scan_df.equals(expected_df), "Peak map was not sliced by scan number correctly."
+	assert len(peak_map.to_df(scan_range=(2, 151))) == 0, "Empty range did not return an empty DataFrame."
+
+def test_df_peak_map(tmp_path):
+	"""Test peak map written from a peak_df DataFrame"""
+	expected_df = peak_df("tests/mzml_fixture.mzML")
+	peak_map = PeakMap(write_peak_map(expected_df, str(tmp_path / "test.peaks"), int_dtype="float64"))
+	mz, ips = peak_map.peaks(scan_range=(1, 1))
+	assert peak_map.to_df().equals(expected_df), "Peak map is not the same as the DataFrame."
+	assert len(mz) == (expected_df.scan_num == 1).sum(), "Peaks of scan were not sliced correctly."
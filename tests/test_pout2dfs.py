@@ -0,0 +1,80 @@
+import re
+import pytest
+from msions.percolator import pout2dfs
+from msions.percolator import psms2df
+from msions.percolator import peps2df
+
+def _combined_xml(tmp_path):
+	"""Combine the PSM and peptide fixtures into one XML file with a protein section"""
+	with open("tests/psm_fixture.pout.xml", "r") as open_file:
+		psm_text = open_file.read()
+	with open("tests/pep_fixture.pout.xml", "r") as open_file:
+		pep_text = open_file.read()
+	peptides = re.search(r"<peptides>.*</peptides>", pep_text, re.S).group(0)
+	proteins = ('<proteins>\n<protein p:protein_id="sp|P69905|HBA_HUMAN">\n<pep>1.0e-05</pep>\n'
+				'<q_value>1.0e-04</q_value>\n<peptide_seq seq="TYFPHFDLSHGSAQVK"/>\n'
+				'<peptide_seq seq="VGAHAGEYGAEALER"/>\n</protein>\n</proteins>\n')
+	xml_text = psm_text.replace("</psms>", "</psms>\n" + peptides + "\n" + proteins)
+	xml_file = tmp_path / "combined.pout.xml"
+	xml_file.write_text(xml_text)
+	return str(xml_file)
+
+def test_pout2dfs(tmp_path):
+	"""Test PSM, peptide, and protein DataFrame creation from one XML file"""
+	xml_file = _combined_xml(tmp_path)
+	with pytest.warns(UserWarning, match="PSM IDs of peptides are not in the psms section"):
+		pout_dfs = pout2dfs(xml_file, proteins=True)
+	psm_df = pout_dfs["psms"]
+	pep_df = pout_dfs["peptides"]
+
+	# test same PSMs as psms2df
+	assert psm_df.drop(columns="pep_idx").equals(psms2df(xml_file)), "PSM DataFrame is not the same as psms2df."
+
+	# test one peptide row per peptide and PSMs per peptide
+	expected_peps = peps2df(xml_file)
+	assert pep_df.shape[0] == expected_peps["peptide"].nunique(), "Number of peptides is unexpected."
+	assert pep_df["num_psms"].sum() == expected_peps.shape[0], "Number of PSMs per peptide is unexpected."
+
+	# test PSMs are linked to their peptides
+	linked = psm_df[psm_df["pep_idx"] >= 0]
+	linked_peps = pep_df.loc[linked["pep_idx"], "peptide"].to_numpy()
+	expected_linked = expected_peps.set_index("scan_num").loc[linked["scan_num"], "peptide"].to_numpy()
+	assert len(linked) > 0, "No PSMs were linked to peptides."
+	assert (linked_peps == expected_linked).all(), "PSMs were not linked to the correct peptides."
+
+	# test protein section
+	assert pout_dfs["proteins"].shape == (1, 4), "Protein DataFrame is unexpected."
+	assert pout_dfs["proteins"].loc[0, "peptides"] == "TYFPHFDLSHGSAQVK,VGAHAGEYGAEALER", "Protein peptides are unexpected."
+
+def test_no_proteins():
+	"""Test protein section is only read if requested"""
+	pout_dfs = pout2dfs("tests/psm_fixture.pout.xml")
+	assert set(pout_dfs) == {"psms", "peptides"}, "Unexpected DataFrames were returned."
+	assert pout_dfs["peptides"].shape[0] == 0, "Peptides were found in a PSM-only file."
+	assert (pout_dfs["psms"]["pep_idx"] == -1).all(), "PSMs were linked without peptides."
+
+def test_peptides_first(tmp_path):
+	"""Test PSMs are linked if the peptide section precedes the PSM section"""
+	xml_text = open(_combined_xml(tmp_path)).read()
+	psms = re.search(r"<psms>.*</psms>", xml_text, re.S).group(0)
+	peptides = re.search(r"<peptides>.*</peptides>", xml_text, re.S).group(0)
+	xml_file = tmp_path / "peptides_first.pout.xml"
+	xml_file.write_text(xml_text.replace(psms, "PEPTIDES").replace(peptides, psms).replace("PEPTIDES", peptides))
+	with pytest.warns(UserWarning):
+		pout_dfs = pout2dfs(str(xml_file))
+		expected_dfs = pout2dfs(_combined_xml(tmp_path))
+	assert pout_dfs["psms"]["pep_idx"].equals(expected_dfs["psms"]["pep_idx"]), "PSMs were not linked to their peptides."
+
+def test_unseen_psm_ids(tmp_path):
+	"""Test a warning is given for PSM IDs of peptides that are not PSMs"""
+	with open("tests/psm_fixture.pout.xml", "r") as open_file:
+		xml_text = open_file.read()
+	psm_id = re.search(r'p:psm_id="([^"]*)"', xml_text).group(1)
+	peptides = ('<peptides>\n<peptide p:peptide_id="PEPTIDEK">\n<q_value>1.0e-04</q_value>\n<psm_ids>\n'
+				'<psm_id>%s</psm_id>\n<psm_id>./crux_output/comet_0_2_1</psm_id>\n</psm_ids>\n'
+				'</peptide>\n</peptides>\n' % psm_id)
+	xml_file = tmp_path / "unseen.pout.xml"
+	xml_file.write_text(xml_text.replace("</psms>", "</psms>\n" + peptides))
+	with pytest.warns(UserWarning, match="1 PSM IDs"):
+		pout_dfs = pout2dfs(str(xml_file))
+	assert pout_dfs["psms"]["pep_idx"].tolist() == [0] + [-1]*9, "PSM was not linked to its peptide."
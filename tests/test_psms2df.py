@@ -19,4 +19,15 @@ def test_psms2df():
 	actual_rows = actual_df.shape[0]
 	actual_columns = actual_df.shape[1]
 	assert actual_rows == expected_rows, "Number of rows in DataFrame is unexpected."
-	assert actual_columns == expected_columns, "Number of columns in DataFrame is unexpected."
\ No newline at end of file
+	assert actual_columns == expected_columns, "Number of columns in DataFrame is unexpected."
+
+def test_namespace(tmp_path):
+	"""Test PSM DataFrame creation from an XML file of another Percolator output version"""
+	with open("tests/psm_fixture.pout.xml", "r") as open_file:
+		xml_text = open_file.read().replace("percolator_out/15", "percolator_out/14")
+	xml_file = tmp_path / "psm_fixture_14.pout.xml"
+	xml_file.write_text(xml_text)
+
+	expected_df = psms2df("tests/psm_fixture.pout.xml")
+	assert psms2df(str(xml_file)).equals(expected_df), "XML namespace was not detected correctly."
+	assert psms2df(parse_psms(str(xml_file))).equals(expected_df), "Dictionary namespace was not detected correctly."
@@ -0,0 +1,40 @@
+from msions.batch import run_batch
+from msions.batch import main
+import pandas as pd
+import os
+import msions.cache
+
+def test_run_batch(tmp_path):
+	"""Test processing of a manifest of runs"""
+	manifest_df = pd.DataFrame({"run": ["run1", "run2"],
+								"mzml": ["tests/mzml_fixture.mzML"]*2,
+								"hk": ["tests/hk_fixture.hk", None]})
+	cache_dir = str(tmp_path / "cache")
+	results = run_batch(manifest_df, workers=2, cache_dir=cache_dir)
+	scan_df = results["scans"]
+	expected_rows = 4
+	assert scan_df.shape[0] == expected_rows, "Runs were not combined correctly."
+	assert list(scan_df.run.unique()) == ["run1", "run2"], "Runs were not labeled correctly."
+	assert scan_df.feat_TIC.notna().sum() == 2, "Hardklor features were not summarized correctly."
+	assert len(os.listdir(cache_dir)) == 2, "Run results were not cached."
+
+	# test cached results are reused
+	cached_results = run_batch(manifest_df, workers=1, cache_dir=cache_dir)
+	assert cached_results["scans"].equals(scan_df), "Cached results were not reused correctly."
+
+def test_batch_cache_version(tmp_path, monkeypatch):
+	"""Test run results cached by another cache schema version are not reused"""
+	manifest_df = pd.DataFrame({"run": ["run1"], "mzml": ["tests/mzml_fixture.mzML"]})
+	cache_dir = str(tmp_path / "cache")
+	run_batch(manifest_df, workers=1, cache_dir=cache_dir)
+	monkeypatch.setattr(msions.cache, "_SCHEMA_VERSION", msions.cache._SCHEMA_VERSION + 1)
+	run_batch(manifest_df, workers=1, cache_dir=cache_dir)
+	assert len(os.listdir(cache_dir)) == 2, "Run key does not include the cache schema version."
+
+def test_main(tmp_path):
+	"""Test command line entry point"""
+	manifest_file = tmp_path / "runs.tsv"
+	pd.DataFrame({"mzml": [os.path.abspath("tests/mzml_fixture.mzML")]}).to_csv(manifest_file, sep="\t", index=False)
+	main([str(manifest_file), "-o", str(tmp_path / "out"), "-j", "1"])
+	scan_df = pd.read_csv(tmp_path / "out" / "scans.tsv", sep="\t")
+	assert list(scan_df.run.unique()) == ["mzml_fixture"], "Combined table was not written correctly."
@@ -1,3 +1,5 @@
+from msions.hardklor import iter_hk_chunks
+import pandas as pd
 from msions.hardklor import summarize_df
 from msions.hardklor import hk2df
 from msions.mzml import tic_df
@@ -13,3 +15,16 @@ def test_summarize_df():
 	assert actual_rows == expected_rows, "DataFrame was not summarized correctly."
 	assert actual_rows == string_rows, "File input was not processed correctly."
 	assert actual_columns == expected_columns, "Ion injection times were not added properly."
+
+def test_chunked_summarize_df():
+	"""Test summarized DataFrame from a Hardklor file read in chunks"""
+	ms1_df = tic_df("tests/mzml_fixture.mzML")
+	for full_ms1_df in [None, ms1_df]:
+		expected_df = summarize_df("tests/hk_fixture.hk", full_ms1_df)
+		actual_df = summarize_df("tests/hk_fixture.hk", full_ms1_df, chunk_rows=50)
+		assert actual_df.equals(expected_df), "Chunked DataFrame was not summarized correctly."
+
+def test_iter_hk_chunks():
+	"""Test chunked iteration over a Hardklor file"""
+	chunk_df = pd.concat(iter_hk_chunks("tests/hk_fixture.hk", chunk_rows=50), ignore_index=True)
+	assert chunk_df.equals(hk2df("tests/hk_fixture.hk")), "Chunks do not contain the same rows as hk2df."
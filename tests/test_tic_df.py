@@ -1,3 +1,4 @@
+import numpy as np
 from msions.mzml import tic_df
 
 def test_tic_df():
@@ -6,3 +7,62 @@ def test_tic_df():
 	actual_type = type(tic_df("tests/mzml_fixture.mzML")).__name__
 	assert actual_type == expected_type, "DataFrame was not created correctly. Check format of file."
 
+
+def test_ms1_info():
+	"""Test MS1 precursor information found by cvParam accession"""
+	all_df = tic_df("tests/mzml_fixture.mzML", level="all", include_ms1_info=True)
+	expected_columns = ['ms1_scan', 'ms1_mz', 'ms1_int', 'scan_num', 'rt', 'TIC', 'IT', 'ions']
+	assert list(all_df.columns) == expected_columns, "Columns were not created correctly."
+	assert all_df.shape[0] == 302, "Not all scans were included."
+	assert sum(all_df.ms1_scan == -1) == 2, "MS1 scans were not labeled correctly."
+	assert all_df.loc[1, "ms1_mz"] == 402.4337, "Precursor m/z was not found correctly."
+	assert tic_df("tests/mzml_fixture.mzML").IT[1].round(4) == 40.3431, "Injection time was not found correctly."
+
+def test_xml_backend():
+	"""Test streaming XML backend gives the same DataFrame as pymzml"""
+	for level in ["1", "2", "all"]:
+		pymzml_df = tic_df("tests/mzml_fixture.mzML", level=level)
+		xml_df = tic_df("tests/mzml_fixture.mzML", level=level, backend="xml")
+		assert pymzml_df.equals(xml_df), "XML backend did not create the same DataFrame."
+
+
+def test_workers():
+	"""Test parallel parsing of spectrum shards gives the same DataFrame"""
+	for kwargs in [{"level": "1"}, {"level": "all", "include_ms1_info": True, "faims": True}]:
+		expected_df = tic_df("tests/mzml_fixture.mzML", **kwargs)
+		actual_df = tic_df("tests/mzml_fixture.mzML", workers=3, **kwargs)
+		assert actual_df.equals(expected_df), "Parallel DataFrame is not the same as the sequential DataFrame."
+
+
+def test_chromatogram(tmp_path):
+	"""Test reading the TIC chromatogram instead of the spectra"""
+	chrom_df = tic_df("tests/mzml_fixture.mzML", level="all", chromatogram=True)
+	scan_df = tic_df("tests/mzml_fixture.mzML", level="all", backend="xml")
+	assert list(chrom_df.columns) == ["rt", "TIC"], "TIC chromatogram columns are not correct."
+	assert chrom_df.shape[0] == 146940, "TIC chromatogram was not read correctly."
+	assert (chrom_df.rt[0] == scan_df.rt[0]) and (chrom_df.TIC[0] == scan_df.TIC[0]), "TIC chromatogram does not match the first scan."
+	faims_df = tic_df("tests/mzml_fixture.mzML", level="all", faims=True, chromatogram=True)
+	assert "IT" in faims_df.columns, "Spectra were not parsed for FAIMS columns."
+	ms1_df = tic_df("tests/mzml_fixture.mzML", chromatogram=True)
+	assert ms1_df.equals(tic_df("tests/mzml_fixture.mzML")), "Spectra were not parsed for MS1 scans."
+
+	# test time in seconds is converted to minutes
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	start = mzml_bytes.index(b"<chromatogram ")
+	time_array = b'accession="MS:1000595" name="time array" value="" unitCvRef="UO" unitAccession="UO:0000031" unitName="minute"'
+	seconds_array = time_array.replace(b"UO:0000031", b"UO:0000010").replace(b"minute", b"second")
+	mzml_file = tmp_path / "seconds.mzML"
+	mzml_file.write_bytes(mzml_bytes[:start] + mzml_bytes[start:].replace(time_array, seconds_array, 1))
+	seconds_df = tic_df(str(mzml_file), level="all", chromatogram=True)
+	assert np.allclose(seconds_df.rt, chrom_df.rt/60, atol=1e-4) and seconds_df.rt.max() < chrom_df.rt.max(), "Time in seconds was not converted to minutes."
+
+def test_first_cvparam(tmp_path):
+	"""Test the first value of a repeated cvParam is used"""
+	with open("tests/mzml_fixture.mzML", "rb") as open_file:
+		mzml_bytes = open_file.read()
+	tic_param = b'<cvParam cvRef="MS" accession="MS:1000285" name="total ion current" value="3.9886272e07"/>'
+	mzml_file = tmp_path / "repeated.mzML"
+	mzml_file.write_bytes(mzml_bytes.replace(tic_param, tic_param + tic_param.replace(b"3.9886272e07", b"1.0"), 1))
+	actual_df = tic_df(str(mzml_file), level="all", backend="xml")
+	assert actual_df.TIC[0] == 3.9886272e07, "The first TIC value of the scan was not used."